@@ -1,15 +1,39 @@
 import os
+import json
+import time
 import logging
-from flask import Flask, request, jsonify
+import threading
+from dataclasses import replace
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from models.parameters import Staff, Shift, LockedShift
-from models.shift_schedule_model import ShiftScheduleModel
-from models.constraints import StaffConstraints, ShiftConstraints, RequiredAttendanceConstraints
-from models.objectives import StaffObjectives, ShiftBalanceTierObjectives, RandomizedObjective
+from models.parameters import SolverParameters, Staff, Shift
+from models.builder import build_shift_schedule_model, PREVIOUS_MODES, SYMMETRY_BREAKING_MODES, HEURISTIC_MODES, CONSECUTIVE_ENCODINGS, DEFAULT_RANDOMIZATION_DENSITY
+from models.constraints import StaffConstraints
+from models.objectives import ShiftBalanceTierObjectives
+from models.evaluator import ScheduleEvaluator
+from models.shift_schedule_model import SolveResult
+from jobs import JobManager
+from cache import ResultCache, compute_cache_key, seed_from_cache_key
+from batch import BatchItemResult, solve_batch
+from horizon import DEFAULT_LOOKAHEAD_DAYS, solve_rolling_horizon
+from schema import ValidationError, parse_schedule_inputs, parse_schedule_edits, parse_evaluation_inputs, parse_solver_parameters, parse_relax_weights
+from metrics import MetricsRegistry, PhaseTimer, BuildProfiler
+from solver_pool import SolverPool, SolverPoolTimeout
+from sessions import ScheduleSession, SessionStore
+from snapshots import SnapshotStore
+from negotiation import (
+    JSON_MIMETYPE, MEDIA_TYPES, REQUEST_MEDIA_TYPES, CONTENT_ENCODINGS, MIN_COMPRESSION_BYTES,
+    encode_json_value, encode_body, decode_body, decompress, compress
+)
 
-ALLOWED_PARAMS = ['shifts', 'staffs', 'locked']
+# レスポンスの shifts の形式
+# - 'cells': セルごとの { date, staffId, isWorking, locked } のリスト
+# - 'columnar': dates, staffIds と、スタッフごとの日付順のビットマップ（'0' と '1' の文字列）
+# - 'packed': 'columnar' のビットマップを 1 日 1 ビットに詰めたバイト列（JSON では base64 の文字列）
+RESPONSE_FORMATS = ('cells', 'columnar', 'packed')
 
-logging.basicConfig(level=logging.DEBUG)
+# 開発環境以外ではリクエストごとの DEBUG ログを出力しない
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'DEBUG' if os.environ.get('FLASK_ENV') == 'dev' else 'INFO'))
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -19,67 +43,804 @@ allowed_origin = os.environ.get('ALLOWED_ORIGIN')
 
 CORS(app, origins=[allowed_origin])
 
-@app.route("/api/v1/optimize", methods=['POST'])
-def optimize_shifts():
-    # post 出来ているか確認
-    logger.debug(request)
-    
-    if not request.is_json:
-        return jsonify({"error": "Expected JSON"}), 400
-
-    data = request.get_json()
-
-    if not all(param in data for param in ALLOWED_PARAMS):
-        return jsonify({"error": "Missing required parameters"}), 400
-
-    staffs = [
-        Staff(
-            id = staff['id'],
-            tier = staff['tier'],
-            desired_off_days = staff['desiredOffDays'],
-            work_days = staff['workDays']
-        )
-        for staff in data['staffs']
-    ]
+def _get_env(name, cast, default=None):
+    value = os.environ.get(name)
+    return default if value is None else cast(value)
 
-    shifts = [
-        Shift(
-            date = shift['date'],
-            required_staff_count = shift['requiredStaffCount'],
-            required_attendance_tiers = shift['requiredAttendanceTiers'],
-            required_attendance_tier_count = shift['requiredAttendanceTierCount']
-        )
-        for shift in data['shifts']
-    ]
+# サーバー全体のソルバーパラメータのデフォルト値
+# 時間制限がないと難しい月の探索がワーカーを占有し続けるため、デフォルトで 30 秒に制限する
+default_solver_parameters = SolverParameters(
+    max_time_in_seconds = _get_env('SOLVER_MAX_TIME_IN_SECONDS', float, 30.0),
+    num_search_workers = _get_env('SOLVER_NUM_SEARCH_WORKERS', int),
+    relative_gap_limit = _get_env('SOLVER_RELATIVE_GAP_LIMIT', float),
+    absolute_gap_limit = _get_env('SOLVER_ABSOLUTE_GAP_LIMIT', float),
+    random_seed = _get_env('SOLVER_RANDOM_SEED', int),
+)
+
+# バッチ最適化で同時に解く店舗数の上限 省略した場合は solver_pool の枠の数
+batch_max_workers = _get_env('OPTIMIZE_BATCH_WORKERS', int)
+
+# 同じ入力の再送（リロード、ダブルクリック、複数タブ）で解き直さないように結果をキャッシュする
+result_cache = ResultCache(
+    max_entries = _get_env('RESULT_CACHE_MAX_ENTRIES', int, 256),
+    ttl_seconds = _get_env('RESULT_CACHE_TTL_SECONDS', float, 600.0),
+    directory = os.environ.get('RESULT_CACHE_DIR'),
+    encode = SolveResult.to_dict,
+    decode = SolveResult.from_dict
+)
+
+# 時間切れで解が見つからなかった場合などは、解き直すと結果が変わりうるためキャッシュしない
+CACHEABLE_STATUSES = ('OPTIMAL', 'FEASIBLE', 'INFEASIBLE')
+
+# 解がない場合に、原因となるルールの組み合わせを診断する時間の上限
+diagnosis_max_time_in_seconds = _get_env('DIAGNOSIS_MAX_TIME_IN_SECONDS', float, 10.0)
+
+# 緩和モードで maxTimeInSeconds が指定されなかった場合の探索時間の上限
+# 緩和モードは常に解があるため、短い時間でも違反の少ない解を返せる
+relaxed_max_time_in_seconds = _get_env('RELAXED_MAX_TIME_IN_SECONDS', float, 1.0)
+
+def create_solver_pool(process_count):
+    """
+    CPU コアを process_count 個のプロセスで分け合う場合の、1 プロセス分の SolverPool を作成する
+    既定では 1 つの探索に 4 スレッド以上を割り当て、CP-SAT のポートフォリオ探索を使えるようにする
+    """
+    process_cpu_count = max(1, (os.cpu_count() or 1) // process_count)
+    return SolverPool(
+        size = _get_env('SOLVER_POOL_SIZE', int, max(1, process_cpu_count // 4)),
+        cpu_count = process_cpu_count,
+        queue_timeout = _get_env('SOLVER_POOL_QUEUE_TIMEOUT_SECONDS', float, 30.0)
+    )
+
+# 同期エンドポイントで同時に実行する探索の数と、1 つの探索のスレッド数
+# flask run などの 1 プロセスでの起動ではすべての CPU コアを使い、gunicorn では configure_worker() で作り直す
+solver_pool = create_solver_pool(1)
+
+# 非同期ジョブも solver_pool の枠を使う 同時に実行するジョブの数は既定で枠の数まで
+job_manager = JobManager(solver_pool, max_workers=_get_env('OPTIMIZE_JOB_WORKERS', int))
+
+def configure_worker(process_count):
+    """
+    gunicorn のワーカープロセスの起動時（post_fork）に呼び出し、
+    CPU コアを process_count 個のワーカープロセスで分け合うように solver_pool と job_manager を作り直す
+    マスタープロセスではジョブを投入しないため、作り直す前の job_manager はプロセスプールを起動していない
+    """
+    global solver_pool, job_manager
+    solver_pool = create_solver_pool(process_count)
+    job_manager = JobManager(solver_pool, max_workers=_get_env('OPTIMIZE_JOB_WORKERS', int))
+
+# warm_up() で CP-SAT の初回の探索を済ませたら設定する
+solver_warmed_up = threading.Event()
+warm_up_lock = threading.Lock()
+
+# /api/v1/optimize/alternatives で 1 回に求める解の数の上限
+max_alternatives = _get_env('OPTIMIZE_MAX_ALTERNATIVES', int, 10)
+
+# シフト表の編集ごとにモデルを作り直さないように、構築済みのモデルを保持するセッション
+# 上限を超えた場合は最も長く使われていないセッションから破棄する
+session_store = SessionStore(
+    max_sessions = _get_env('SESSION_MAX_COUNT', int, 32),
+    max_cells = _get_env('SESSION_MAX_CELLS', int, 262144)
+)
+
+# SNAPSHOT_DIR を指定した場合は、探索に時間がかかったリクエストのモデルと入力を保存し、bench/replay.py で再現できるようにする
+snapshot_dir = os.environ.get('SNAPSHOT_DIR')
+snapshot_store = SnapshotStore(
+    directory = snapshot_dir,
+    max_snapshots = _get_env('SNAPSHOT_MAX_COUNT', int, 50),
+    min_wall_time = _get_env('SNAPSHOT_MIN_WALL_TIME_SECONDS', float, 5.0)
+) if snapshot_dir else None
+
+# /metrics で Prometheus のテキスト形式で公開するメトリクス
+metrics_registry = MetricsRegistry()
+request_duration = metrics_registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency in seconds', ('method', 'endpoint', 'status')
+)
+optimize_phase_duration = metrics_registry.histogram(
+    'optimize_phase_duration_seconds', 'Time spent in each phase of /api/v1/optimize in seconds', ('phase',)
+)
+optimize_model_variables = metrics_registry.histogram(
+    'optimize_model_variables', 'Number of CP-SAT variables per built model', (),
+    buckets=(100, 300, 1000, 3000, 10000, 30000, 100000, 300000)
+)
+optimize_solver_status = metrics_registry.counter(
+    'optimize_solver_status_total', 'CP-SAT solve results by status', ('status',)
+)
+optimize_cache_lookups = metrics_registry.counter(
+    'optimize_cache_lookups_total', 'Result cache lookups by result', ('result',)
+)
+solver_pool_wait_duration = metrics_registry.histogram(
+    'solver_pool_wait_seconds', 'Time spent waiting for a free solver slot in seconds'
+)
+solver_pool_rejections = metrics_registry.counter(
+    'solver_pool_rejections_total', 'Requests rejected because no solver slot became free in time'
+)
+
+class InvalidRequestError(Exception):
+    """
+    リクエストの内容が不正な場合に送出する例外
+    errorhandler で 400 のレスポンスに変換される
+    """
+
+def create_response(body):
+    """
+    Accept ヘッダーで選んだ形式（JSON または MessagePack）で body をエンコードしたレスポンスを返す
+    圧縮は compress_response() で行う
+    """
+    mimetype = request.accept_mimetypes.best_match(MEDIA_TYPES, default=JSON_MIMETYPE)
+    response = Response(encode_body(body, mimetype), mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+@app.errorhandler(InvalidRequestError)
+def handle_invalid_request(e):
+    return create_response({"error": str(e)}), 400
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request_duration(response):
+    # ストリーミングのレスポンスはヘッダーを返すまでの時間になる
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    request_duration.observe(time.perf_counter() - g.request_start, request.method, endpoint, response.status_code)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """
+    Accept-Encoding ヘッダーで受け付ける方式（br, gzip）で、MIN_COMPRESSION_BYTES 以上のレスポンスを圧縮する
+    ストリーミングのレスポンスは圧縮しない
+    """
+    if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    content_encoding = request.accept_encodings.best_match(CONTENT_ENCODINGS)
+    if content_encoding is None or response.content_length is None or response.content_length < MIN_COMPRESSION_BYTES:
+        return response
+
+    response.set_data(compress(response.get_data(), content_encoding))
+    response.headers['Content-Encoding'] = content_encoding
+    return response
 
-    locked = [
-        LockedShift(
-            date = lock['date'],
-            staff_id = lock['staffId'],
-            is_working = lock['isWorking']
+@app.errorhandler(SolverPoolTimeout)
+def handle_solver_pool_timeout(e):
+    solver_pool_rejections.inc()
+    return create_response({"error": str(e)}), 503, {'Retry-After': '5'}
+
+@app.route("/metrics", methods=['GET'])
+def metrics():
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+def acquire_solver_slot(solver_parameters):
+    """
+    solver_pool から探索の枠を取得し、待った時間を記録する
+    """
+    start = time.perf_counter()
+    try:
+        return solver_pool.acquire(solver_parameters)
+    finally:
+        solver_pool_wait_duration.observe(time.perf_counter() - start)
+
+def warm_up():
+    """
+    小さなモデルを 1 回解き、CP-SAT のライブラリの読み込みと初期化を最初のリクエストの前に済ませる
+    gunicorn ではワーカープロセスの起動直後（post_fork）に呼び出す 2 回目以降の呼び出しは何もしない
+    """
+    with warm_up_lock:
+        if solver_warmed_up.is_set():
+            return
+        start = time.perf_counter()
+        shift_schedule_model = build_shift_schedule_model(
+            shifts = [Shift(date=1, required_staff_count=1, required_attendance_tiers=[], required_attendance_tier_count=0)],
+            staffs = [Staff(id=1, tier=1, desired_off_days=[], work_days=1)],
+            locked = [],
+            seed = 0
         )
-        for lock in data['locked']
+        shift_schedule_model.solve(SolverParameters(max_time_in_seconds=5.0, num_search_workers=1))
+        solver_warmed_up.set()
+        logger.info(f'solver warmed up in {time.perf_counter() - start:.3f}s')
+
+@app.route("/healthz", methods=['GET'])
+def healthz():
+    """
+    プロセスが応答できることを返す（liveness）
+    """
+    return jsonify({'status': 'ok'}), 200
+
+@app.route("/readyz", methods=['GET'])
+def readyz():
+    """
+    リクエストを受け付けられることを返す（readiness）
+    CP-SAT の初期化が済んでいない場合は warm_up() を実行し、探索の枠がすべて使用中で待ちがある場合は 503 を返す
+    """
+    warm_up()
+    stats = solver_pool.stats()
+    ready = stats['waiting'] == 0
+    body = {
+        'status': 'ready' if ready else 'busy',
+        'solverPool': {_to_camel_case(key): value for key, value in stats.items()}
+    }
+    return jsonify(body), 200 if ready else 503
+
+def create_solver_parameters(params):
+    """
+    リクエストの solverParameters でサーバーのデフォルト値を上書きした SolverParameters を作成する
+    値は parse_solver_parameters() で検証し、不正な場合は ValidationError を送出する
+
+    Parameters:
+        - params: dict, リクエストの solverParameters 省略された場合は None
+    """
+    return replace(default_solver_parameters, **parse_solver_parameters(params))
+
+def read_request_body():
+    """
+    リクエストボディを Content-Type に従って JSON または MessagePack として読み込んで返す
+    Content-Encoding が gzip の場合は展開してから読み込む
+    どちらの形式でもない場合や、読み込めない場合は InvalidRequestError を送出する
+    """
+    mimetype = JSON_MIMETYPE if request.is_json else REQUEST_MEDIA_TYPES.get(request.mimetype)
+    if mimetype is None:
+        raise InvalidRequestError("Expected JSON or MessagePack")
+
+    try:
+        return decode_body(decompress(request.get_data(), request.headers.get('Content-Encoding')), mimetype)
+    except ValueError as e:
+        raise InvalidRequestError(str(e))
+
+def get_response_format():
+    """
+    クエリパラメータ format からレスポンスの shifts の形式を返す 省略した場合は 'cells'
+    """
+    response_format = request.args.get('format', 'cells')
+    if response_format not in RESPONSE_FORMATS:
+        raise InvalidRequestError(f"format must be one of {', '.join(RESPONSE_FORMATS)}")
+    return response_format
+
+def parse_consecutive_days_limits(data):
+    """
+    リクエストの店舗の maxConsecutiveWorkDays, minConsecutiveRestDays を検証し、
+    build_shift_schedule_model() と ScheduleEvaluator のキーワード引数の辞書を返す
+    """
+    limits = {}
+    for key, name, default in (
+        ('maxConsecutiveWorkDays', 'max_consecutive_work_days', StaffConstraints.MAX_CONSECUTIVE_WORK_DAYS),
+        ('minConsecutiveRestDays', 'min_consecutive_rest_days', StaffConstraints.MIN_CONSECUTIVE_REST_DAYS)
+    ):
+        value = data.get(key, default)
+        if type(value) is not int or value < 1:
+            raise InvalidRequestError(f"{key} must be a positive integer")
+        limits[name] = value
+    return limits
+
+def parse_optimize_request():
+    """
+    リクエストボディから parse_optimize_payload() で model_inputs と SolverParameters を作成する
+    """
+    return parse_optimize_payload(read_request_body())
+
+def parse_optimize_payload(data):
+    """
+    1 店舗分の最適化の入力から Shift, Staff, LockedShift のリストと SolverParameters を作成する
+    入力が不正な場合は、誤りの位置を含むメッセージで InvalidRequestError を送出する
+
+    戻り値:
+        - (model_inputs, solver_parameters) のタプル
+          model_inputs は build_shift_schedule_model() のキーワード引数となる辞書
+    """
+    # モデルを作成する前に入力を検証し、Shift, Staff, LockedShift, AssignedShift のリストを作成する
+    # 前回の解 (レスポンスの shifts と同じ形式) が送られた場合は、前回の解から探索を始める
+    try:
+        schedule_inputs = parse_schedule_inputs(data)
+    except ValidationError as e:
+        raise InvalidRequestError(str(e))
+
+    try:
+        solver_parameters = create_solver_parameters(data.get('solverParameters'))
+        relax_weights = parse_relax_weights(data.get('relaxWeights'))
+    except ValidationError as e:
+        raise InvalidRequestError(str(e))
+
+    # 緩和モードではルールを満たせない場合でも、違反を最小にした解を返す
+    relax = data.get('relax', False)
+    if not isinstance(relax, bool):
+        raise InvalidRequestError("relax must be a boolean")
+    if relax and 'maxTimeInSeconds' not in (data.get('solverParameters') or {}):
+        solver_parameters = replace(solver_parameters, max_time_in_seconds=relaxed_max_time_in_seconds)
+
+    previous_mode = data.get('previousMode', 'hint')
+    if previous_mode not in PREVIOUS_MODES:
+        raise InvalidRequestError(f"previousMode must be one of {', '.join(PREVIOUS_MODES)}")
+
+    # 交換可能なスタッフを区別するノイズを目的関数に加えず、探索を速くする
+    symmetry_breaking = data.get('symmetryBreaking', 'none')
+    if symmetry_breaking not in SYMMETRY_BREAKING_MODES:
+        raise InvalidRequestError(f"symmetryBreaking must be one of {', '.join(SYMMETRY_BREAKING_MODES)}")
+
+    # 'hint' は貪欲法のシフト表を初期解にし、'fast' は探索せずに貪欲法のシフト表と違反を返す
+    heuristic = data.get('heuristic', 'none')
+    if heuristic not in HEURISTIC_MODES:
+        raise InvalidRequestError(f"heuristic must be one of {', '.join(HEURISTIC_MODES)}")
+
+    shift_balance_mode = data.get('shiftBalanceMode', 'max')
+    if shift_balance_mode not in ShiftBalanceTierObjectives.MODES:
+        raise InvalidRequestError(f"shiftBalanceMode must be one of {', '.join(ShiftBalanceTierObjectives.MODES)}")
+
+    randomization_density = data.get('randomizationDensity', DEFAULT_RANDOMIZATION_DENSITY)
+    if type(randomization_density) not in (int, float) or not 0 < randomization_density <= 1:
+        raise InvalidRequestError("randomizationDensity must be a number greater than 0 and less than or equal to 1")
+
+    seed = data.get('seed')
+    if seed is not None and (type(seed) is not int or seed < 0):
+        raise InvalidRequestError("seed must be a non-negative integer")
+
+    # 'automaton' は連勤の制約をスタッフごとに 1 つの AddAutomaton で表す（緩和モードと診断では 'window' を使用する）
+    consecutive_encoding = data.get('consecutiveEncoding', 'window')
+    if consecutive_encoding not in CONSECUTIVE_ENCODINGS:
+        raise InvalidRequestError(f"consecutiveEncoding must be one of {', '.join(CONSECUTIVE_ENCODINGS)}")
+
+    model_inputs = {
+        **schedule_inputs,
+        'previous_mode': previous_mode,
+        'shift_balance_mode': shift_balance_mode,
+        'relax': relax,
+        'relax_weights': relax_weights,
+        'symmetry_breaking': symmetry_breaking,
+        'heuristic': heuristic,
+        'randomization_density': float(randomization_density),
+        **parse_consecutive_days_limits(data),
+        'consecutive_encoding': consecutive_encoding
+    }
+    # seed が指定されない場合は入力から作成し、どのエンドポイントでも同じ入力には同じ解を返す
+    model_inputs['seed'] = seed if seed is not None else seed_from_cache_key(compute_cache_key(model_inputs, solver_parameters))
+    return model_inputs, solver_parameters
+
+def _to_camel_case(name):
+    head, *tail = name.split('_')
+    return head + ''.join(word.capitalize() for word in tail)
+
+def serialize_rules(rules):
+    """
+    find_conflicting_rules() や Relaxation.violations() のルールの辞書を、キーをキャメルケースにしたレスポンス用の辞書に変換する
+    ex) {'type': 'work_days', 'staff_id': 1, 'work_days': 20} -> {'type': 'workDays', 'staffId': 1, 'workDays': 20}
+    """
+    return [
+        {
+            _to_camel_case(key): _to_camel_case(value) if key == 'type' else value
+            for key, value in rule.items()
+        }
+        for rule in rules
     ]
 
-    staff_constraints = StaffConstraints(staffs)
-    shift_constraints = ShiftConstraints(shifts)
-    required_attendance_constraints = RequiredAttendanceConstraints(shifts, staffs)
-    shift_schedule_model = ShiftScheduleModel(shifts, staffs, locked)
-    shift_schedule_model.add_constraints([
-        staff_constraints,
-        shift_constraints,
-        required_attendance_constraints
-    ])
-
-    staff_objectives = StaffObjectives(staffs)
-    shift_balance_tier_objectives = ShiftBalanceTierObjectives(shifts, staffs)
-    randomized_objective = RandomizedObjective()
-    shift_schedule_model.add_objectives([
-        staff_objectives,
-        shift_balance_tier_objectives,
-        randomized_objective
-    ])
-
-    shift_list = shift_schedule_model.solve()
-
-    return jsonify(shift_list), 200
+def serialize_staff_values(values, key):
+    """
+    スタッフIDをキーとする辞書を、スタッフID順の {'staffId': スタッフID, key: 値} のリストに変換する
+    JSON のオブジェクトのキーは文字列になるため、スタッフIDを値として返す
+    """
+    return [{'staffId': staff_id, key: value} for staff_id, value in sorted((values or {}).items())]
+
+def serialize_schedule(schedule, response_format):
+    """
+    ScheduleValues を response_format の形式に変換する 解がない場合は None を返す
+    """
+    if schedule is None:
+        return None
+    if response_format == 'columnar':
+        return schedule.to_columnar()
+    if response_format == 'packed':
+        return schedule.to_packed()
+    return schedule.to_shift_list()
+
+def serialize_solve_result(result, response_format='cells'):
+    """
+    SolveResult をレスポンス用の辞書に変換する
+    result が None（まだ解が見つかっていない）の場合は shifts, solver ともに None とする
+
+    Parameters:
+        - result: SolveResult
+        - response_format: str, shifts の形式 RESPONSE_FORMATS のいずれか
+    """
+    if result is None:
+        return {'shifts': None, 'solver': None}
+
+    serialized = {
+        'shifts': serialize_schedule(result.schedule, response_format),
+        'solver': {
+            'status': result.status,
+            'objectiveValue': result.objective_value,
+            'bestObjectiveBound': result.best_objective_bound,
+            'wallTime': result.wall_time
+        }
+    }
+    if result.conflicts is not None:
+        serialized['conflicts'] = serialize_rules(result.conflicts)
+    if result.violations is not None:
+        serialized['violations'] = serialize_rules(result.violations)
+    if result.stats is not None:
+        serialized['solver']['stats'] = {_to_camel_case(key): value for key, value in result.stats.items()}
+    return serialized
+
+def serialize_evaluation(evaluation):
+    """
+    ScheduleEvaluator.evaluate() の結果を、キーをキャメルケースにしたレスポンス用の辞書に変換する
+    """
+    return {
+        'objective': {_to_camel_case(key): value for key, value in evaluation['objective'].items()},
+        'staffs': [{_to_camel_case(key): value for key, value in staff.items()} for staff in evaluation['staffs']],
+        'days': [{_to_camel_case(key): value for key, value in day.items()} for day in evaluation['days']],
+        'violations': serialize_rules(evaluation['violations'])
+    }
+
+def evaluate_schedule(model_inputs, schedule):
+    """
+    解のシフト表（ScheduleValues）を model_inputs のルールと目的関数で評価する
+    """
+    evaluator = ScheduleEvaluator(
+        model_inputs['shifts'], model_inputs['staffs'], model_inputs['locked'], model_inputs.get('shift_balance_mode', 'max'),
+        model_inputs.get('max_consecutive_work_days', StaffConstraints.MAX_CONSECUTIVE_WORK_DAYS),
+        model_inputs.get('min_consecutive_rest_days', StaffConstraints.MIN_CONSECUTIVE_REST_DAYS)
+    )
+    return evaluator.evaluate(schedule.is_working)
+
+@app.route("/api/v1/optimize", methods=['POST'])
+def optimize_shifts():
+    """
+    1 店舗分のシフトを最適化する
+    フェーズごとの所要時間を Server-Timing ヘッダーで返し、/metrics のヒストグラムに記録する
+    ?profile=1 の場合はキャッシュを使わずにモデルを作成し、作成フェーズの cProfile の結果を profile に返す
+    """
+    timer = PhaseTimer()
+    profiler = BuildProfiler(enabled=request.args.get('profile') == '1')
+
+    with timer.phase('parse'):
+        response_format = get_response_format()
+        model_inputs, solver_parameters = parse_optimize_request()
+        cache_key = compute_cache_key(model_inputs, solver_parameters)
+
+    def solve():
+        with timer.phase('queue'):
+            slot = acquire_solver_slot(solver_parameters)
+        with slot:
+            # キャッシュした解と解き直した解が一致するように、ランダムシードは parse_optimize_payload() で入力から作成している
+            with profiler:
+                shift_schedule_model = build_shift_schedule_model(**model_inputs)
+            result = shift_schedule_model.solve(slot.solver_parameters)
+            timer.update(shift_schedule_model.timings, prefix='model.')
+            optimize_model_variables.observe(result.stats['num_variables'])
+            if snapshot_store is not None:
+                snapshot_store.capture(shift_schedule_model, model_inputs, slot.solver_parameters, result, shift_schedule_model.timings, name=cache_key[:12])
+            if result.status == 'INFEASIBLE':
+                # 解がない場合は原因となるルールの組み合わせを診断し、結果と一緒にキャッシュする
+                with timer.phase('diagnose'):
+                    diagnosis_model = build_shift_schedule_model(**model_inputs, diagnose=True)
+                    result.conflicts = diagnosis_model.find_conflicting_rules(diagnosis_max_time_in_seconds)
+        return result
+
+    if profiler.enabled:
+        result, hit = solve(), False
+    else:
+        result, hit = result_cache.get_or_compute(cache_key, solve, lambda result: result.status in CACHEABLE_STATUSES)
+        optimize_cache_lookups.inc('hit' if hit else 'miss')
+    if not hit:
+        optimize_solver_status.inc(result.status)
+
+    with timer.phase('serialize'):
+        body = serialize_solve_result(result, response_format)
+        if result.status == 'INFEASIBLE':
+            body = {"error": "No feasible schedule", **body}
+        if profiler.enabled:
+            body['profile'] = profiler.report()
+        if request.args.get('evaluate') == '1' and result.schedule is not None:
+            body['evaluation'] = serialize_evaluation(evaluate_schedule(model_inputs, result.schedule))
+        response = create_response(body)
+    status_code = 422 if result.status == 'INFEASIBLE' else 200
+
+    for phase, seconds in timer.timings.items():
+        optimize_phase_duration.observe(seconds, phase)
+    logger.info(json.dumps({
+        'event': 'optimize',
+        'cache': 'hit' if hit else 'miss',
+        'status': result.status,
+        'timings': timer.timings,
+        'stats': result.stats
+    }))
+
+    response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+    response.headers['Server-Timing'] = timer.server_timing()
+    return response, status_code
+
+def format_server_sent_event(event, result, response_format='cells'):
+    """
+    SolveResult を Server-Sent Events の 1 イベント分の文字列に変換する
+    """
+    data = {**serialize_solve_result(result, response_format), 'timestamp': time.time()}
+    return f"event: {event}\ndata: {json.dumps(data, default=encode_json_value)}\n\n"
+
+@app.route("/api/v1/optimize/stream", methods=['POST'])
+def stream_optimize_shifts():
+    """
+    改善解が見つかるたびに solution イベントを送り、探索が終わったら最終結果を result イベントとして送る
+    クライアントが接続を切った場合は探索を打ち切る
+    """
+    response_format = get_response_format()
+    model_inputs, solver_parameters = parse_optimize_request()
+
+    # 探索の枠はレスポンスを閉じるときに返却する（ジェネレータが開始されずに閉じられた場合も含む）
+    slot = acquire_solver_slot(solver_parameters)
+    try:
+        shift_schedule_model = build_shift_schedule_model(**model_inputs)
+    except Exception:
+        slot.release()
+        raise
+
+    def generate():
+        solutions = shift_schedule_model.iter_solutions(slot.solver_parameters)
+        try:
+            for event, result in solutions:
+                yield format_server_sent_event(event, result, response_format)
+        finally:
+            solutions.close()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(slot.release)
+    return response
+
+@app.route("/api/v1/optimize/batch", methods=['POST'])
+def optimize_shifts_batch():
+    """
+    複数店舗の最適化をまとめて受け付け、プロセスプールで並列に解く
+    リクエストは { stores: [{ id, shifts, staffs, locked, solverParameters? }, ...], deadlineSeconds? } の形式とする
+    入力が不正な店舗や締め切りまでに解けなかった店舗は、その店舗の error に理由を返す
+    """
+    response_format = get_response_format()
+    data = read_request_body()
+    if not isinstance(data, dict) or not isinstance(data.get('stores'), list):
+        raise InvalidRequestError("Missing required parameters")
+
+    deadline_seconds = data.get('deadlineSeconds')
+    if deadline_seconds is not None and (not isinstance(deadline_seconds, (int, float)) or deadline_seconds <= 0):
+        raise InvalidRequestError("deadlineSeconds must be a positive number")
+
+    start = time.perf_counter()
+    results = []
+    problems = []
+    for index, store in enumerate(data['stores']):
+        store_id = store.get('id', index) if isinstance(store, dict) else index
+        try:
+            model_inputs, solver_parameters = parse_optimize_payload(store)
+        except (InvalidRequestError, KeyError, TypeError, ValueError) as e:
+            results.append(BatchItemResult(id=store_id, error=f"Invalid store: {e!s}"))
+            continue
+        results.append(None)
+        problems.append((store_id, model_inputs, solver_parameters))
+
+    solved = iter(solve_batch(problems, solver_pool, deadline_seconds, batch_max_workers))
+    results = [result if result is not None else next(solved) for result in results]
+
+    return create_response({
+        'results': [
+            {'id': item.id, 'error': item.error, **serialize_solve_result(item.result, response_format)}
+            for item in results
+        ],
+        'wallTime': time.perf_counter() - start
+    }), 200
+
+@app.route("/api/v1/optimize/horizon", methods=['POST'])
+def optimize_shifts_horizon():
+    """
+    複数か月のシフトをローリングホライズンで順に解く
+    リクエストは { periods: [{ shifts, staffs, locked, solverParameters?, ... }, ...], lookaheadDays? } の形式とし、
+    periods は /api/v1/optimize と同じ 1 か月分の入力を期間の順に並べたもの
+    各期間は次の期間の最初の lookaheadDays 日を先読みして解き、月末からの連勤数と出勤数の不足を次の期間に引き継ぐ
+    results の consecutiveWorkDaysBefore, consecutiveRestDaysBefore, workDaysCarryOver は、その期間が引き継いだ値の
+    [{ staffId, consecutiveWorkDaysBefore }], [{ staffId, consecutiveRestDaysBefore }], [{ staffId, workDaysCarryOver }]
+    """
+    response_format = get_response_format()
+    data = read_request_body()
+    if not isinstance(data, dict) or not isinstance(data.get('periods'), list) or not data['periods']:
+        raise InvalidRequestError("Missing required parameters")
+
+    lookahead_days = data.get('lookaheadDays', DEFAULT_LOOKAHEAD_DAYS)
+    if type(lookahead_days) is not int or lookahead_days < 0:
+        raise InvalidRequestError("lookaheadDays must be a non-negative integer")
+
+    periods = []
+    for index, period in enumerate(data['periods']):
+        try:
+            periods.append(parse_optimize_payload(period))
+        except InvalidRequestError as e:
+            raise InvalidRequestError(f"periods[{index}]: {e!s}")
+
+    start = time.perf_counter()
+    # 期間ごとの探索は順に実行するため、枠は 1 つだけ使う
+    with acquire_solver_slot(None):
+        periods = [
+            (model_inputs, replace(solver_parameters, num_search_workers=solver_parameters.num_search_workers or solver_pool.search_workers))
+            for model_inputs, solver_parameters in periods
+        ]
+        results = solve_rolling_horizon(periods, lookahead_days)
+    return create_response({
+        'results': [
+            {
+                'error': item.error,
+                'lookaheadDays': item.lookahead_days,
+                'consecutiveWorkDaysBefore': serialize_staff_values(item.consecutive_work_days_before, 'consecutiveWorkDaysBefore'),
+                'consecutiveRestDaysBefore': serialize_staff_values(item.consecutive_rest_days_before, 'consecutiveRestDaysBefore'),
+                'workDaysCarryOver': serialize_staff_values(item.work_days_carry_over, 'workDaysCarryOver'),
+                **serialize_solve_result(item.result, response_format)
+            }
+            for item in results
+        ],
+        'wallTime': time.perf_counter() - start
+    }), 200
+
+@app.route("/api/v1/optimize/alternatives", methods=['POST'])
+def optimize_shifts_alternatives():
+    """
+    1 店舗分のシフトについて、互いに異なる複数の解を 1 回のリクエストで求める
+    リクエストは /api/v1/optimize の入力に count（解の数）と minDifference（解の間で異なるセル数の下限）を加えたものとする
+    解を求めるたびにその解を除く制約を追加して解き直すため、results は目的関数の値が良い順に並ぶ
+    solverParameters は 1 回の探索ごとに適用する
+    """
+    response_format = get_response_format()
+    data = read_request_body()
+    model_inputs, solver_parameters = parse_optimize_payload(data)
+
+    count = data.get('count', 3)
+    if type(count) is not int or not 1 <= count <= max_alternatives:
+        raise InvalidRequestError(f"count must be an integer between 1 and {max_alternatives}")
+    min_difference = data.get('minDifference', 2)
+    if type(min_difference) is not int or min_difference < 1:
+        raise InvalidRequestError("minDifference must be a positive integer")
+
+    start = time.perf_counter()
+    with acquire_solver_slot(solver_parameters) as slot:
+        shift_schedule_model = build_shift_schedule_model(**model_inputs)
+        results = shift_schedule_model.solve_alternatives(count, slot.solver_parameters, min_difference)
+    body = {
+        'results': [serialize_solve_result(result, response_format) for result in results if result.schedule is not None],
+        'wallTime': time.perf_counter() - start
+    }
+    if results[0].schedule is None:
+        return create_response({"error": "No feasible schedule", 'solver': serialize_solve_result(results[0])['solver'], **body}), 422
+    return create_response(body), 200
+
+def solve_session(session, solver_parameters=None):
+    """
+    探索の枠を取得してセッションを解き直す 解がない場合は、編集後の入力から作成したモデルで原因を診断する
+    """
+    with acquire_solver_slot(solver_parameters or session.solver_parameters) as slot:
+        result = session.solve(slot.solver_parameters)
+        if result.status == 'INFEASIBLE':
+            diagnosis_model = build_shift_schedule_model(**session.model_inputs, diagnose=True)
+            result.conflicts = diagnosis_model.find_conflicting_rules(diagnosis_max_time_in_seconds)
+    return result
+
+def serialize_session_result(session_id, result, response_format):
+    """
+    セッションの SolveResult をレスポンスに変換する 解がない場合は 422 とする
+    """
+    body = {'sessionId': session_id, **serialize_solve_result(result, response_format)}
+    if result is not None and result.status == 'INFEASIBLE':
+        return create_response({"error": "No feasible schedule", **body}), 422
+    return create_response(body), 200
+
+@app.route("/api/v1/sessions", methods=['POST'])
+def create_session():
+    """
+    1 店舗分のモデルを構築して解き、以降の編集を差分として適用できるセッションを作成する
+    リクエストは /api/v1/optimize と同じ入力とする（symmetryBreaking, heuristic, previousMode 'lock' は使用できない）
+    """
+    response_format = get_response_format()
+    model_inputs, solver_parameters = parse_optimize_request()
+    try:
+        session = ScheduleSession(model_inputs, solver_parameters)
+    except ValueError as e:
+        raise InvalidRequestError(str(e))
+
+    result = solve_session(session)
+    session_id = session_store.add(session)
+    body, status_code = serialize_session_result(session_id, result, response_format)
+    return body, 201 if status_code == 200 else status_code
+
+@app.route("/api/v1/sessions/<session_id>", methods=['GET'])
+def get_session(session_id):
+    response_format = get_response_format()
+    session = session_store.get(session_id)
+    if session is None:
+        return create_response({"error": "Session not found"}), 404
+
+    return serialize_session_result(session_id, session.result, response_format)
+
+@app.route("/api/v1/sessions/<session_id>", methods=['PATCH'])
+def edit_session(session_id):
+    """
+    セッションのモデルに編集（ロック、ロックの解除、希望休の追加と削除）を適用し、前回の解から解き直す
+    solverParameters を指定した場合は、セッションの作成時のパラメータの代わりに使用する
+    """
+    response_format = get_response_format()
+    data = read_request_body()
+    session = session_store.get(session_id)
+    if session is None:
+        return create_response({"error": "Session not found"}), 404
+
+    try:
+        edits = parse_schedule_edits(data, session.dates, session.staff_ids)
+        solver_parameters = create_solver_parameters(data['solverParameters']) if 'solverParameters' in data else None
+    except (TypeError, ValueError) as e:
+        raise InvalidRequestError(str(e))
+
+    with session.lock:
+        session.apply_edits(edits)
+        result = solve_session(session, solver_parameters)
+    return serialize_session_result(session_id, result, response_format)
+
+@app.route("/api/v1/sessions/<session_id>", methods=['DELETE'])
+def delete_session(session_id):
+    if not session_store.delete(session_id):
+        return create_response({"error": "Session not found"}), 404
+
+    return '', 204
+
+@app.route("/api/v1/evaluate", methods=['POST'])
+def evaluate_shifts():
+    """
+    手で編集したシフト表などを、探索せずにルールと目的関数で評価する
+    リクエストは /api/v1/optimize の入力に、評価するシフト表 schedule（レスポンスの shifts と同じ形式）を加えたものとする
+    schedule に含まれないセルは出勤しないものとする
+    """
+    data = read_request_body()
+    try:
+        inputs = parse_evaluation_inputs(data)
+    except ValidationError as e:
+        raise InvalidRequestError(str(e))
+
+    shift_balance_mode = data.get('shiftBalanceMode', 'max')
+    if shift_balance_mode not in ShiftBalanceTierObjectives.MODES:
+        raise InvalidRequestError(f"shiftBalanceMode must be one of {', '.join(ShiftBalanceTierObjectives.MODES)}")
+
+    start = time.perf_counter()
+    evaluator = ScheduleEvaluator(inputs['shifts'], inputs['staffs'], inputs['locked'], shift_balance_mode, **parse_consecutive_days_limits(data))
+    evaluation = evaluator.evaluate(evaluator.to_matrix(inputs['schedule']))
+    return create_response({**serialize_evaluation(evaluation), 'wallTime': time.perf_counter() - start}), 200
+
+@app.route("/api/v1/optimize/jobs", methods=['POST'])
+def create_optimize_job():
+    model_inputs, solver_parameters = parse_optimize_request()
+
+    job_id = job_manager.submit(model_inputs, solver_parameters)
+
+    return create_response({'id': job_id, 'status': job_manager.get(job_id)['status']}), 202
+
+@app.route("/api/v1/optimize/jobs/<job_id>", methods=['GET'])
+def get_optimize_job(job_id):
+    response_format = get_response_format()
+    state = job_manager.get(job_id)
+    if state is None:
+        return create_response({"error": "Job not found"}), 404
+
+    return create_response({
+        'id': job_id,
+        'status': state['status'],
+        'error': state.get('error'),
+        **serialize_solve_result(state['result'], response_format)
+    }), 200
+
+@app.route("/api/v1/optimize/jobs/<job_id>", methods=['DELETE'])
+def cancel_optimize_job(job_id):
+    """
+    実行前ないし実行中のジョブをキャンセルし、202 を返す
+    すでに終了したジョブの場合は、終了時のステータスとともに 409 を返す
+    """
+    cancelled = job_manager.cancel(job_id)
+    if cancelled is None:
+        return create_response({"error": "Job not found"}), 404
+
+    status = job_manager.get(job_id)['status']
+    if not cancelled:
+        return create_response({"error": "Job already finished", 'id': job_id, 'status': status}), 409
+    return create_response({'id': job_id, 'status': status}), 202
@@ -0,0 +1,129 @@
+import time
+import logging
+import threading
+from dataclasses import dataclass, replace
+from concurrent.futures import ProcessPoolExecutor, wait
+from models.builder import build_shift_schedule_model
+from solver_pool import SolverPoolTimeout
+logger = logging.getLogger(__name__)
+
+# 全体の締め切りを過ぎた後、実行中の探索が打ち切られて結果を返すまで待つ時間（秒）
+DEADLINE_GRACE_SECONDS = 5.0
+
+@dataclass
+class BatchItemResult:
+    """
+    バッチ最適化の 1 店舗分の結果を保持するクラス
+
+    属性:
+    - id: リクエストで指定された店舗の識別子
+    - result (SolveResult): 求解できた場合の結果
+    - error (str): 入力が不正な場合や、締め切りまでに実行できなかった場合のエラーメッセージ
+    """
+    id: object
+    result: object = None
+    error: str = None
+
+def _solve_store(model_inputs, solver_parameters, deadline):
+    """
+    ワーカープロセスで 1 店舗分のモデルを構築して解く
+    探索時間は店舗ごとの max_time_in_seconds と、全体の締め切りまでの残り時間の短い方とする
+
+    Parameters:
+        - model_inputs: dict, build_shift_schedule_model() のキーワード引数
+        - solver_parameters: SolverParameters
+        - deadline: float, 全体の締め切り（time.time() の値） None の場合は締め切りなし
+    """
+    if deadline is not None:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise TimeoutError("Batch deadline exceeded before the solve started")
+        max_time = solver_parameters.max_time_in_seconds
+        solver_parameters = replace(
+            solver_parameters,
+            max_time_in_seconds = remaining if max_time is None else min(max_time, remaining)
+        )
+
+    shift_schedule_model = build_shift_schedule_model(**model_inputs)
+    return shift_schedule_model.solve(solver_parameters)
+
+def solve_batch(problems, solver_pool, deadline_seconds=None, max_workers=None):
+    """
+    独立した複数店舗のモデルをプロセスプールで並列に解く
+
+    店舗ごとに solver_pool の探索の枠を取得してからプロセスプールに投入し、解き終わったら枠を返却する
+    同期エンドポイントや非同期ジョブと同じ枠を使うため、探索スレッドの合計は CPU コア数を超えない
+    同時に解く店舗数は店舗数、max_workers、solver_pool.size の最も小さい値とし、
+    店舗ごとに探索スレッド数が指定されていない場合は枠に割り当てられたスレッド数とする
+    締め切り（締め切りがない場合は solver_pool の queue_timeout）までに枠を取得できなかった店舗は error とする
+
+    Parameters:
+        - problems: list, (id, model_inputs, solver_parameters) のタプルのリスト
+        - solver_pool: SolverPool, 探索の枠を共有するプール
+        - deadline_seconds: float, 全体の締め切りまでの時間（秒） None の場合は締め切りなし
+        - max_workers: int, 同時に解く店舗数の上限 省略した場合は solver_pool.size
+
+    戻り値:
+        - BatchItemResult のリスト（problems と同じ順）
+    """
+    if not problems:
+        return []
+
+    pool_size = min(len(problems), max_workers or solver_pool.size, solver_pool.size)
+    running = threading.BoundedSemaphore(pool_size)
+    deadline = time.time() + deadline_seconds if deadline_seconds is not None else None
+
+    def acquire_slot(solver_parameters):
+        """
+        同時に解く店舗数の上限と探索の枠が空くまで待ち、SolverSlot を返す
+        """
+        timeout = max(0.0, deadline - time.time()) if deadline is not None else solver_pool.queue_timeout
+        if not running.acquire(timeout=timeout):
+            raise SolverPoolTimeout(f"No solver slot became free within {timeout} seconds")
+        try:
+            timeout = max(0.0, deadline - time.time()) if deadline is not None else solver_pool.queue_timeout
+            return solver_pool.acquire(solver_parameters, timeout=timeout)
+        except SolverPoolTimeout:
+            running.release()
+            raise
+
+    def release_slot(slot):
+        slot.release()
+        running.release()
+
+    results = [BatchItemResult(id=problem_id) for problem_id, _, _ in problems]
+    # with 文で使うと終了時の shutdown(wait=True) が締め切りを過ぎた探索の終了まで待つため、明示的に作成して待たずに停止する
+    executor = ProcessPoolExecutor(max_workers=pool_size)
+    try:
+        futures = {}
+        for index, (_, model_inputs, solver_parameters) in enumerate(problems):
+            try:
+                slot = acquire_slot(solver_parameters)
+            except SolverPoolTimeout as e:
+                error = "Batch deadline exceeded" if deadline is not None else str(e)
+                for item in results[index:]:
+                    item.error = error
+                break
+            future = executor.submit(_solve_store, model_inputs, slot.solver_parameters, deadline)
+            future.add_done_callback(lambda _, slot=slot: release_slot(slot))
+            futures[future] = index
+
+        timeout = deadline - time.time() + DEADLINE_GRACE_SECONDS if deadline is not None else None
+        done, not_done = wait(futures, timeout=timeout)
+
+        for future in done:
+            item = results[futures[future]]
+            try:
+                item.result = future.result()
+            except Exception as e:
+                logger.error(f'batch item {item.id} failed: {e!r}')
+                item.error = str(e) or e.__class__.__name__
+
+        for future in not_done:
+            future.cancel()
+            results[futures[future]].error = "Batch deadline exceeded"
+    finally:
+        # 締め切りを過ぎた探索は max_time_in_seconds で打ち切られ、終了時に done コールバックで枠を返却する
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
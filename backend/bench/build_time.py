@@ -0,0 +1,41 @@
+"""
+モデル構築時間のベンチマーク
+
+スタッフ数を変えながら ShiftScheduleModel の構築（制約・目的関数の追加まで）にかかる時間を計測する
+backend ディレクトリで以下のように実行する
+
+    python -m bench.build_time
+    python -m bench.build_time --staff 50 100 300 --days 31 --repeat 3
+"""
+import argparse
+import time
+from bench.generators import generate_store
+from models.builder import build_shift_schedule_model
+
+def measure_build_time(staff_count, days, repeat):
+    """
+    モデル構築時間を repeat 回計測し、最小値（秒）を返す
+    """
+    shifts, staffs, locked = generate_store(staff_count, days)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build_shift_schedule_model(shifts, staffs, locked, seed=0)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description='ShiftScheduleModel の構築時間を計測する')
+    parser.add_argument('--staff', type=int, nargs='+', default=[50, 200, 300, 1000])
+    parser.add_argument('--days', type=int, default=31)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'staff':>6} {'cells':>8} {'build [ms]':>12} {'per cell [us]':>14}")
+    for staff_count in args.staff:
+        elapsed = measure_build_time(staff_count, args.days, args.repeat)
+        cells = staff_count * args.days
+        print(f'{staff_count:>6} {cells:>8} {elapsed * 1000:>12.1f} {elapsed / cells * 1e6:>14.2f}')
+
+if __name__ == '__main__':
+    main()
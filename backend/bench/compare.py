@@ -0,0 +1,61 @@
+"""
+bench.run の出力 JSON を 2 つ比較し、シナリオごとの変化を表示する
+
+閾値を超えて遅くなった（ないしメモリが増えた）項目があれば終了コード 1 を返すため、CI でのリグレッション検知に使える
+
+    python -m bench.compare before.json after.json --threshold 0.2
+"""
+import sys
+import json
+import argparse
+
+# 比較する項目 いずれも小さいほど良い
+METRICS = ['build_time', 'variables', 'constraints', 'time_to_first_solution', 'time_to_optimal', 'peak_memory_kb']
+
+# 計測誤差の影響を受けやすい短い時間は比較しない（秒）
+MIN_COMPARABLE_TIME = 0.05
+
+def _load(path):
+    with open(path) as f:
+        return {result['scenario']: result for result in json.load(f)['results']}
+
+def compare(before, after, threshold):
+    """
+    シナリオごとに各項目の変化率を計算し、(行のリスト, リグレッションの有無) を返す
+    """
+    rows = []
+    regressed = False
+    for scenario in sorted(set(before) & set(after)):
+        for metric in METRICS:
+            old, new = before[scenario].get(metric), after[scenario].get(metric)
+            if old is None or new is None:
+                if old is not None and new is None and metric == 'time_to_optimal':
+                    # 以前は最適解を証明できていたのに、時間内に証明できなくなった
+                    rows.append((scenario, metric, old, new, None, True))
+                    regressed = True
+                continue
+            if metric in ('build_time', 'time_to_first_solution', 'time_to_optimal') and max(old, new) < MIN_COMPARABLE_TIME:
+                continue
+            change = (new - old) / old if old else 0.0
+            is_regression = change > threshold
+            regressed = regressed or is_regression
+            rows.append((scenario, metric, old, new, change, is_regression))
+    return rows, regressed
+
+def main():
+    parser = argparse.ArgumentParser(description='bench.run の結果を比較する')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=0.2, help='リグレッションとみなす変化率')
+    args = parser.parse_args()
+
+    rows, regressed = compare(_load(args.before), _load(args.after), args.threshold)
+    for scenario, metric, old, new, change, is_regression in rows:
+        change_str = f'{change:+.1%}' if change is not None else 'n/a'
+        mark = ' REGRESSION' if is_regression else ''
+        print(f'{scenario:>24} {metric:>24} {old!s:>14} -> {new!s:>14} {change_str:>8}{mark}')
+
+    sys.exit(1 if regressed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import random
+from models.parameters import Staff, Shift, LockedShift
+from enums import Tier
+
+# 実店舗に近い役職の構成比（店長クラスが少なく、一般層と新人層が多い）
+DEFAULT_TIER_MIX = {
+    Tier.MANAGER.value: 0.05,
+    Tier.DAY_MANAGER.value: 0.1,
+    Tier.UPPER.value: 0.2,
+    Tier.MIDDLE.value: 0.35,
+    Tier.JUNIOR.value: 0.3,
+}
+
+def _assign_tiers(rng, staff_count, tier_mix):
+    """
+    tier_mix の構成比に従って役職を割り当てる
+    必須役職の制約を満たせるように、店長クラスと当日責任者は最低 1 人ずつ割り当てる
+    """
+    tiers = [Tier.MANAGER.value, Tier.DAY_MANAGER.value][:staff_count]
+    population = list(tier_mix.keys())
+    weights = list(tier_mix.values())
+    tiers += rng.choices(population, weights=weights, k=staff_count - len(tiers))
+    rng.shuffle(tiers)
+    return tiers
+
+def generate_store(
+    staff_count,
+    days=31,
+    seed=0,
+    tier_mix=None,
+    desired_off_density=0.1,
+    required_attendance_tiers=(Tier.MANAGER.value, Tier.DAY_MANAGER.value),
+    required_attendance_tier_count=1,
+    lock_ratio=0.0,
+    coverage=0.9,
+    busy_day_interval=7,
+    work_days=None
+):
+    """
+    ベンチマーク用の店舗データ（Staff, Shift, LockedShift のリスト）を生成する
+    同じ引数であれば同じデータを返す
+
+    Parameters:
+        - staff_count: int, スタッフ数
+        - days: int, シフトの日数
+        - seed: int, ランダムシード
+        - tier_mix: dict, 役職をキーとし、構成比を値とする辞書 省略した場合は DEFAULT_TIER_MIX
+        - desired_off_density: float, 日数に対する希望休の割合
+        - required_attendance_tiers: tuple, 必須役職
+        - required_attendance_tier_count: int, 必須役職の必要人数
+        - lock_ratio: float, 希望休のうち休みとしてロックする割合
+        - coverage: float, 全スタッフの出勤数の合計に対する、必要人数の合計の割合 1 に近いほど制約が厳しくなる
+        - busy_day_interval: int, 混雑日（必要人数 +1）の間隔 0 の場合は混雑日なし
+        - work_days: int, スタッフの出勤数 省略した場合は日数 - 10
+
+    戻り値:
+        - (shifts, staffs, locked) のタプル
+    """
+    rng = random.Random(seed)
+    tiers = _assign_tiers(rng, staff_count, tier_mix or DEFAULT_TIER_MIX)
+    work_days = work_days if work_days is not None else days - 10
+    desired_off_count = round(days * desired_off_density)
+
+    staffs = [
+        Staff(
+            id = staff_id,
+            tier = tiers[staff_id - 1],
+            desired_off_days = sorted(rng.sample(range(1, days + 1), desired_off_count)),
+            work_days = work_days
+        )
+        for staff_id in range(1, staff_count + 1)
+    ]
+
+    # 混雑日の必要人数を +1 しても、必要人数の合計が出勤数の合計 × coverage を超えないようにする
+    busy_days = set(range(busy_day_interval, days + 1, busy_day_interval)) if busy_day_interval else set()
+    total_required = int(staff_count * work_days * coverage) - len(busy_days)
+    required_staff_count = max(1, total_required // days)
+    shifts = [
+        Shift(
+            date = date,
+            required_staff_count = required_staff_count + (1 if date in busy_days else 0),
+            required_attendance_tiers = list(required_attendance_tiers),
+            required_attendance_tier_count = required_attendance_tier_count
+        )
+        for date in range(1, days + 1)
+    ]
+
+    locked = [
+        LockedShift(
+            date = day,
+            staff_id = staff.id,
+            is_working = False
+        )
+        for staff in staffs
+        for day in staff.desired_off_days
+        if rng.random() < lock_ratio
+    ]
+    return shifts, staffs, locked
@@ -0,0 +1,147 @@
+"""
+起動しているサーバーの /api/v1/optimize に同時にリクエストを送り、スループットとレイテンシを計測する負荷試験
+
+計測項目
+- throughput: 1 秒あたりに完了したリクエスト数
+- latency_p50, latency_p95, latency_p99, latency_max: リクエストのレイテンシ（秒）
+- status_counts: HTTP ステータスごとのリクエスト数
+
+同じ入力はキャッシュから返されるため、既定ではリクエストごとに seed を変えて毎回探索させる
+backend ディレクトリで以下のように実行する
+
+    gunicorn -c gunicorn.conf.py app:app
+    python -m bench.load --url http://localhost:5000 --scenario medium --concurrency 8 --requests 64 --output load.json
+"""
+import sys
+import json
+import time
+import argparse
+import urllib.error
+import urllib.request
+from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from bench.generators import generate_store
+from bench.scenarios import SCENARIOS
+
+def _to_camel_case(name):
+    head, *tail = name.split('_')
+    return head + ''.join(part.title() for part in tail)
+
+def _to_request(items):
+    return [{_to_camel_case(key): value for key, value in asdict(item).items()} for item in items]
+
+def create_payload(name, seed, max_time):
+    """
+    シナリオの店舗から /api/v1/optimize のリクエストボディを作成する
+    """
+    shifts, staffs, locked = generate_store(**SCENARIOS[name], seed=seed)
+    return {
+        'shifts': _to_request(shifts),
+        'staffs': _to_request(staffs),
+        'locked': _to_request(locked),
+        'solverParameters': {'maxTimeInSeconds': max_time}
+    }
+
+def send(url, payload, timeout):
+    """
+    1 件のリクエストを送り、(HTTP ステータス, レイテンシ) を返す 接続できなかった場合のステータスは None とする
+    """
+    body = json.dumps(payload).encode('utf-8')
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'}, method='POST')
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, TimeoutError):
+        status = None
+    return status, time.perf_counter() - start
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, round(q * (len(values) - 1)))]
+
+def run_load(url, payload, concurrency, requests, timeout, unique=True, seed_offset=0):
+    """
+    concurrency 並列で requests 件のリクエストを送り、計測結果の辞書を返す
+    unique の場合は seed_offset からの連番を seed とし、前の計測のキャッシュを使わないようにする
+    """
+    payloads = [{**payload, 'seed': seed_offset + index} if unique else payload for index in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        responses = list(executor.map(lambda body: send(url, body, timeout), payloads))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for status, latency in responses if status == 200]
+    status_counts = {}
+    for status, _ in responses:
+        status_counts[str(status)] = status_counts.get(str(status), 0) + 1
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed,
+        'latency_p50': _percentile(latencies, 0.5),
+        'latency_p95': _percentile(latencies, 0.95),
+        'latency_p99': _percentile(latencies, 0.99),
+        'latency_max': max(latencies) if latencies else None,
+        'status_counts': status_counts,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='同時リクエストでのスループットとレイテンシを計測する')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='medium')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--requests', type=int, default=32)
+    parser.add_argument('--max-time', type=float, default=5.0)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--same-input', action='store_true', help='すべてのリクエストで同じ入力を送る（キャッシュの効果を計測する）')
+    parser.add_argument('--output', help='結果を書き出す JSON ファイル 省略した場合は標準出力')
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/') + '/api/v1/optimize'
+    payload = create_payload(args.scenario, args.seed, args.max_time)
+
+    results = []
+    for round_index, concurrency in enumerate(args.concurrency):
+        result = run_load(
+            url, payload, concurrency, args.requests, args.timeout,
+            unique=not args.same_input, seed_offset=round_index * args.requests
+        )
+        results.append(result)
+        p50, p95 = result['latency_p50'], result['latency_p95']
+        print(
+            f"concurrency {concurrency:>3} {result['throughput']:.2f} req/s "
+            f"p50 {f'{p50:.3f}s' if p50 is not None else '-'} p95 {f'{p95:.3f}s' if p95 is not None else '-'} "
+            f"{result['status_counts']}",
+            file=sys.stderr
+        )
+
+    report = {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'url': url,
+            'scenario': args.scenario,
+            'seed': args.seed,
+            'max_time': args.max_time,
+            'same_input': args.same_input,
+        },
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+snapshots.py で保存したスナップショットを、ソルバーパラメータやワーカー数を変えて解き直し、記録された探索と比較する
+
+計測項目
+- time_to_first_solution: 最初の実行可能解が見つかるまでの時間（秒）
+- wall_time: 探索時間（秒） recorded_wall_time は保存時の探索時間
+- status, objective_value, best_objective_bound
+
+既定では保存した CpModelProto をそのまま解く --rebuild を指定した場合は、保存した入力から現在のコードでモデルを作り直すため、
+constraints.py などの変更を本番で遅かった入力で確かめられる
+backend ディレクトリで以下のように実行する
+
+    SNAPSHOT_DIR=/tmp/snapshots flask run
+    python -m bench.replay /tmp/snapshots/20240101T000000000000Z-0123456789ab --workers 1 4 8
+    python -m bench.replay /tmp/snapshots/* --param linearization_level=2 --max-time 30 --output replay.json
+    python -m bench.replay /tmp/snapshots/* --rebuild
+"""
+import sys
+import json
+import time
+import argparse
+from dataclasses import asdict, replace
+from datetime import datetime, timezone
+from ortools.sat.python import cp_model
+from models.builder import build_shift_schedule_model
+from snapshots import load_snapshot
+
+class _FirstSolutionTimer(cp_model.CpSolverSolutionCallback):
+    """
+    最初の解が見つかった時間を記録する
+    """
+    def __init__(self):
+        super().__init__()
+        self.time_to_first_solution = None
+
+    def on_solution_callback(self):
+        if self.time_to_first_solution is None:
+            self.time_to_first_solution = self.WallTime()
+
+def parse_param(text):
+    """
+    'name=value' の形式の CP-SAT のパラメータを (name, value) に変換する 値の型は CpSolver.parameters の型に合わせる
+    """
+    name, separator, value = text.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError(f'expected name=value: {text}')
+    current = getattr(cp_model.CpSolver().parameters, name, None)
+    if current is None:
+        raise argparse.ArgumentTypeError(f'unknown CP-SAT parameter: {name}')
+    if isinstance(current, bool):
+        return name, value.lower() in ('true', '1')
+    return name, type(current)(value)
+
+def create_solver(solver_parameters, params):
+    """
+    SolverParameters（属性名は CP-SAT のパラメータ名と同じ）と追加のパラメータを反映した CpSolver を作成する
+    """
+    solver = cp_model.CpSolver()
+    for name, value in [*asdict(solver_parameters).items(), *params]:
+        if value is not None:
+            setattr(solver.parameters, name, value)
+    return solver
+
+def replay(model, solver_parameters, params):
+    """
+    モデルを 1 回解き、計測結果の辞書を返す
+    """
+    solver = create_solver(solver_parameters, params)
+    timer = _FirstSolutionTimer()
+    status = solver.Solve(model, timer)
+    has_solution = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    return {
+        'num_search_workers': solver_parameters.num_search_workers,
+        'params': dict(params),
+        'status': solver.StatusName(status),
+        'objective_value': solver.ObjectiveValue() if has_solution else None,
+        'best_objective_bound': solver.BestObjectiveBound() if has_solution else None,
+        'time_to_first_solution': timer.time_to_first_solution,
+        'wall_time': solver.WallTime(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='保存したスナップショットをパラメータを変えて解き直し、探索時間を比較する')
+    parser.add_argument('snapshot', nargs='+', help='スナップショットのディレクトリ')
+    parser.add_argument('--workers', type=int, nargs='+', help='試すワーカー数 省略した場合は保存時の値')
+    parser.add_argument('--max-time', type=float, help='探索時間の上限 省略した場合は保存時の値')
+    parser.add_argument('--param', type=parse_param, action='append', default=[], help='CP-SAT のパラメータ name=value（複数指定できる）')
+    parser.add_argument('--rebuild', action='store_true', help='保存した入力から現在のコードでモデルを作り直す')
+    parser.add_argument('--output', help='結果を書き出す JSON ファイル 省略した場合は標準出力')
+    args = parser.parse_args()
+
+    results = []
+    for path in args.snapshot:
+        model, meta = load_snapshot(path)
+        if args.rebuild:
+            start = time.perf_counter()
+            model = build_shift_schedule_model(**meta['model_inputs']).model
+            print(f'{path} rebuilt in {time.perf_counter() - start:.3f}s', file=sys.stderr)
+
+        solver_parameters = meta['solver_parameters']
+        if args.max_time is not None:
+            solver_parameters = replace(solver_parameters, max_time_in_seconds=args.max_time)
+        recorded = meta['result']
+        runs = []
+        for workers in args.workers or [solver_parameters.num_search_workers]:
+            run = replay(model, replace(solver_parameters, num_search_workers=workers), args.param)
+            runs.append(run)
+            first = run['time_to_first_solution']
+            print(
+                f"{path} workers {workers} {run['status']} {run['objective_value']} "
+                f"first {f'{first:.3f}s' if first is not None else '-'} "
+                f"wall {run['wall_time']:.3f}s (recorded {recorded['status']} {recorded['objective_value']} {recorded['wall_time']:.3f}s, "
+                f"{run['wall_time'] - recorded['wall_time']:+.3f}s)",
+                file=sys.stderr
+            )
+        results.append({'snapshot': path, 'rebuild': args.rebuild, 'recorded': recorded, 'runs': runs})
+
+    report = {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'max_time': args.max_time,
+            'workers': args.workers,
+            'params': dict(args.param),
+        },
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
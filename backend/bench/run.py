@@ -0,0 +1,152 @@
+"""
+シナリオごとに ShiftScheduleModel の構築から求解までを実行し、計測結果を JSON で出力するベンチマーク
+
+計測項目
+- build_time: モデル構築（制約・目的関数の追加まで）にかかった時間（秒）
+- variables, constraints: モデルの変数の数、制約の数
+- time_to_first_solution: 最初の実行可能解が見つかるまでの時間（秒）
+- time_to_optimal: 最適解であることが証明されるまでの時間（秒） 時間内に証明できなかった場合は null
+- peak_memory_kb: シナリオを実行したプロセスの最大常駐メモリ（KB）
+
+各シナリオは独立したプロセスで実行し、メモリの計測が他のシナリオの影響を受けないようにする
+backend ディレクトリで以下のように実行する
+
+    python -m bench.run --output before.json
+    python -m bench.run --scenario medium large --max-time 30 --workers 8 --output after.json
+    python -m bench.compare before.json after.json
+    python -m bench.run --scenario interchangeable --symmetry-breaking permute --output permute.json
+    python -m bench.run --scenario large xlarge --heuristic hint --output hint.json
+    python -m bench.run --scenario long_horizon --max-consecutive-work-days 10 --consecutive-encoding automaton --output automaton.json
+"""
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+from ortools import __version__ as ortools_version
+from bench.generators import generate_store
+from bench.scenarios import SCENARIOS, DEFAULT_SCENARIOS
+from models.builder import build_shift_schedule_model, SYMMETRY_BREAKING_MODES, HEURISTIC_MODES, CONSECUTIVE_ENCODINGS
+from models.constraints import StaffConstraints
+from models.parameters import SolverParameters
+
+def run_scenario(name, solver_parameters, seed, symmetry_breaking='none', heuristic='none', consecutive_days=None):
+    """
+    1 つのシナリオを実行し、計測結果の辞書を返す
+
+    Parameters:
+        - consecutive_days: dict, build_shift_schedule_model() の max_consecutive_work_days, min_consecutive_rest_days, consecutive_encoding
+    """
+    shifts, staffs, locked = generate_store(**SCENARIOS[name], seed=seed)
+
+    start = time.perf_counter()
+    shift_schedule_model = build_shift_schedule_model(
+        shifts, staffs, locked, seed=seed, symmetry_breaking=symmetry_breaking, heuristic=heuristic, **(consecutive_days or {})
+    )
+    build_time = time.perf_counter() - start
+
+    proto = shift_schedule_model.model.Proto()
+    first_solution_times = []
+
+    def on_solution(result):
+        if not first_solution_times:
+            first_solution_times.append(result.wall_time)
+
+    result = shift_schedule_model.solve(solver_parameters, on_solution)
+
+    return {
+        'scenario': name,
+        'staff_count': len(staffs),
+        'days': len(shifts),
+        'locked_count': len(locked),
+        'build_time': build_time,
+        'variables': len(proto.variables),
+        'constraints': len(proto.constraints),
+        'status': result.status,
+        'objective_value': result.objective_value,
+        'best_objective_bound': result.best_objective_bound,
+        'time_to_first_solution': first_solution_times[0] if first_solution_times else None,
+        'time_to_optimal': result.wall_time if result.status == 'OPTIMAL' else None,
+        'wall_time': result.wall_time,
+        'peak_memory_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+def _run_in_subprocess(args):
+    return run_scenario(*args)
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='シナリオごとの構築時間、求解時間、メモリ使用量を計測する')
+    parser.add_argument('--scenario', nargs='+', choices=sorted(SCENARIOS), default=DEFAULT_SCENARIOS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-time', type=float, default=60.0)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--symmetry-breaking', choices=SYMMETRY_BREAKING_MODES, default='none')
+    parser.add_argument('--heuristic', choices=HEURISTIC_MODES, default='none')
+    parser.add_argument('--max-consecutive-work-days', type=int, default=StaffConstraints.MAX_CONSECUTIVE_WORK_DAYS)
+    parser.add_argument('--min-consecutive-rest-days', type=int, default=StaffConstraints.MIN_CONSECUTIVE_REST_DAYS)
+    parser.add_argument('--consecutive-encoding', choices=CONSECUTIVE_ENCODINGS, default='window')
+    parser.add_argument('--output', help='結果を書き出す JSON ファイル 省略した場合は標準出力')
+    args = parser.parse_args()
+
+    solver_parameters = SolverParameters(
+        max_time_in_seconds = args.max_time,
+        num_search_workers = args.workers,
+        random_seed = args.seed
+    )
+
+    consecutive_days = {
+        'max_consecutive_work_days': args.max_consecutive_work_days,
+        'min_consecutive_rest_days': args.min_consecutive_rest_days,
+        'consecutive_encoding': args.consecutive_encoding,
+    }
+
+    results = []
+    for name in args.scenario:
+        # maxtasksperchild=1 でシナリオごとに新しいプロセスを使い、最大常駐メモリを独立して計測する
+        with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+            result = pool.apply(_run_in_subprocess, ((name, solver_parameters, args.seed, args.symmetry_breaking, args.heuristic, consecutive_days),))
+        results.append(result)
+        first = result['time_to_first_solution']
+        print(
+            f"{name:>24} build {result['build_time']:.3f}s "
+            f"first {f'{first:.3f}s' if first is not None else '-'} "
+            f"{result['status']} {result['wall_time']:.3f}s {result['peak_memory_kb']}KB",
+            file=sys.stderr
+        )
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'ortools': ortools_version,
+            'cpu_count': multiprocessing.cpu_count(),
+            'seed': args.seed,
+            'max_time': args.max_time,
+            'workers': args.workers,
+            'symmetry_breaking': args.symmetry_breaking,
+            'heuristic': args.heuristic,
+            **consecutive_days,
+        },
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
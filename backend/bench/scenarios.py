@@ -0,0 +1,28 @@
+from enums import Tier
+
+# ベンチマークで使用するシナリオ
+# 値は generate_store() のキーワード引数
+SCENARIOS = {
+    'small': dict(staff_count=10),
+    'medium': dict(staff_count=30),
+    'large': dict(staff_count=100),
+    'xlarge': dict(staff_count=300),
+    'junior_heavy': dict(staff_count=30, tier_mix={
+        Tier.MANAGER.value: 0.05,
+        Tier.DAY_MANAGER.value: 0.05,
+        Tier.UPPER.value: 0.1,
+        Tier.MIDDLE.value: 0.2,
+        Tier.JUNIOR.value: 0.6,
+    }),
+    'dense_desired_off': dict(staff_count=30, desired_off_density=0.3),
+    'strict_required_tiers': dict(staff_count=30, required_attendance_tiers=(Tier.MANAGER.value, Tier.DAY_MANAGER.value, Tier.UPPER.value), required_attendance_tier_count=3),
+    'tight_coverage': dict(staff_count=30, coverage=0.98),
+    'locked': dict(staff_count=30, desired_off_density=0.2, lock_ratio=0.5),
+    # 希望休がなく、役職と出勤数が同じ交換可能なスタッフが多い店舗
+    'interchangeable': dict(staff_count=60, desired_off_density=0.0, coverage=0.98, required_attendance_tiers=(Tier.MANAGER.value, Tier.DAY_MANAGER.value, Tier.UPPER.value), required_attendance_tier_count=3),
+    # 四半期分をまとめて計画する店舗（連勤の制約の数が日数に比例して増える）
+    'long_horizon': dict(staff_count=30, days=91, work_days=65),
+}
+
+# 既定で実行するシナリオ 大きいシナリオは --scenario で指定した場合のみ実行する
+DEFAULT_SCENARIOS = ['small', 'medium', 'large', 'junior_heavy', 'dense_desired_off', 'strict_required_tiers', 'tight_coverage', 'locked', 'interchangeable']
@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import asdict
+logger = logging.getLogger(__name__)
+
+def _canonicalize_model_inputs(model_inputs):
+    """
+    同じ問題であれば同じ値になるように、build_shift_schedule_model() のキーワード引数を正規化する
+    リストの並び順や、希望休、役職のリストの並び順の違いは同じ問題として扱う
+    リスト以外のオプション（previous_mode など）はそのままキーに含める
+    """
+    options = {key: value for key, value in model_inputs.items() if key not in ('staffs', 'shifts', 'locked', 'previous')}
+    staffs = sorted(
+        ({**asdict(staff), 'desired_off_days': sorted(staff.desired_off_days)} for staff in model_inputs['staffs']),
+        key=lambda staff: staff['id']
+    )
+    shifts = sorted(
+        ({**asdict(shift), 'required_attendance_tiers': sorted(shift.required_attendance_tiers)} for shift in model_inputs['shifts']),
+        key=lambda shift: shift['date']
+    )
+    locked = sorted((asdict(lock) for lock in model_inputs['locked']), key=lambda lock: (lock['date'], lock['staff_id']))
+    previous = sorted((asdict(assigned) for assigned in model_inputs.get('previous') or []), key=lambda assigned: (assigned['date'], assigned['staff_id']))
+    return {
+        'staffs': staffs,
+        'shifts': shifts,
+        'locked': locked,
+        'previous': previous,
+        'options': options
+    }
+
+def compute_cache_key(model_inputs, solver_parameters):
+    """
+    モデルの入力とソルバーパラメータから、キャッシュのキーとなるハッシュ値を計算する
+
+    Parameters:
+        - model_inputs: dict, build_shift_schedule_model() のキーワード引数
+        - solver_parameters: SolverParameters
+    """
+    canonical = {
+        'model_inputs': _canonicalize_model_inputs(model_inputs),
+        'solver_parameters': asdict(solver_parameters) if solver_parameters is not None else None
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def seed_from_cache_key(key):
+    """
+    キャッシュのキーから RandomizedObjective のランダムシードを作成する
+    同じ問題には同じ目的関数を与えないと、キャッシュした解と解き直した解が一致しなくなるため
+    """
+    return int(key[:8], 16)
+
+class ResultCache:
+    """
+    最適化結果をキャッシュする TTL 付きの LRU キャッシュ
+    directory を指定した場合はディスクにも JSON として保存し、プロセスをまたいで共有する
+    ディスクのファイルは encode() で値を JSON に変換できる値にして書き出し、decode() で値に戻す
+    pickle は使わないため、ディレクトリに書き込めるだけではワーカーでコードを実行させられない
+
+    同じキーの計算が同時に要求された場合は、最初の 1 件だけを計算し、他はその結果を待つ
+
+    Parameters:
+        - max_entries: int, メモリとディスクそれぞれに保持する最大件数
+        - ttl_seconds: float, キャッシュの有効期間（秒）
+        - directory: str, ディスクキャッシュのディレクトリ 省略した場合はメモリのみ
+        - encode: callable, 値を JSON に変換できる値にする関数（SolveResult.to_dict など）
+        - decode: callable, encode() の戻り値から値を作成する関数（SolveResult.from_dict など）
+    """
+    def __init__(self, max_entries=256, ttl_seconds=600, directory=None, encode=lambda value: value, decode=lambda data: data):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.directory = directory
+        self.encode = encode
+        self.decode = decode
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def _get_from_disk(self, key):
+        """
+        ディスクキャッシュの値を返す 存在しない、期限切れ、壊れている（JSON として読めない、decode() できない）場合は None を返す
+        """
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                os.remove(path)
+                return None
+            with open(path) as f:
+                return self.decode(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _set_to_disk(self, key, value):
+        path = self._disk_path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.encode(value), f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+            self._evict_disk()
+        except OSError as e:
+            logger.warning(f'failed to write result cache: {e!r}')
+
+    def _evict_disk(self):
+        """
+        ディスクキャッシュが max_entries を超えた場合、更新日時の古いものから削除する
+        """
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')]
+        if len(paths) <= self.max_entries:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get(self, key):
+        """
+        キャッシュされた値を返す 存在しないか期限切れの場合は None を返す
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+
+        if self.directory is None:
+            return None
+
+        value = self._get_from_disk(key)
+        if value is not None:
+            with self._lock:
+                self._set_to_memory(key, value)
+        return value
+
+    def _set_to_memory(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set(self, key, value):
+        """
+        値をキャッシュする
+        """
+        with self._lock:
+            self._set_to_memory(key, value)
+        if self.directory is not None:
+            self._set_to_disk(key, value)
+
+    def get_or_compute(self, key, compute, should_cache=lambda _: True):
+        """
+        キャッシュされた値があれば返し、なければ compute() で計算してキャッシュする
+        同じキーの計算が実行中であれば、その結果を待って返す
+
+        Parameters:
+            - key: str, compute_cache_key() で計算したキー
+            - compute: callable, 引数なしで値を返す関数
+            - should_cache: callable, 値を受け取り、キャッシュするかどうかを返す関数
+
+        戻り値:
+            - (value, hit) のタプル hit はキャッシュないし実行中の計算の結果を使った場合に True
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                future = Future()
+                self._in_flight[key] = future
+
+        if in_flight is not None:
+            return in_flight.result(), True
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            if should_cache(value):
+                self.set(key, value)
+            future.set_result(value)
+            return value, False
+        finally:
+            with self._lock:
+                del self._in_flight[key]
@@ -0,0 +1,27 @@
+# gunicorn の設定 backend ディレクトリで以下のように起動する
+#
+#     gunicorn -c gunicorn.conf.py app:app
+#
+# preload_app でマスタープロセスが ortools と models を一度だけ読み込み、ワーカープロセスは fork で共有する
+# CP-SAT の探索スレッドは fork をまたげないため、初回の探索（warm_up）はワーカーごとに fork の後で行う
+#
+# 非同期ジョブ（/api/v1/optimize/jobs）の状態はワーカープロセスごとに保持されるため、
+# ジョブを使う場合は WEB_CONCURRENCY=1 とするか、ロードバランサーで同じワーカーに振り分ける
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 4)))
+# 探索の枠を待つリクエストと、SSE の接続を同時に扱えるようにスレッドワーカーを使う
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 180))
+graceful_timeout = 30
+preload_app = True
+accesslog = '-'
+
+def post_fork(server, worker):
+    from app import configure_worker, warm_up
+    # CPU コアをワーカープロセスの数で分け合うように、探索の枠を作り直す
+    configure_worker(server.cfg.workers)
+    warm_up()
@@ -0,0 +1,233 @@
+import math
+import logging
+from dataclasses import dataclass, replace
+from models.builder import build_shift_schedule_model
+from models.parameters import HorizonBoundary
+from models.shift_schedule_model import ScheduleValues
+logger = logging.getLogger(__name__)
+
+# 次の期間から先読みする日数の既定値 最大連勤数（5日）をまたぐ連勤を避けられる長さとする
+DEFAULT_LOOKAHEAD_DAYS = 7
+
+@dataclass
+class HorizonPeriodResult:
+    """
+    ローリングホライズンで計画した 1 期間分の結果を保持するクラス
+
+    属性:
+    - result (SolveResult): 計画期間の日付だけに切り詰めた結果 解がない場合は schedule が None
+    - error (str): 前の期間に解がなく、計画できなかった場合のエラーメッセージ
+    - lookahead_days (int): 先読みした日数 先読みを含めると解がなく、先読みなしで解き直した場合は 0
+    - consecutive_work_days_before (dict): スタッフIDをキーとし、直前の期間から続いていた連勤数を値とする辞書
+    - consecutive_rest_days_before (dict): スタッフIDをキーとし、直前の期間から続いていた連勤の後の休みの日数を値とする辞書
+    - work_days_carry_over (dict): スタッフIDをキーとし、前の期間までの出勤数の不足（負の場合は超過）を値とする辞書 0 のスタッフは含まない
+    """
+    result: object = None
+    error: str = None
+    lookahead_days: int = 0
+    consecutive_work_days_before: dict = None
+    consecutive_rest_days_before: dict = None
+    work_days_carry_over: dict = None
+
+def _create_lookahead(model_inputs, next_inputs, lookahead_days):
+    """
+    次の期間の最初の lookahead_days 日を、計画期間の最後の日付に続く日付で作成する
+
+    Parameters:
+        - model_inputs: dict, 計画期間の build_shift_schedule_model() のキーワード引数
+        - next_inputs: dict, 次の期間の build_shift_schedule_model() のキーワード引数
+        - lookahead_days: int, 先読みする日数
+
+    戻り値:
+        - (shifts, desired_off_days, locked, lookahead_work_days) のタプル
+          desired_off_days はスタッフIDをキーとし、先読みする日付での希望休のリストを値とする辞書
+    """
+    next_shifts = sorted(next_inputs['shifts'], key=lambda shift: shift.date)[:lookahead_days]
+    if not next_shifts:
+        return [], {}, [], {}
+
+    offset = max(shift.date for shift in model_inputs['shifts'])
+    dates = {shift.date: offset + i + 1 for i, shift in enumerate(next_shifts)}
+    staff_ids = {staff.id for staff in model_inputs['staffs']}
+
+    shifts = [replace(shift, date=dates[shift.date]) for shift in next_shifts]
+    desired_off_days = {
+        staff.id: [dates[day] for day in staff.desired_off_days if day in dates]
+        for staff in next_inputs['staffs']
+    }
+    locked = [
+        replace(lock, date=dates[lock.date])
+        for lock in next_inputs['locked']
+        if lock.date in dates and lock.staff_id in staff_ids
+    ]
+    # 先読みする日付では、次の期間の出勤数を日数の割合で按分した数を上限とする
+    # 次の期間にいないスタッフは出勤できない
+    next_shift_count = len(next_inputs['shifts'])
+    lookahead_work_days = {
+        staff.id: math.ceil(staff.work_days * len(next_shifts) / next_shift_count)
+        for staff in next_inputs['staffs']
+    }
+    return shifts, desired_off_days, locked, lookahead_work_days
+
+def _create_window_inputs(model_inputs, next_inputs, consecutive_work_days_before, consecutive_rest_days_before, work_days_carry_over, lookahead_days):
+    """
+    計画期間と先読みする日付からなる窓の build_shift_schedule_model() のキーワード引数を作成する
+    出勤数は前の期間までの不足を加えた値とする
+    """
+    shift_count = len(model_inputs['shifts'])
+    if next_inputs is not None and lookahead_days > 0:
+        lookahead_shifts, lookahead_desired_off_days, lookahead_locked, lookahead_work_days = _create_lookahead(model_inputs, next_inputs, lookahead_days)
+    else:
+        lookahead_shifts, lookahead_desired_off_days, lookahead_locked, lookahead_work_days = [], {}, [], {}
+
+    staffs = [
+        replace(
+            staff,
+            desired_off_days = staff.desired_off_days + lookahead_desired_off_days.get(staff.id, []),
+            work_days = min(max(staff.work_days + work_days_carry_over.get(staff.id, 0), 0), shift_count)
+        )
+        for staff in model_inputs['staffs']
+    ]
+    # 前回の解は計画期間の日付のみ使用する（先読みする日付と重ならないようにする）
+    dates = {shift.date for shift in model_inputs['shifts']}
+    previous = [assigned for assigned in model_inputs.get('previous') or [] if assigned.date in dates]
+
+    boundary = HorizonBoundary(
+        consecutive_work_days_before = consecutive_work_days_before,
+        consecutive_rest_days_before = consecutive_rest_days_before,
+        lookahead_dates = [shift.date for shift in lookahead_shifts],
+        lookahead_work_days = lookahead_work_days
+    )
+    # 期間の境界の連勤を数えるため、計画期間の日付は昇順に並べ、先読みする日付はその後に続ける
+    window_inputs = {
+        **model_inputs,
+        'shifts': sorted(model_inputs['shifts'], key=lambda shift: shift.date) + lookahead_shifts,
+        'staffs': staffs,
+        'locked': model_inputs['locked'] + lookahead_locked,
+        'previous': previous,
+        'boundary': boundary
+    }
+    return window_inputs, len(lookahead_shifts)
+
+def _trim_result(result, shift_count, lookahead_dates):
+    """
+    窓の結果から、先読みした日付の出勤可否と違反を除く
+    """
+    if result.schedule is None:
+        return result
+    schedule = result.schedule
+    lookahead_dates = set(lookahead_dates)
+    violations = result.violations
+    if violations is not None:
+        violations = [
+            violation for violation in violations
+            if violation['type'] != 'lookahead_work_days' and violation.get('date') not in lookahead_dates
+        ]
+    return replace(
+        result,
+        schedule = ScheduleValues(
+            dates = schedule.dates[:shift_count],
+            staff_ids = schedule.staff_ids,
+            is_working = schedule.is_working[:shift_count],
+            locked = schedule.locked[:shift_count]
+        ),
+        violations = violations
+    )
+
+def _count_trailing_days(schedule, consecutive_work_days_before, consecutive_rest_days_before):
+    """
+    スタッフごとに、期間の末尾まで続いている連勤数と、連勤の後に期間の末尾まで続いている休みの日数を数える
+    期間のすべての日が同じ場合は、直前の期間から続いていた日数を加える
+    最初の期間から一度も出勤していない休みは、連勤の後の休みではないため数えない
+
+    戻り値:
+        - (trailing_work_days, trailing_rest_days) のタプル どちらもスタッフIDをキーとし、0 のスタッフは含まない
+    """
+    trailing_work_days = {}
+    trailing_rest_days = {}
+    for j, staff_id in enumerate(schedule.staff_ids):
+        column = schedule.is_working[:, j]
+        if len(column) == 0:
+            continue
+        last = bool(column[-1])
+        count = 0
+        for is_working in column[::-1]:
+            if bool(is_working) != last:
+                break
+            count += 1
+        if last:
+            if count == len(column):
+                count += consecutive_work_days_before.get(staff_id, 0)
+            trailing_work_days[staff_id] = count
+        elif count < len(column) or consecutive_work_days_before.get(staff_id, 0) > 0:
+            trailing_rest_days[staff_id] = count
+        elif consecutive_rest_days_before.get(staff_id, 0) > 0:
+            trailing_rest_days[staff_id] = count + consecutive_rest_days_before[staff_id]
+    return trailing_work_days, trailing_rest_days
+
+def solve_rolling_horizon(periods, lookahead_days=DEFAULT_LOOKAHEAD_DAYS):
+    """
+    複数の期間（月）のシフトを、期間ごとに重なりのある窓で順に解く
+
+    各窓は計画期間と次の期間の最初の lookahead_days 日からなり、計画期間の解だけを確定して次の窓に進む
+    確定した期間の末尾の連勤数と連勤の後の休みの日数、緩和モードで満たせなかった出勤数を次の窓に引き継ぐため、
+    期間の境界で最大連勤数を超えたり最小連休数を下回ったりすることがなく、出勤数の不足は次の期間で埋め合わせる
+    窓ごとにモデルを作り直すため、メモリと探索時間は期間の数に比例する
+
+    先読みを含めると解がない場合（次の期間にだけいるスタッフがいるなど）は、先読みなしで解き直す
+    ある期間に解がない場合、以降の期間は引き継ぐ状態がないため計画しない
+
+    Parameters:
+        - periods: list, (model_inputs, solver_parameters) のタプルのリスト（期間の順）
+                   model_inputs は build_shift_schedule_model() のキーワード引数
+        - lookahead_days: int, 次の期間から先読みする日数
+
+    戻り値:
+        - HorizonPeriodResult のリスト（periods と同じ順）
+    """
+    results = []
+    consecutive_work_days_before = {}
+    consecutive_rest_days_before = {}
+    work_days_carry_over = {}
+    infeasible_index = None
+    for index, (model_inputs, solver_parameters) in enumerate(periods):
+        if infeasible_index is not None:
+            results.append(HorizonPeriodResult(error=f"periods[{infeasible_index}] has no feasible schedule"))
+            continue
+
+        next_inputs = periods[index + 1][0] if index + 1 < len(periods) else None
+        period_lookahead_days = lookahead_days
+        while True:
+            window_inputs, window_lookahead_days = _create_window_inputs(
+                model_inputs, next_inputs, consecutive_work_days_before, consecutive_rest_days_before, work_days_carry_over, period_lookahead_days
+            )
+            result = build_shift_schedule_model(**window_inputs).solve(solver_parameters)
+            if result.schedule is not None or window_lookahead_days == 0:
+                break
+            logger.info(f"periods[{index}] is infeasible with {window_lookahead_days} lookahead days, retrying without lookahead")
+            period_lookahead_days = 0
+
+        result = _trim_result(result, len(model_inputs['shifts']), window_inputs['boundary'].lookahead_dates)
+        results.append(HorizonPeriodResult(
+            result = result,
+            lookahead_days = window_lookahead_days,
+            consecutive_work_days_before = consecutive_work_days_before,
+            consecutive_rest_days_before = consecutive_rest_days_before,
+            work_days_carry_over = work_days_carry_over
+        ))
+        if result.schedule is None:
+            infeasible_index = index
+            continue
+
+        # 確定した期間の境界の状態を次の窓に引き継ぐ
+        work_days = {staff.id: staff.work_days for staff in window_inputs['staffs']}
+        actual_work_days = result.schedule.is_working.sum(axis=0).tolist()
+        work_days_carry_over = {
+            staff_id: work_days[staff_id] - actual
+            for staff_id, actual in zip(result.schedule.staff_ids, actual_work_days)
+            if work_days[staff_id] != actual
+        }
+        consecutive_work_days_before, consecutive_rest_days_before = _count_trailing_days(
+            result.schedule, consecutive_work_days_before, consecutive_rest_days_before
+        )
+    return results
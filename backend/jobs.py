@@ -0,0 +1,236 @@
+import queue
+import threading
+import uuid
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from models.builder import build_shift_schedule_model
+from solver_pool import SolverPoolTimeout
+logger = logging.getLogger(__name__)
+
+# 探索の枠を待っている間に、ジョブがキャンセルされたかどうかを確認する間隔（秒）
+DISPATCH_POLL_SECONDS = 0.5
+
+class JobStatus:
+    """
+    最適化ジョブのステータス
+    """
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    SUCCEEDED = 'SUCCEEDED'
+    CANCELLED = 'CANCELLED'
+    FAILED = 'FAILED'
+
+FINISHED_STATUSES = (JobStatus.SUCCEEDED, JobStatus.CANCELLED, JobStatus.FAILED)
+
+def _watch_cancel(shift_schedule_model, cancel_event, finished):
+    """
+    探索が終わるまで cancel_event を監視し、キャンセルされたら探索を打ち切る
+    solve() の開始直前にキャンセルされた場合に備え、キャンセル後も探索が終わるまで stop_search() を呼び出し続ける
+    """
+    while not finished.wait(0.1):
+        if cancel_event.is_set():
+            shift_schedule_model.stop_search()
+
+def _run_job(job_id, model_inputs, solver_parameters, states, cancel_event):
+    """
+    ワーカープロセスで実行される最適化ジョブ
+    改善解が見つかるたびに states[job_id] を更新し、暫定解をポーリングで参照できるようにする
+
+    Parameters:
+        - job_id: str, ジョブID
+        - model_inputs: dict, build_shift_schedule_model() のキーワード引数
+        - solver_parameters: SolverParameters
+        - states: Manager の dict, ジョブIDをキーとしてジョブの状態を保持する
+        - cancel_event: Manager の Event, キャンセル時にセットされる
+    """
+    if cancel_event.is_set():
+        states[job_id] = {'status': JobStatus.CANCELLED, 'result': None}
+        return
+
+    states[job_id] = {'status': JobStatus.RUNNING, 'result': None}
+    shift_schedule_model = build_shift_schedule_model(**model_inputs)
+
+    finished = threading.Event()
+    watcher = threading.Thread(target=_watch_cancel, args=(shift_schedule_model, cancel_event, finished), daemon=True)
+    watcher.start()
+
+    def on_solution(result):
+        states[job_id] = {'status': JobStatus.RUNNING, 'result': result}
+
+    try:
+        result = shift_schedule_model.solve(solver_parameters, on_solution)
+    finally:
+        finished.set()
+
+    status = JobStatus.CANCELLED if cancel_event.is_set() else JobStatus.SUCCEEDED
+    states[job_id] = {'status': status, 'result': result}
+
+class JobManager:
+    """
+    最適化ジョブをプロセスプールで非同期に実行し、状態を管理するクラス
+
+    ジョブは投入順に solver_pool の探索の枠を取得してからプロセスプールで実行する
+    同期エンドポイントの探索と同じ枠を使うため、ジョブの探索スレッドを合わせても CPU コア数を超えない
+    プロセスプール、ジョブ状態共有用の Manager、枠を待ってジョブを投入するスレッドは最初のジョブ投入時に起動する
+
+    Parameters:
+        - solver_pool: SolverPool, 探索の枠を共有するプール
+        - max_workers: int, 同時に実行するジョブの最大数 省略した場合は solver_pool.size
+          solver_pool.size より小さくすると、残りの枠を同期エンドポイントのために空けておける
+        - max_finished_jobs: int, 保持する終了済みジョブの最大数 超えた場合は古いものから削除する
+    """
+    def __init__(self, solver_pool, max_workers=None, max_finished_jobs=1000):
+        self.solver_pool = solver_pool
+        self.max_workers = min(max_workers or solver_pool.size, solver_pool.size)
+        self.max_finished_jobs = max_finished_jobs
+        self._lock = threading.Lock()
+        self._running = threading.BoundedSemaphore(self.max_workers)
+        self._queue = queue.Queue()
+        self._dispatcher = None
+        self._executor = None
+        self._manager = None
+        self._states = None
+        self._jobs = OrderedDict()
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._manager = multiprocessing.Manager()
+            self._states = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+            self._dispatcher.start()
+
+    def _wait_for_slot(self, solver_parameters, cancel_event):
+        """
+        実行数の上限と solver_pool の枠が空くまで待ち、SolverSlot を返す
+        待っている間にジョブがキャンセルされた場合は None を返す
+        """
+        while not cancel_event.is_set():
+            if not self._running.acquire(timeout=DISPATCH_POLL_SECONDS):
+                continue
+            try:
+                return self.solver_pool.acquire(solver_parameters, timeout=DISPATCH_POLL_SECONDS)
+            except SolverPoolTimeout:
+                self._running.release()
+        return None
+
+    def _dispatch(self):
+        """
+        投入されたジョブを順に取り出し、探索の枠を取得してからプロセスプールに投入する
+        None を取り出したら終了する
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            job_id, model_inputs, solver_parameters, cancel_event = item
+            slot = self._wait_for_slot(solver_parameters, cancel_event)
+            if slot is None:
+                self._states[job_id] = {'status': JobStatus.CANCELLED, 'result': None}
+                continue
+
+            with self._lock:
+                if self._executor is None:
+                    slot.release()
+                    self._running.release()
+                    return
+                future = self._executor.submit(_run_job, job_id, model_inputs, slot.solver_parameters, self._states, cancel_event)
+                if job_id in self._jobs:
+                    self._jobs[job_id]['future'] = future
+            future.add_done_callback(lambda f, job_id=job_id, slot=slot: self._on_done(job_id, slot, f))
+
+    def _on_done(self, job_id, slot, future):
+        """
+        探索の枠を返却し、ワーカーで例外が発生した場合はジョブを FAILED にする
+        """
+        slot.release()
+        self._running.release()
+        if future.cancelled():
+            self._states[job_id] = {'status': JobStatus.CANCELLED, 'result': None}
+            return
+        exception = future.exception()
+        if exception is not None:
+            logger.error(f'job {job_id} failed: {exception!r}')
+            self._states[job_id] = {'status': JobStatus.FAILED, 'result': None, 'error': str(exception)}
+
+    def _evict_finished_jobs(self):
+        """
+        終了済みジョブが max_finished_jobs を超えた場合、古いものから削除する
+        """
+        finished_ids = [job_id for job_id in self._jobs if self._states.get(job_id, {}).get('status') in FINISHED_STATUSES]
+        for job_id in finished_ids[:max(0, len(finished_ids) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+            self._states.pop(job_id, None)
+
+    def submit(self, model_inputs, solver_parameters):
+        """
+        ジョブを投入し、ジョブIDを返す
+
+        Parameters:
+            - model_inputs: dict, build_shift_schedule_model() のキーワード引数
+            - solver_parameters: SolverParameters
+        """
+        with self._lock:
+            self._ensure_started()
+            self._evict_finished_jobs()
+
+            job_id = uuid.uuid4().hex
+            cancel_event = self._manager.Event()
+            self._states[job_id] = {'status': JobStatus.PENDING, 'result': None}
+            # future は _dispatch() でプロセスプールに投入したときに設定する
+            self._jobs[job_id] = {'future': None, 'cancel_event': cancel_event}
+            self._queue.put((job_id, model_inputs, solver_parameters, cancel_event))
+            return job_id
+
+    def get(self, job_id):
+        """
+        ジョブの状態を返す
+        存在しないジョブIDの場合は None を返す
+
+        戻り値:
+            - dict: status と、暫定解ないし最終結果の SolveResult を result に持つ
+        """
+        with self._lock:
+            if job_id not in self._jobs:
+                return None
+            return self._states.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        ジョブをキャンセルする
+        実行前のジョブはそのまま取り消し、実行中のジョブは CP-SAT の探索を打ち切る
+
+        戻り値:
+            - bool: キャンセルを実行前ないし実行中のジョブに伝えた場合は True、すでに終了していた場合は False
+              存在しないジョブIDの場合は None
+        """
+        with self._lock:
+            if job_id not in self._jobs:
+                return None
+            if self._states.get(job_id, {}).get('status') in FINISHED_STATUSES:
+                return False
+            job = self._jobs[job_id]
+            job['cancel_event'].set()
+            if job['future'] is None:
+                # 探索の枠を待っているジョブは、_dispatch() が取り出すのを待たずに CANCELLED にする
+                self._states[job_id] = {'status': JobStatus.CANCELLED, 'result': None}
+            else:
+                job['future'].cancel()
+            return True
+
+    def shutdown(self):
+        """
+        実行中のジョブをすべてキャンセルし、プロセスプールと Manager を停止する
+        """
+        with self._lock:
+            if self._executor is None:
+                return
+            for job in self._jobs.values():
+                job['cancel_event'].set()
+            self._queue.put(None)
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._manager.shutdown()
+            self._executor = None
+            self._manager = None
@@ -0,0 +1,175 @@
+import io
+import time
+import pstats
+import cProfile
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# リクエストやフェーズの所要時間（秒）のヒストグラムのバケット
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = [*zip(label_names, label_values), *extra]
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+class Counter:
+    """
+    ラベルごとに値を加算する Prometheus の counter
+
+    Parameters:
+        - name: str, メトリクス名
+        - documentation: str, HELP に出力する説明
+        - label_names: tuple, ラベル名
+    """
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.label_names, label_values)} {value}')
+        return lines
+
+class Histogram:
+    """
+    ラベルごとに観測値の分布を集計する Prometheus の histogram
+
+    Parameters:
+        - name: str, メトリクス名
+        - documentation: str, HELP に出力する説明
+        - label_names: tuple, ラベル名
+        - buckets: tuple, バケットの上限値（昇順）
+    """
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # ラベルの値をキーとし、[バケットごとの件数, 合計, 件数] を値とする辞書
+        self._values = {}
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, (bucket_counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.label_names, label_values, [('le', repr(float(bound)))])
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = _format_labels(self.label_names, label_values, [('le', '+Inf')])
+                lines.append(f'{self.name}_bucket{labels} {count}')
+                labels = _format_labels(self.label_names, label_values)
+                lines.append(f'{self.name}_sum{labels} {total}')
+                lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+class MetricsRegistry:
+    """
+    メトリクスをまとめ、Prometheus のテキスト形式で出力するクラス
+    """
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, label_names=()):
+        metric = Counter(name, documentation, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        return '\n'.join(line for metric in self._metrics for line in metric.render()) + '\n'
+
+class PhaseTimer:
+    """
+    1 リクエスト内のフェーズ（入力の検証、モデルの作成、探索、シリアライズなど）ごとの所要時間を記録するクラス
+
+    属性:
+    - timings (dict): フェーズ名をキーとし、かかった時間（秒）を値とする辞書 フェーズの実行順に並ぶ
+    """
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def update(self, timings, prefix=''):
+        """
+        ShiftScheduleModel.timings などの、他で計測した所要時間を追加する
+        """
+        for name, seconds in timings.items():
+            self.timings[f'{prefix}{name}'] = self.timings.get(f'{prefix}{name}', 0.0) + seconds
+
+    def server_timing(self):
+        """
+        Server-Timing ヘッダーの値を返す ex) parse;dur=0.12, solve;dur=812.40
+        """
+        return ', '.join(f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.timings.items())
+
+class BuildProfiler:
+    """
+    enabled の場合に、with ブロック（モデルの作成）を cProfile で計測するクラス
+
+    Parameters:
+        - enabled: bool, 計測するかどうか
+        - limit: int, report() に出力する関数の数
+    """
+    def __init__(self, enabled=False, limit=30):
+        self.enabled = enabled
+        self.limit = limit
+        self._profile = cProfile.Profile() if enabled else None
+        self.measured = False
+
+    def __enter__(self):
+        if self.enabled:
+            self._profile.enable()
+        return self
+
+    def __exit__(self, *_):
+        if self.enabled:
+            self._profile.disable()
+            self.measured = True
+
+    def report(self):
+        """
+        累積時間の長い順に並べた pstats の出力を返す 計測していない場合は None を返す
+        """
+        if not self.measured:
+            return None
+        stream = io.StringIO()
+        pstats.Stats(self._profile, stream=stream).sort_stats('cumulative').print_stats(self.limit)
+        return stream.getvalue()
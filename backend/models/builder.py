@@ -0,0 +1,83 @@
+from models.shift_schedule_model import ShiftScheduleModel
+from models.constraints import StaffConstraints, ShiftConstraints, RequiredAttendanceConstraints
+from models.objectives import StaffObjectives, ShiftBalanceTierObjectives, PreviousShiftObjectives, RandomizedObjective
+from models.symmetry import StaffSymmetryBreaking
+from models.heuristic import GreedyScheduleHeuristic
+
+PREVIOUS_MODES = ('hint', 'lock')
+SYMMETRY_BREAKING_MODES = ('none', *StaffSymmetryBreaking.MODES)
+HEURISTIC_MODES = ('none', 'hint', 'fast')
+CONSECUTIVE_ENCODINGS = StaffConstraints.ENCODINGS
+# RandomizedObjective で項を加えるセルの割合
+# すべてのセルに項を加えると目的関数が大きくなり下界が弱くなるため、bench で探索が速かった 1 割とする
+DEFAULT_RANDOMIZATION_DENSITY = 0.1
+
+def build_shift_schedule_model(shifts, staffs, locked, seed=None, previous=None, previous_mode='hint', shift_balance_mode='max', diagnose=False, relax=False, relax_weights=None, symmetry_breaking='none', boundary=None, heuristic='none', randomization_density=DEFAULT_RANDOMIZATION_DENSITY, max_consecutive_work_days=StaffConstraints.MAX_CONSECUTIVE_WORK_DAYS, min_consecutive_rest_days=StaffConstraints.MIN_CONSECUTIVE_REST_DAYS, consecutive_encoding='window'):
+    """
+    シフト、スタッフ、ロックされたシフトから、制約と目的関数を追加済みの ShiftScheduleModel を作成する
+    API の同期実行、ジョブ実行、ベンチマークで同じ手順を使うためにまとめている
+
+    Parameters:
+        - shifts (list of Shift)
+        - staffs (list of Staff)
+        - locked (list of LockedShift)
+        - seed (int): RandomizedObjective のランダムシード
+        - randomization_density (float): RandomizedObjective で項を加えるセルの割合
+        - previous (list of AssignedShift): 前回の解 指定した場合は前回の解から探索を始める
+        - previous_mode (str): 'hint' の場合は前回の解を初期解として与え、変更されるセルが少なくなるように目的関数を追加する
+                               'lock' の場合はロックされたシフト以外を前回の解に固定する
+        - shift_balance_mode (str): ShiftBalanceTierObjectives の mode
+        - diagnose (bool): True の場合は解がない原因を診断するためのモデルを作成する
+                           各ルールを仮定リテラルで守り、実行可能性に関係しない目的関数は追加しない
+        - relax (bool): True の場合はルールを満たせない場合でも、違反を最小にした解を返す緩和モードのモデルを作成する
+        - relax_weights (dict): ルールの種類をキーとし、違反 1 あたりのペナルティを値とする辞書
+        - symmetry_breaking (str): 'none' 以外の場合は RandomizedObjective を追加せず、交換可能なスタッフの対称性を CP-SAT に残す
+                                   解を求めた後で交換可能なスタッフの出勤可否を seed で入れ替える
+                                   'lex' の場合はさらに辞書式順序の制約を追加する（StaffSymmetryBreaking を参照）
+        - boundary (HorizonBoundary): ローリングホライズンで、直前の期間からの連勤と連勤の後の休み、先読みする日付を指定する
+        - heuristic (str): GreedyScheduleHeuristic で作成したシフト表の使い方
+                           'hint' の場合は探索の初期解として与える 前回の解がある場合は前回の解を優先する
+                           目的関数の補助変数を含むすべての変数の初期解にするため、complete_hint() で補う
+                           'fast' の場合は緩和モードのモデルをそのシフト表に固定し、探索せずに違反と目的関数の値だけを評価する
+        - max_consecutive_work_days (int): 店舗の最大連勤数 Staff に指定がある場合はスタッフの値を優先する
+        - min_consecutive_rest_days (int): 店舗の最小連休数 Staff に指定がある場合はスタッフの値を優先する
+        - consecutive_encoding (str): 連勤の制約の表し方 StaffConstraints の encoding
+    """
+    if heuristic == 'fast':
+        relax = True
+    shift_schedule_model = ShiftScheduleModel(shifts, staffs, locked, diagnose=diagnose, relax=relax, relax_weights=relax_weights)
+    constraints = [
+        StaffConstraints(staffs, boundary, max_consecutive_work_days, min_consecutive_rest_days, consecutive_encoding),
+        ShiftConstraints(shifts),
+        RequiredAttendanceConstraints(shifts, staffs)
+    ]
+    objectives = [
+        StaffObjectives(staffs),
+        ShiftBalanceTierObjectives(shifts, staffs, shift_balance_mode)
+    ]
+    if symmetry_breaking != 'none':
+        # 交換可能なスタッフの区別は、目的関数のノイズではなく解を求めた後の入れ替えで付ける
+        symmetry = StaffSymmetryBreaking(staffs, locked, previous, seed, symmetry_breaking, boundary)
+        constraints.append(symmetry)
+        shift_schedule_model.set_staff_permutation(symmetry.permutation(shift_schedule_model.schedule_grid.staff_ids))
+    else:
+        objectives.append(RandomizedObjective(seed, randomization_density))
+    shift_schedule_model.add_constraints(constraints)
+    use_heuristic_hint = heuristic == 'hint' and not previous and not diagnose
+    if heuristic == 'fast' or use_heuristic_hint:
+        with shift_schedule_model._timed('heuristic'):
+            initial_shifts = GreedyScheduleHeuristic(shifts, staffs, locked, boundary, max_consecutive_work_days, min_consecutive_rest_days).assign()
+        if heuristic == 'fast':
+            shift_schedule_model.apply_previous_shifts(initial_shifts, 'lock')
+            previous = None
+        else:
+            shift_schedule_model.apply_previous_shifts(initial_shifts, 'hint')
+    if previous:
+        shift_schedule_model.apply_previous_shifts(previous, previous_mode)
+        if previous_mode == 'hint':
+            objectives.append(PreviousShiftObjectives(previous))
+    if not diagnose:
+        shift_schedule_model.add_objectives(objectives)
+    if use_heuristic_hint:
+        shift_schedule_model.complete_hint()
+    return shift_schedule_model
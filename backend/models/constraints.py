@@ -1,18 +1,30 @@
 from dataclasses import dataclass
+from ortools.sat.python import cp_model
+
+def consecutive_days_limits(staff, max_consecutive_work_days, min_consecutive_rest_days):
+    """
+    スタッフの (最大連勤数, 最小連休数) を返す Staff に指定がない場合は店舗の値とする
+    """
+    return (
+        staff.max_consecutive_work_days if staff.max_consecutive_work_days is not None else max_consecutive_work_days,
+        staff.min_consecutive_rest_days if staff.min_consecutive_rest_days is not None else min_consecutive_rest_days
+    )
 
 class ConstraintsBase:
     """
     制約を追加するの基底クラス
     add_constraints()メソッドを持つ
     """
-    def add_constraints(self, _, __):
+    def add_constraints(self, _, __, ___, ____):
         """
         制約を追加するメソッド
 
         Parameters:
         - self
         - model: cp_model
-        - schedule_list: ScheduleAttributes のリスト
+        - schedule_grid: ScheduleGrid
+        - assumptions: Assumptions, 追加した制約を assumptions.enforce() に渡し、ルールとして登録する
+        - relaxation: Relaxation, 制約の式を relaxation.relax() に通し、緩和モードでスラック変数を加える
         """
         raise NotImplementedError("add_constraints() must be implemented.")
 
@@ -20,69 +32,222 @@ class StaffConstraints(ConstraintsBase):
     """
     スタッフメンバーに関する制約を追加するクラス
     作られたインスタンスは ShiftScheduleModel クラスの add_constraints() メソッドに渡される
-    """
 
-    def __init__(self, staffs):
+    最大連勤数と最小連休数は店舗の値を使用し、Staff に指定がある場合はスタッフの値を優先する
+    boundary を指定した場合は、直前の期間からの連勤を含めて最大連勤数を、連勤の後の休みを含めて最小連休数を制約し、
+    先読みする日付の出勤は work_days に数えず、lookahead_work_days を上限とする
+
+    Parameters:
+        - staffs: list, Staff のリスト
+        - boundary: HorizonBoundary, ローリングホライズンでの期間の境界の状態
+        - max_consecutive_work_days: int, 店舗の最大連勤数
+        - min_consecutive_rest_days: int, 店舗の最小連休数 連勤の間の休みはこの日数以上続ける 1 の場合は制約しない
+        - encoding: str, 連勤の制約の表し方
+            - 'window': 最大連勤数 + 1 日の窓ごとに出勤数の上限の制約を追加する
+            - 'automaton': スタッフごとに連勤数と連休数を状態とする AddAutomaton の制約を 1 つ追加する
+              緩和モードと診断用のモデルではスラック変数や仮定リテラルを付けられないため 'window' を使用する
+    """
+    # 店舗で指定しない場合の最大連勤数 2023/10/03 時点では5日
+    MAX_CONSECUTIVE_WORK_DAYS = 5
+    # 店舗で指定しない場合の最小連休数 1 日の休みで連勤を区切れる
+    MIN_CONSECUTIVE_REST_DAYS = 1
+    ENCODINGS = ('window', 'automaton')
+
+    def __init__(self, staffs, boundary=None, max_consecutive_work_days=MAX_CONSECUTIVE_WORK_DAYS, min_consecutive_rest_days=MIN_CONSECUTIVE_REST_DAYS, encoding='window'):
+        if encoding not in self.ENCODINGS:
+            raise ValueError(f"encoding must be one of {', '.join(self.ENCODINGS)}")
         self.staffs = staffs
         self.staffs_dict = {staff.id: staff for staff in staffs}
+        self.boundary = boundary
+        self.max_consecutive_work_days = max_consecutive_work_days
+        self.min_consecutive_rest_days = min_consecutive_rest_days
+        self.encoding = encoding
 
-    def _create_schedule_dict(self, schedule_list):
+    def _split_lookahead(self, schedule_grid, is_working_variables):
         """
-        スタッフメンバーのIDをキーとして、スケジュールを辞書にまとめる
-        ex {staff_id_1: [schedule_list], staff_id_2: [schedule_list], ...}
-
-        Parameters:
-            - schedule_list: list, ScheduleAttributesのリスト
+        スタッフの出勤可否の変数を、計画期間と先読みする日付の変数に分ける
         """
-        return {staff.id: [s for s in schedule_list if s.staff_id == staff.id] for staff in self.staffs}
-
-    def _add_work_days_constraints(self, model, schedule_dict):
+        if self.boundary is None or not self.boundary.lookahead_dates:
+            return is_working_variables, []
+        lookahead_dates = set(self.boundary.lookahead_dates)
+        planned, lookahead = [], []
+        for date, variable in zip(schedule_grid.dates, is_working_variables):
+            (lookahead if date in lookahead_dates else planned).append(variable)
+        return planned, lookahead
+
+    def _add_work_days_constraints(self, model, schedule_grid, assumptions, relaxation):
         """
         スタッフの出勤数が work_days と一致するように制約を追加する
 
         Parameters:
             - model: cp_model.CpModel, 制約プログラミングモデル
-            - schedule_dict: dict, スタッフIDをキーとし、そのスタッフに関連するスケジュールリストを値とする辞書
+            - schedule_grid: ScheduleGrid, スタッフごとの出勤可否の変数を参照するために使用する
+            - assumptions: Assumptions, 制約をルールとして登録するために使用する
+            - relaxation: Relaxation, 緩和モードで制約の式にスラック変数を加えるために使用する
+        """
+        for staff in self.staffs:
+            is_working_variables, lookahead_variables = self._split_lookahead(schedule_grid, schedule_grid.staff_variables(staff.id))
+            rule = {'staff_id': staff.id, 'work_days': staff.work_days}
+            work_days_count = relaxation.relax(
+                cp_model.LinearExpr.Sum(is_working_variables),
+                'work_days', max_shortage=staff.work_days, max_excess=len(is_working_variables), **rule
+            )
+            assumptions.enforce(model.Add(work_days_count == staff.work_days), 'work_days', **rule)
+
+            if lookahead_variables:
+                # 先読みする日付は次の期間で解き直すため、出勤数は上限のみとする
+                lookahead_work_days = self.boundary.lookahead_work_days.get(staff.id, 0)
+                rule = {'staff_id': staff.id, 'lookahead_work_days': lookahead_work_days}
+                lookahead_work_days_count = relaxation.relax(
+                    cp_model.LinearExpr.Sum(lookahead_variables),
+                    'lookahead_work_days', max_excess=len(lookahead_variables), **rule
+                )
+                assumptions.enforce(model.Add(lookahead_work_days_count <= lookahead_work_days), 'lookahead_work_days', **rule)
+
+    def _consecutive_work_days_before(self, staff, max_consecutive_work_days):
+        """
+        直前の期間の末尾から続いている連勤数を、最大連勤数を上限として返す
         """
-        for staff_id, schedule_list in schedule_dict.items():
-            staff = self.staffs_dict[staff_id]
-            model.Add(sum([s.is_working_variable for s in schedule_list]) == staff.work_days)
+        if self.boundary is None:
+            return 0
+        return min(self.boundary.consecutive_work_days_before.get(staff.id, 0), max_consecutive_work_days)
 
-    def _add_consecutive_working_days_constraints(self, model, schedule_dict):
+    def _consecutive_rest_days_before(self, staff, min_consecutive_rest_days):
         """
-        過度な連勤を防ぐ制約を追加する
-        2023/10/03 時点では、最大連勤数は5日
+        直前の期間の末尾で連勤の後に続いている休みの日数を返す 最小連休数に達している場合は 0 とする
+        """
+        if self.boundary is None:
+            return 0
+        rest_days_before = self.boundary.consecutive_rest_days_before.get(staff.id, 0)
+        return rest_days_before if rest_days_before < min_consecutive_rest_days else 0
 
-        TODO: 連勤数を変更できるようにする
+    def _add_consecutive_working_days_window_constraints(self, model, staff, is_working_variables, assumptions, relaxation):
+        """
+        過度な連勤を防ぐ制約を、連続した日付の窓ごとの線形制約で追加する
 
-        Parameters:
-            - model: cp_model.CpModel, 制約プログラミングモデル
-            - schedule_dict: dict, スタッフIDをキーとし、そのスタッフに関連するスケジュールリストを値とする辞書
+        最大連勤数 + 1日分のスライスを作成し、その期間で働く最大日数を最大連勤数に制約します
+        各スライスは連勤日の可能性がある期間を表し、それぞれのスライスで働く日数が最大連勤数以下であることを保証します
+        最小連休数が 2 以上の場合は、出勤、k 日（最小連休数未満）の休み、出勤という並びを k ごとに禁止します
+        """
+        max_consecutive_work_days, min_consecutive_rest_days = consecutive_days_limits(staff, self.max_consecutive_work_days, self.min_consecutive_rest_days)
+        rule = {'staff_id': staff.id, 'max_consecutive_work_days': max_consecutive_work_days}
+        for i in range(len(is_working_variables) - max_consecutive_work_days):
+            # 連続したmax_consecutive_work_days日 + 1日のスケジュールを取得し、この期間での連勤数を制約に追加する
+            # 例えば max_consecutive_work_days = 5 の場合
+            # 1回目のループでは 1日目から6日目までで5勤を防ぐ制約を追加する
+            # 2回目のループでは 2日目から7日目までで5勤を防ぐ制約を追加する
+            # これを繰り返すことで、最大連勤数を制約に追加する
+            consecutive_days_variables = is_working_variables[i:i + max_consecutive_work_days + 1]
+            consecutive_work_days_count = relaxation.relax(
+                cp_model.LinearExpr.Sum(consecutive_days_variables),
+                'max_consecutive_work_days', max_excess=1, **rule
+            )
+            assumptions.enforce(
+                model.Add(consecutive_work_days_count <= max_consecutive_work_days),
+                'max_consecutive_work_days', **rule
+            )
+
+        # 直前の期間の末尾に h 日の連勤がある場合、期間の最初の max_consecutive_work_days + 1 - h 日で働けるのは
+        # max_consecutive_work_days - h 日まで h より短い連勤を含むスライスの制約は、この制約から導かれる
+        consecutive_work_days_before = self._consecutive_work_days_before(staff, max_consecutive_work_days)
+        if consecutive_work_days_before > 0:
+            first_days_variables = is_working_variables[:max_consecutive_work_days + 1 - consecutive_work_days_before]
+            first_days_work_count = relaxation.relax(
+                cp_model.LinearExpr.Sum(first_days_variables),
+                'max_consecutive_work_days', max_excess=len(first_days_variables), **rule
+            )
+            assumptions.enforce(
+                model.Add(first_days_work_count <= max_consecutive_work_days - consecutive_work_days_before),
+                'max_consecutive_work_days', **rule
+            )
 
-        このメソッドは、max_consecutive_work_days + 1日分のスライスを作成し、その期間で働く最大日数を max_consecutive_work_days に制約します
-        各スライスは連勤日の可能性がある期間を表し、それぞれのスライスで働く日数が max_consecutive_work_days 以下であることを保証します
+        rule = {'staff_id': staff.id, 'min_consecutive_rest_days': min_consecutive_rest_days}
+        for rest_days in range(1, min_consecutive_rest_days):
+            # i 日目に出勤し、続く rest_days 日を休み、その次の日に出勤する並びを禁止する
+            for i in range(len(is_working_variables) - rest_days - 1):
+                rest_variables = is_working_variables[i + 1:i + rest_days + 1]
+                pattern_count = relaxation.relax(
+                    is_working_variables[i] + is_working_variables[i + rest_days + 1] - cp_model.LinearExpr.Sum(rest_variables),
+                    'min_consecutive_rest_days', max_excess=1, **rule
+                )
+                assumptions.enforce(model.Add(pattern_count <= 1), 'min_consecutive_rest_days', **rule)
+            # 直前の期間の末尾まで出勤していた場合は、期間の最初の rest_days 日を休んだ次の日に出勤できない
+            if consecutive_work_days_before > 0 and rest_days < len(is_working_variables):
+                pattern_count = relaxation.relax(
+                    is_working_variables[rest_days] - cp_model.LinearExpr.Sum(is_working_variables[:rest_days]),
+                    'min_consecutive_rest_days', max_excess=1, **rule
+                )
+                assumptions.enforce(model.Add(pattern_count <= 0), 'min_consecutive_rest_days', **rule)
+
+        # 直前の期間の末尾に連勤の後の r 日（最小連休数未満）の休みがある場合、期間の最初の 最小連休数 - r 日は休む
+        consecutive_rest_days_before = self._consecutive_rest_days_before(staff, min_consecutive_rest_days)
+        if consecutive_rest_days_before > 0:
+            first_days_variables = is_working_variables[:min_consecutive_rest_days - consecutive_rest_days_before]
+            first_days_work_count = relaxation.relax(
+                cp_model.LinearExpr.Sum(first_days_variables),
+                'min_consecutive_rest_days', max_excess=len(first_days_variables), **rule
+            )
+            assumptions.enforce(model.Add(first_days_work_count <= 0), 'min_consecutive_rest_days', **rule)
+
+    def _add_consecutive_working_days_automaton_constraints(self, model, staff, is_working_variables):
         """
-        max_consecutive_work_days = 5
-        for _, schedule_list in schedule_dict.items():
-            for i in range(len(schedule_list) - max_consecutive_work_days):
-                # 連続したmax_consecutive_work_days日 + 1日のスケジュールを取得し、この期間での連勤数を制約に追加する
-                # 例えば max_consecutive_work_days = 5 の場合
-                # 1回目のループでは 1日目から6日目までで5勤を防ぐ制約を追加する
-                # 2回目のループでは 2日目から7日目までで5勤を防ぐ制約を追加する
-                # これを繰り返すことで、最大連勤数を制約に追加する
-                consecutive_days_schedule = schedule_list[i:i + max_consecutive_work_days + 1]
-                model.Add(sum(s.is_working_variable for s in consecutive_days_schedule) <= max_consecutive_work_days)
+        過度な連勤を防ぐ制約を、スタッフごとに 1 つの AddAutomaton の制約で追加する
 
-    def add_constraints(self, model, schedule_list):
+        状態は次のとおりとし、出勤可否の変数を日付順に読んで状態を遷移させる すべての状態を受理状態とする
+        - 0: 連休が最小連休数に達している（期間の最初を含む） 出勤すると 1 に遷移する
+        - w (1 <= w <= 最大連勤数): w 日連勤している 最大連勤数に達した場合は出勤できない
+        - 最大連勤数 + r (1 <= r < 最小連休数): 連勤の後に r 日休んでいる 出勤できない
+        窓の制約と違い、連勤数を状態として持つため、最大連勤数を大きくしても制約の大きさは日数に比例する
+        """
+        max_consecutive_work_days, min_consecutive_rest_days = consecutive_days_limits(staff, self.max_consecutive_work_days, self.min_consecutive_rest_days)
+
+        def rest_state(rest_days):
+            return 0 if rest_days >= min_consecutive_rest_days else max_consecutive_work_days + rest_days
+
+        transitions = [(0, 0, 0), (0, 1, 1)]
+        for work_days in range(1, max_consecutive_work_days + 1):
+            if work_days < max_consecutive_work_days:
+                transitions.append((work_days, 1, work_days + 1))
+            transitions.append((work_days, 0, rest_state(1)))
+        for rest_days in range(1, min_consecutive_rest_days):
+            transitions.append((rest_state(rest_days), 0, rest_state(rest_days + 1)))
+
+        # 直前の期間の末尾から続いている連勤数、または連勤の後の休みの日数の状態から始める
+        starting_state = self._consecutive_work_days_before(staff, max_consecutive_work_days)
+        consecutive_rest_days_before = self._consecutive_rest_days_before(staff, min_consecutive_rest_days)
+        if consecutive_rest_days_before > 0:
+            starting_state = rest_state(consecutive_rest_days_before)
+        final_states = list(range(max_consecutive_work_days + min_consecutive_rest_days))
+        model.AddAutomaton(is_working_variables, starting_state, final_states, transitions)
+
+    def _add_consecutive_working_days_constraints(self, model, schedule_grid, assumptions, relaxation):
+        """
+        過度な連勤を防ぐ制約と、連勤の間の休みを最小連休数以上にする制約を追加する
+        2023/10/03 時点では、最大連勤数は5日
+
+        Parameters:
+            - model: cp_model.CpModel, 制約プログラミングモデル
+            - schedule_grid: ScheduleGrid, スタッフごとの出勤可否の変数を参照するために使用する
+            - assumptions: Assumptions, 制約をルールとして登録するために使用する
+            - relaxation: Relaxation, 緩和モードで制約の式にスラック変数を加えるために使用する
+        """
+        use_automaton = self.encoding == 'automaton' and not relaxation.enabled and not assumptions.enabled
+        for staff in self.staffs:
+            is_working_variables = schedule_grid.staff_variables(staff.id)
+            if use_automaton:
+                self._add_consecutive_working_days_automaton_constraints(model, staff, is_working_variables)
+            else:
+                self._add_consecutive_working_days_window_constraints(model, staff, is_working_variables, assumptions, relaxation)
+
+    def add_constraints(self, model, schedule_grid, assumptions, relaxation):
         """
         制約を追加するメソッド
         ShiftScheduleModel クラスの add_constraints() メソッドで呼び出される
 
         各制約追加のプライベートメソッドを呼び出す
         """
-        schedule_dict = self._create_schedule_dict(schedule_list)
-        self._add_work_days_constraints(model, schedule_dict)
-        self._add_consecutive_working_days_constraints(model, schedule_dict)
+        self._add_work_days_constraints(model, schedule_grid, assumptions, relaxation)
+        self._add_consecutive_working_days_constraints(model, schedule_grid, assumptions, relaxation)
 
 class ShiftConstraints(ConstraintsBase):
     """
@@ -94,37 +259,32 @@ class ShiftConstraints(ConstraintsBase):
         self.shifts = shifts
         self.shifts_dict = {shift.date: shift for shift in shifts}
 
-    def _create_schedule_dict(self, schedule_list):
-        """
-        シフトの日付をキーとして、スケジュールを辞書にまとめる
-        ex {date_1: [schedule_list], date_2: [schedule_list], ...}
-
-        Parameters:
-            - schedule_list: list, ScheduleAttributesのリスト
-        """
-        return {shift.date: [s for s in schedule_list if s.date == shift.date] for shift in self.shifts}
-
-    def _add_required_staff_count_constraints(self, model, schedule_dict):
+    def _add_required_staff_count_constraints(self, model, schedule_grid, assumptions, relaxation):
         """
         必要なスタッフメンバー数を満たす制約を追加する
 
         Parameters:
             - model: cp_model.CpModel, 制約プログラミングモデル
-            - schedule_dict: dict, シフトの日付をキーとし、その日のスケジュールリストを値とする辞書
+            - schedule_grid: ScheduleGrid, 日付ごとの出勤可否の変数を参照するために使用する
+            - assumptions: Assumptions, 制約をルールとして登録するために使用する
+            - relaxation: Relaxation, 緩和モードで制約の式にスラック変数を加えるために使用する
         """
-        for date, schedule_list in schedule_dict.items():
-            shift = self.shifts_dict[date]
-            model.Add(sum([s.is_working_variable for s in schedule_list]) >= shift.required_staff_count)
+        for shift in self.shifts:
+            rule = {'date': shift.date, 'required_staff_count': shift.required_staff_count}
+            staff_count = relaxation.relax(
+                cp_model.LinearExpr.Sum(schedule_grid.date_variables(shift.date)),
+                'required_staff_count', max_shortage=shift.required_staff_count, **rule
+            )
+            assumptions.enforce(model.Add(staff_count >= shift.required_staff_count), 'required_staff_count', **rule)
 
-    def add_constraints(self, model, schedule_list):
+    def add_constraints(self, model, schedule_grid, assumptions, relaxation):
         """
         制約を追加するメソッド
         ShiftScheduleModel クラスの add_constraints() メソッドで呼び出される
 
         各制約追加のプライベートメソッドを呼び出す
         """
-        schedule_dict = self._create_schedule_dict(schedule_list)
-        self._add_required_staff_count_constraints(model, schedule_dict)
+        self._add_required_staff_count_constraints(model, schedule_grid, assumptions, relaxation)
 
 @dataclass
 class RequiredAttendanceAttributes:
@@ -134,11 +294,11 @@ class RequiredAttendanceAttributes:
 
     属性:
     - date (int): シフトの日付
-    - staff_ids (list): 必要な権限を持つスタッフのIDのリスト
+    - staff_ids (frozenset): 必要な権限を持つスタッフのIDの集合 同じ役職の組み合わせの日で共有される
     - required_attendance_tier_count (int): 必要な役職の数
     """
     date: int
-    staff_ids: list
+    staff_ids: frozenset
     required_attendance_tier_count: int
 
 class RequiredAttendanceConstraints(ConstraintsBase):
@@ -157,41 +317,59 @@ class RequiredAttendanceConstraints(ConstraintsBase):
     def _create_required_attendance_attributes(self):
         """
         date をキーとし、その日に必要な役職を持つスタッフの情報を値とする辞書を作成する
+        必要な役職を持つスタッフIDの集合は、役職の組み合わせごとに一度だけ作成し、同じ組み合わせの日で共有する
         """
         required_attendance_attributes = {}
+        staff_ids_by_tiers = {}
         for shift in self.shifts:
-            staff_ids = [staff.id for staff in self.staffs if staff.tier in shift.required_attendance_tiers]
+            tiers = frozenset(shift.required_attendance_tiers)
+            if tiers not in staff_ids_by_tiers:
+                staff_ids_by_tiers[tiers] = frozenset(staff.id for staff in self.staffs if staff.tier in tiers)
             required_attendance_attributes[shift.date] = RequiredAttendanceAttributes(
                 date = shift.date,
-                staff_ids = staff_ids,
+                staff_ids = staff_ids_by_tiers[tiers],
                 required_attendance_tier_count = shift.required_attendance_tier_count
             )
         return required_attendance_attributes
 
-    def _create_schedule_dict(self, schedule_list):
-        """
-        required_attendance_attributes を参照し、date をキーとし、その日のスケジュールリストを値とする辞書を作成する
-        """
-        return {shift.date: [s for s in schedule_list if s.date == shift.date] for shift in self.shifts}
-
-    def _add_required_attendance_tier_count_constraints(self, model, schedule_dict):
+    def _add_required_attendance_tier_count_constraints(self, model, schedule_grid, assumptions, relaxation):
         """
         必要な役職の数を満たす制約を追加する
 
         Parameters:
             - model: cp_model.CpModel, 制約プログラミングモデル
-            - schedule_dict: dict, required_attendance_attributes を参照し、date をキーとし、その日のスケジュールリストを値とする辞書
+            - schedule_grid: ScheduleGrid, 日付ごとの出勤可否の変数を参照するために使用する
+            - assumptions: Assumptions, 制約をルールとして登録するために使用する
+            - relaxation: Relaxation, 緩和モードで制約の式にスラック変数を加えるために使用する
         """
-        for date, schedule_list in schedule_dict.items():
-            required_attendance_attributes = self.required_attendance_attributes[date]
-            model.Add(sum([s.is_working_variable for s in schedule_list if s.staff_id in required_attendance_attributes.staff_ids]) >= required_attendance_attributes.required_attendance_tier_count)
+        for shift in self.shifts:
+            is_working_variables = schedule_grid.date_variables(shift.date)
+            required_attendance_attributes = self.required_attendance_attributes[shift.date]
+            staff_ids = required_attendance_attributes.staff_ids
+            required_attendance_tier_count = required_attendance_attributes.required_attendance_tier_count
+            rule = {
+                'date': shift.date,
+                'required_attendance_tiers': tuple(shift.required_attendance_tiers),
+                'required_attendance_tier_count': shift.required_attendance_tier_count
+            }
+            attendance_tier_count = relaxation.relax(
+                cp_model.LinearExpr.Sum([
+                    variable
+                    for staff_id, variable in zip(schedule_grid.staff_ids, is_working_variables)
+                    if staff_id in staff_ids
+                ]),
+                'required_attendance_tier_count', max_shortage=required_attendance_tier_count, **rule
+            )
+            assumptions.enforce(
+                model.Add(attendance_tier_count >= required_attendance_tier_count),
+                'required_attendance_tier_count', **rule
+            )
 
-    def add_constraints(self, model, schedule_list):
+    def add_constraints(self, model, schedule_grid, assumptions, relaxation):
         """
         制約を追加するメソッド
         ShiftScheduleModel クラスの add_constraints() メソッドで呼び出される
 
         各制約追加のプライベートメソッドを呼び出す
         """
-        schedule_dict = self._create_schedule_dict(schedule_list)
-        self._add_required_attendance_tier_count_constraints(model, schedule_dict)
+        self._add_required_attendance_tier_count_constraints(model, schedule_grid, assumptions, relaxation)
@@ -0,0 +1,253 @@
+import numpy as np
+from models.constraints import StaffConstraints, consecutive_days_limits
+from models.objectives import StaffObjectives, ShiftBalanceTierObjectives
+
+class ScheduleEvaluator:
+    """
+    出勤可否の (日付の位置, スタッフの位置) の bool 配列から、シフト表の品質の指標を CP-SAT を使わずに計算するクラス
+    解の評価や、手で編集したシフト表の確認に使用する
+
+    スタッフごと、日付ごとの集計を NumPy の配列演算でまとめて行い、セルごとのループは行わない
+    ルールの判定と目的関数の重みは制約、目的関数のクラスと同じ定義を使い、
+    満たせなかったルールは Relaxation.violations() と同じ形式の辞書で返す
+    ローリングホライズンの期間の境界（直前の期間からの連勤、先読みする日付）は考慮しない
+
+    Parameters:
+        - shifts: list, Shift のリスト 配列の日付の位置は shifts の順とする
+        - staffs: list, Staff のリスト 配列のスタッフの位置は staffs の順とする
+        - locked: list, LockedShift のリスト ロックと異なるセルを違反とする
+        - shift_balance_mode: str, ShiftBalanceTierObjectives の mode
+        - max_consecutive_work_days: int, 店舗の最大連勤数 Staff に指定がある場合はスタッフの値を優先する
+        - min_consecutive_rest_days: int, 店舗の最小連休数 Staff に指定がある場合はスタッフの値を優先する
+    """
+    def __init__(self, shifts, staffs, locked=None, shift_balance_mode='max', max_consecutive_work_days=StaffConstraints.MAX_CONSECUTIVE_WORK_DAYS, min_consecutive_rest_days=StaffConstraints.MIN_CONSECUTIVE_REST_DAYS):
+        self.shifts = shifts
+        self.staffs = staffs
+        self.dates = [shift.date for shift in shifts]
+        self.staff_ids = [staff.id for staff in staffs]
+        self.shift_balance_mode = shift_balance_mode
+        self._date_positions = {date: i for i, date in enumerate(self.dates)}
+        self._staff_positions = {staff_id: j for j, staff_id in enumerate(self.staff_ids)}
+        shape = (len(shifts), len(staffs))
+
+        self.work_days = np.array([staff.work_days for staff in staffs], dtype=np.int64)
+        limits = [consecutive_days_limits(staff, max_consecutive_work_days, min_consecutive_rest_days) for staff in staffs]
+        self.max_consecutive_work_days = np.array([limit for limit, _ in limits], dtype=np.int64)
+        self.min_consecutive_rest_days = np.array([limit for _, limit in limits], dtype=np.int64)
+        self.required_staff_counts = np.array([shift.required_staff_count for shift in shifts], dtype=np.int64)
+        self.required_attendance_tier_counts = np.array([shift.required_attendance_tier_count for shift in shifts], dtype=np.int64)
+        tiers = np.array([staff.tier for staff in staffs], dtype=np.int64)
+        # required_tier_mask[i, j] は staffs[j] が shifts[i] の必須役職かどうか
+        self.required_tier_mask = np.zeros(shape, dtype=bool)
+        for i, shift in enumerate(shifts):
+            self.required_tier_mask[i] = np.isin(tiers, shift.required_attendance_tiers)
+        self.desired_off_mask = np.zeros(shape, dtype=bool)
+        for j, staff in enumerate(staffs):
+            for day in staff.desired_off_days:
+                if day in self._date_positions:
+                    self.desired_off_mask[self._date_positions[day], j] = True
+
+        # ロックされたセルは locked_mask を True とし、locked_values にロックされた出勤可否を入れる
+        self.locked_mask = np.zeros(shape, dtype=bool)
+        self.locked_values = np.zeros(shape, dtype=bool)
+        for lock in locked or []:
+            if lock.date in self._date_positions and lock.staff_id in self._staff_positions:
+                position = self.position(lock.date, lock.staff_id)
+                self.locked_mask[position] = True
+                self.locked_values[position] = bool(lock.is_working)
+
+        shift_balance = ShiftBalanceTierObjectives(shifts, staffs, shift_balance_mode)
+        self.tier_balance_coefficients = np.array(
+            [shift_balance.tier_balance_coefficients.get(staff_id, 0) for staff_id in self.staff_ids], dtype=np.int64
+        )
+        self.shift_balance_tier_penalty = shift_balance.penalty_dict['shift_balance_tier']
+        self.desired_off_days_penalty = StaffObjectives(staffs).penalty_dict['desired_off_days']
+
+    def position(self, date, staff_id):
+        """
+        指定した日付、スタッフの (日付の位置, スタッフの位置) を返す
+        """
+        return self._date_positions[date], self._staff_positions[staff_id]
+
+    def to_matrix(self, assigned_shifts):
+        """
+        AssignedShift のリストから出勤可否の bool 配列を作成する
+        含まれないセルは出勤しないものとし、存在しない日付、スタッフは無視する 同じセルが複数ある場合は後のものを優先する
+        """
+        cells = [
+            (self._date_positions[assigned.date], self._staff_positions[assigned.staff_id], bool(assigned.is_working))
+            for assigned in assigned_shifts
+            if assigned.date in self._date_positions and assigned.staff_id in self._staff_positions
+        ]
+        is_working = np.zeros((len(self.dates), len(self.staff_ids)), dtype=bool)
+        if cells:
+            rows, columns, values = (np.array(values) for values in zip(*cells))
+            is_working[rows, columns] = values
+        return is_working
+
+    @staticmethod
+    def _longest_runs(is_working):
+        """
+        スタッフごとの最長の連勤数を返す
+        各日について直前の休みの位置を累積最大値で求め、その日までの連勤数を (日付の位置 - 直前の休みの位置) とする
+        """
+        if len(is_working) == 0:
+            return np.zeros(is_working.shape[1], dtype=np.int64)
+        positions = np.arange(len(is_working))[:, None]
+        last_off = np.maximum.accumulate(np.where(is_working, -1, positions), axis=0)
+        return (positions - last_off).max(axis=0)
+
+    @staticmethod
+    def _window_sums(values, size):
+        """
+        日付の方向に連続した size 日の合計を返す 形は (日数 - size + 1, スタッフ数)
+        """
+        cumulative = np.vstack([np.zeros((1, values.shape[1]), dtype=np.int64), values.cumsum(axis=0)])
+        return cumulative[size:] - cumulative[:-size]
+
+    def _consecutive_work_days_excess(self, counts):
+        """
+        スタッフごとに、最大連勤数 + 1 日の窓のうちすべての日に出勤している窓の数を返す（制約と同じく、窓ごとに超過 1 とする）
+        最大連勤数が同じスタッフごとにまとめて計算する
+        """
+        excess = np.zeros(counts.shape[1], dtype=np.int64)
+        for limit in np.unique(self.max_consecutive_work_days).tolist():
+            if limit + 1 > len(counts):
+                continue
+            columns = self.max_consecutive_work_days == limit
+            excess[columns] = (self._window_sums(counts[:, columns], limit + 1) > limit).sum(axis=0)
+        return excess
+
+    def _short_rest_count(self, is_working, counts):
+        """
+        スタッフごとに、出勤、最小連休数より短い k 日の休み、出勤という並びの数を返す（制約と同じく、並びごとに超過 1 とする）
+        """
+        short_rests = np.zeros(is_working.shape[1], dtype=np.int64)
+        days = len(is_working)
+        for rest_days in range(1, int(self.min_consecutive_rest_days.max(initial=1))):
+            if rest_days + 2 > days:
+                break
+            # rest_sums[i] は i + 1 日目から rest_days 日の出勤数
+            rest_sums = self._window_sums(counts, rest_days)[1:days - rest_days]
+            patterns = is_working[:days - rest_days - 1] & is_working[rest_days + 1:] & (rest_sums == 0)
+            short_rests += np.where(self.min_consecutive_rest_days > rest_days, patterns.sum(axis=0), 0)
+        return short_rests
+
+    def evaluate(self, is_working):
+        """
+        シフト表の品質の指標を計算する
+
+        Parameters:
+            - is_working: np.ndarray, (len(shifts), len(staffs)) の出勤可否の bool 配列
+
+        戻り値:
+            - 次のキーを持つ辞書
+              - objective: 希望休と役職バランスのペナルティと、その合計（RandomizedObjective などは含まない）
+              - staffs: スタッフごとの出勤数、目標の出勤数、出勤した希望休の日付、最長の連勤数、最大連勤数と最小連休数
+              - days: 日付ごとの出勤数、必要なスタッフ数、必須役職の出勤数、必要な数との差（余裕）、役職バランスの差分
+              - violations: 満たせなかったルールのリスト（Relaxation.violations() と同じ形式、ロックと異なるセルは type 'locked'）
+        """
+        is_working = np.asarray(is_working, dtype=bool)
+        counts = is_working.astype(np.int64)
+
+        work_days = counts.sum(axis=0)
+        longest_runs = self._longest_runs(is_working)
+        consecutive_excess = self._consecutive_work_days_excess(counts)
+        short_rests = self._short_rest_count(is_working, counts)
+        desired_off_worked = is_working & self.desired_off_mask
+
+        staff_counts = counts.sum(axis=1)
+        attendance_tier_counts = (counts * self.required_tier_mask).sum(axis=1)
+        tier_balances = counts @ self.tier_balance_coefficients
+        if self.shift_balance_mode == 'max':
+            tier_balance_penalty = max(int(tier_balances.max(initial=0)), 0)
+        else:
+            tier_balance_penalty = int(np.maximum(tier_balances, 0).sum())
+        lock_mismatches = self.locked_mask & (is_working != self.locked_values)
+
+        objective = {
+            'desired_off_days': int(desired_off_worked.sum()) * self.desired_off_days_penalty,
+            'shift_balance_tier': tier_balance_penalty * self.shift_balance_tier_penalty
+        }
+        objective['total'] = objective['desired_off_days'] + objective['shift_balance_tier']
+
+        desired_off_dates = [[] for _ in self.staff_ids]
+        for j, i in zip(*np.nonzero(desired_off_worked.T)):
+            desired_off_dates[j].append(self.dates[i])
+
+        staffs = [
+            {
+                'staff_id': staff_id,
+                'work_days': actual,
+                'target_work_days': target,
+                'desired_off_days_worked': dates,
+                'longest_consecutive_work_days': longest,
+                'max_consecutive_work_days': max_consecutive_work_days,
+                'min_consecutive_rest_days': min_consecutive_rest_days
+            }
+            for staff_id, actual, target, dates, longest, max_consecutive_work_days, min_consecutive_rest_days in zip(
+                self.staff_ids, work_days.tolist(), self.work_days.tolist(), desired_off_dates, longest_runs.tolist(),
+                self.max_consecutive_work_days.tolist(), self.min_consecutive_rest_days.tolist()
+            )
+        ]
+        days = [
+            {
+                'date': date,
+                'staff_count': staff_count,
+                'required_staff_count': required_staff_count,
+                'staff_count_slack': staff_count - required_staff_count,
+                'attendance_tier_count': attendance_tier_count,
+                'required_attendance_tier_count': required_attendance_tier_count,
+                'attendance_tier_count_slack': attendance_tier_count - required_attendance_tier_count,
+                'tier_balance': tier_balance
+            }
+            for date, staff_count, required_staff_count, attendance_tier_count, required_attendance_tier_count, tier_balance in zip(
+                self.dates, staff_counts.tolist(), self.required_staff_counts.tolist(),
+                attendance_tier_counts.tolist(), self.required_attendance_tier_counts.tolist(), tier_balances.tolist()
+            )
+        ]
+
+        violations = []
+        for j in np.nonzero(work_days != self.work_days)[0].tolist():
+            difference = int(work_days[j] - self.work_days[j])
+            violations.append({
+                'type': 'work_days', 'staff_id': self.staff_ids[j], 'work_days': int(self.work_days[j]),
+                'shortage': max(-difference, 0), 'excess': max(difference, 0)
+            })
+        for j in np.nonzero(consecutive_excess)[0].tolist():
+            violations.append({
+                'type': 'max_consecutive_work_days', 'staff_id': self.staff_ids[j],
+                'max_consecutive_work_days': int(self.max_consecutive_work_days[j]),
+                'shortage': 0, 'excess': int(consecutive_excess[j])
+            })
+        for j in np.nonzero(short_rests)[0].tolist():
+            violations.append({
+                'type': 'min_consecutive_rest_days', 'staff_id': self.staff_ids[j],
+                'min_consecutive_rest_days': int(self.min_consecutive_rest_days[j]),
+                'shortage': 0, 'excess': int(short_rests[j])
+            })
+        for i in np.nonzero(staff_counts < self.required_staff_counts)[0].tolist():
+            violations.append({
+                'type': 'required_staff_count', 'date': self.dates[i], 'required_staff_count': int(self.required_staff_counts[i]),
+                'shortage': int(self.required_staff_counts[i] - staff_counts[i]), 'excess': 0
+            })
+        for i in np.nonzero(attendance_tier_counts < self.required_attendance_tier_counts)[0].tolist():
+            violations.append({
+                'type': 'required_attendance_tier_count', 'date': self.dates[i],
+                'required_attendance_tiers': tuple(self.shifts[i].required_attendance_tiers),
+                'required_attendance_tier_count': int(self.required_attendance_tier_counts[i]),
+                'shortage': int(self.required_attendance_tier_counts[i] - attendance_tier_counts[i]), 'excess': 0
+            })
+        for i, j in zip(*np.nonzero(lock_mismatches)):
+            is_locked_working = bool(self.locked_values[i, j])
+            violations.append({
+                'type': 'locked', 'date': self.dates[i], 'staff_id': self.staff_ids[j], 'is_working': is_locked_working,
+                'shortage': int(is_locked_working), 'excess': int(not is_locked_working)
+            })
+
+        return {
+            'objective': objective,
+            'staffs': staffs,
+            'days': days,
+            'violations': violations
+        }
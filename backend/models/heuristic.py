@@ -0,0 +1,132 @@
+from models.constraints import StaffConstraints, consecutive_days_limits
+from models.parameters import AssignedShift
+
+class GreedyScheduleHeuristic:
+    """
+    CP-SAT を使わずに、日付順の貪欲法でシフト表を作成するクラス
+    大きな店舗で CP-SAT が最初の解を見つけるまでの時間を短くするための初期解や、
+    探索せずにすぐ返す 'fast' モードの解として使用する
+
+    日付ごとに、ロックされたシフトを反映した後
+    1. 残りの日数で出勤数を満たせなくなるスタッフ
+    2. 必須役職の数に足りない分を、必須役職のスタッフから
+    3. 必要なスタッフ数に足りない分を、残りのスタッフから
+    の順に出勤させる 2, 3 では、残りの出勤数を残りの出勤できる日数で割った値が大きいスタッフを優先し、希望休のスタッフは後にする
+    出勤数に達したスタッフと、最大連勤数に達したスタッフ、連勤の後の休みが最小連休数に達していないスタッフは出勤させない
+
+    制約をすべて満たすことは保証しない 満たせなかったルールは同じ制約の定義（緩和モード）で評価する
+
+    Parameters:
+        - shifts: list, Shift のリスト
+        - staffs: list, Staff のリスト
+        - locked: list, LockedShift のリスト
+        - boundary: HorizonBoundary, ローリングホライズンでの期間の境界の状態
+        - max_consecutive_work_days: int, 店舗の最大連勤数
+        - min_consecutive_rest_days: int, 店舗の最小連休数
+    """
+    def __init__(self, shifts, staffs, locked, boundary=None, max_consecutive_work_days=StaffConstraints.MAX_CONSECUTIVE_WORK_DAYS, min_consecutive_rest_days=StaffConstraints.MIN_CONSECUTIVE_REST_DAYS):
+        self.shifts = shifts
+        self.staffs = staffs
+        self.locked = locked
+        self.boundary = boundary
+        self.limits = {
+            staff.id: consecutive_days_limits(staff, max_consecutive_work_days, min_consecutive_rest_days)
+            for staff in staffs
+        }
+
+    def assign(self):
+        """
+        すべての日付とスタッフの出勤可否を決め、AssignedShift のリストを返す（shifts の順、同じ日付の中では staffs の順）
+        """
+        # 同じシフトが複数回ロックされている場合は、後のものを優先する
+        locks = {(lock.date, lock.staff_id): bool(lock.is_working) for lock in self.locked}
+        lookahead_dates = set(self.boundary.lookahead_dates) if self.boundary else set()
+        planned_dates = [shift.date for shift in self.shifts if shift.date not in lookahead_dates]
+        desired_off_days = {staff.id: set(staff.desired_off_days) for staff in self.staffs}
+
+        # remaining: ロックで出勤する日を除いた、残りの出勤数（先読みする日付は lookahead_work_days の残り）
+        # available: 計画期間の残りの日付のうち、ロックされておらず希望休でない日数
+        remaining = {}
+        lookahead_remaining = {}
+        available = {}
+        for staff in self.staffs:
+            remaining[staff.id] = staff.work_days - sum(1 for date in planned_dates if locks.get((date, staff.id)) is True)
+            available[staff.id] = sum(
+                1 for date in planned_dates
+                if (date, staff.id) not in locks and date not in desired_off_days[staff.id]
+            )
+            if self.boundary:
+                lookahead_remaining[staff.id] = self.boundary.lookahead_work_days.get(staff.id, 0) - sum(
+                    1 for date in lookahead_dates if locks.get((date, staff.id)) is True
+                )
+        consecutive = {
+            staff.id: self.boundary.consecutive_work_days_before.get(staff.id, 0) if self.boundary else 0
+            for staff in self.staffs
+        }
+        # 連勤の後に続けて休んでいる日数 期間の最初から休んでいる場合は None とし、最小連休数を数えない
+        rest_days_before = self.boundary.consecutive_rest_days_before if self.boundary else {}
+        resting = {
+            staff.id: 0 if consecutive[staff.id] > 0 else rest_days_before.get(staff.id) or None
+            for staff in self.staffs
+        }
+
+        assigned = []
+        for shift in self.shifts:
+            date = shift.date
+            is_lookahead = date in lookahead_dates
+            budget = lookahead_remaining if is_lookahead else remaining
+            required_tiers = set(shift.required_attendance_tiers)
+
+            working = set()
+            candidates = []
+            for position, staff in enumerate(self.staffs):
+                lock = locks.get((date, staff.id))
+                if lock is not None:
+                    if lock:
+                        working.add(staff.id)
+                    continue
+                is_desired_off = date in desired_off_days[staff.id]
+                is_available = not is_lookahead and not is_desired_off
+                days_left = available[staff.id]
+                if is_available:
+                    available[staff.id] -= 1
+                max_consecutive_work_days, min_consecutive_rest_days = self.limits[staff.id]
+                if budget[staff.id] <= 0 or consecutive[staff.id] >= max_consecutive_work_days:
+                    continue
+                if resting[staff.id] is not None and 0 < resting[staff.id] < min_consecutive_rest_days:
+                    continue
+                # 今日出勤しないと、残りの出勤できる日数（最大連勤数ごとに最小連休数の日数は休む）で出勤数を満たせない
+                future_days = days_left - int(is_available)
+                cycle = max_consecutive_work_days + min_consecutive_rest_days
+                if not is_lookahead and budget[staff.id] > future_days - future_days // cycle * min_consecutive_rest_days:
+                    working.add(staff.id)
+                    continue
+                urgency = budget[staff.id] / max(days_left, 1)
+                candidates.append(((is_desired_off, -urgency, position), staff))
+            candidates.sort(key=lambda candidate: candidate[0])
+
+            tier_count = sum(1 for staff in self.staffs if staff.id in working and staff.tier in required_tiers)
+            for _, staff in candidates:
+                if tier_count >= shift.required_attendance_tier_count:
+                    break
+                if staff.tier in required_tiers:
+                    working.add(staff.id)
+                    tier_count += 1
+            for _, staff in candidates:
+                if len(working) >= shift.required_staff_count:
+                    break
+                working.add(staff.id)
+
+            for staff in self.staffs:
+                is_working = staff.id in working
+                if is_working:
+                    consecutive[staff.id] += 1
+                    resting[staff.id] = 0
+                    if (date, staff.id) not in locks:
+                        budget[staff.id] -= 1
+                else:
+                    consecutive[staff.id] = 0
+                    if resting[staff.id] is not None:
+                        resting[staff.id] += 1
+                assigned.append(AssignedShift(date=date, staff_id=staff.id, is_working=is_working))
+        return assigned
@@ -1,4 +1,5 @@
 import random
+from ortools.sat.python import cp_model
 from enums import Tier
 
 class ObjectivesBase:
@@ -28,40 +29,28 @@ class StaffObjectives(ObjectivesBase):
         }
 
 
-    def _create_schedule_dict(self, schedule_list):
-        """
-        スケジュールを辞書にし、スタッフメンバーのIDをキーとしてまとめる
-        ex {staff_id_1: {date_1: schedule, date_2: schedule, ...}, staff_id_2: {date_1: schedule, date_2: schedule, ...}, ...}
-
-        Parameters:
-            - schedule_list: list, ScheduleAttributes のリスト
-        """
-        return {staff.id: {s.date: s for s in schedule_list if s.staff_id == staff.id} for staff in self.staffs}
-    
-    def _compute_desired_off_days_objective_value(self, schedule_dict):
+    def _compute_desired_off_days_objective_value(self, schedule_grid):
         """
         希望休の日数に関する目的関数の値を計算する
 
         Parameters:
-            - schedule_dict: dict, スタッフIDをキーとし、そのスタッフに関連するスケジュールリストを値とする辞書
+            - schedule_grid: ScheduleGrid, (date, staff_id) で出勤可否の変数を参照するために使用する
         """
-        penalty = 0
-        for staff_id, schedule_list in schedule_dict.items():
-            staff = self.staffs_dict[staff_id]
-            for day in staff.desired_off_days:
-                schedule = schedule_list[day]
-                penalty += self.penalty_dict['desired_off_days'] * schedule.is_working_variable
-        return penalty
+        is_working_variables = [
+            schedule_grid.variable(day, staff.id)
+            for staff in self.staffs
+            for day in staff.desired_off_days
+        ]
+        return self.penalty_dict['desired_off_days'] * cp_model.LinearExpr.Sum(is_working_variables)
 
-    def compute_objective_value(self, _, schedule_list):
+    def compute_objective_value(self, _, schedule_grid):
         """
         目的関数の値を計算するメソッド
 
         Parameters:
-            - schedule_list: list, ScheduleAttributes のリスト
+            - schedule_grid: ScheduleGrid
         """
-        schedule_dict = self._create_schedule_dict(schedule_list)
-        return self._compute_desired_off_days_objective_value(schedule_dict)
+        return self._compute_desired_off_days_objective_value(schedule_grid)
 
 class ShiftBalanceTierObjectives(ObjectivesBase):
     """
@@ -75,105 +64,171 @@ class ShiftBalanceTierObjectives(ObjectivesBase):
     Parameters:
         - shifts: list, Shift のリスト
         - staffs: list, Staff のリスト
+        - mode: str, ペナルティの集計方法
+            - 'max': 最もバランスの悪い日の差分をペナルティとする
+            - 'sum': 各日の差分の合計をペナルティとする
     """
-    def __init__(self, shifts, staffs):
+    MODES = ('max', 'sum')
+
+    def __init__(self, shifts, staffs, mode='max'):
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {', '.join(self.MODES)}")
         self.shifts = shifts
         self.staffs = staffs
+        self.mode = mode
         self.penalty_dict = {
             'shift_balance_tier': 20
         }
         self.heights_tier_staff_ids = self._create_tiers_ids([Tier.MANAGER.value, Tier.DAY_MANAGER.value, Tier.UPPER.value])
         self.lower_tier_staff_ids = self._create_tiers_ids([Tier.MIDDLE.value, Tier.JUNIOR.value])
+        self.tier_balance_coefficients = self._create_tier_balance_coefficients()
 
     def _create_tiers_ids(self, target_tiers):
         """
-        対象 Tier に属するスタッフの ID のリストを作成する
+        対象 Tier に属するスタッフの ID の集合を作成する
         """
 
-        return [staff.id for staff in self.staffs if staff.tier in target_tiers]
+        return frozenset(staff.id for staff in self.staffs if staff.tier in target_tiers)
 
-    def _create_schedule_dict(self, schedule_list):
+    def _create_tier_balance_coefficients(self):
+        """
+        スタッフIDをキーとし、低レベル層は 1、高レベル層は -1 を値とする辞書を作成する
+        全ての日で共有し、一日の (低レベル層の人数 - 高レベル層の人数) を重み付き和として計算するために使用する
         """
-        スケジュールを辞書にし、Shift の日付をキーとしてまとめる
-        ex {date_1: {staff_id_1: schedule, staff_id_2: schedule, ...}, date_2: {staff_id_1: schedule, staff_id_2: schedule, ...}, ...}
+        coefficients = {staff_id: -1 for staff_id in self.heights_tier_staff_ids}
+        coefficients.update({staff_id: 1 for staff_id in self.lower_tier_staff_ids})
+        return coefficients
+
+    def _create_tier_count_diff(self, staff_ids, is_working_variables):
+        """
+        一日の (低レベル層の勤務数 - 高レベル層の勤務数) を重み付き和で作成する
 
         Parameters:
-            - schedule_list: list, ScheduleAttributes のリスト
+            - staff_ids: list, スタッフのIDのリスト
+            - is_working_variables: list, その日の出勤可否を表すブール変数のリスト（staff_ids の順）
         """
-        return {shift.date: {s.staff_id: s for s in schedule_list if s.date == shift.date} for shift in self.shifts}
-    
-    def _compute_shift_balance_tier_objective_value(self, model, schedule_dict):
+        targets = [
+            (variable, self.tier_balance_coefficients[staff_id])
+            for staff_id, variable in zip(staff_ids, is_working_variables)
+            if staff_id in self.tier_balance_coefficients
+        ]
+        return cp_model.LinearExpr.WeightedSum(
+            [variable for variable, _ in targets],
+            [coefficient for _, coefficient in targets]
+        )
+
+    def _compute_shift_balance_tier_objective_value(self, model, schedule_grid):
         """
         シフトスケジュールにおける役職バランスに関する目的関数（ペナルティ値）を計算する
         特定の日に、通常層や新人層のスタッフの数が店長クラス、当日責任者、優秀層の人数よりも多い場合、その差分に対してペナルティを与える
-        ペナルティは非負、つまり上位レイヤーの人数が下位レイヤーの人数よりも多い場合はペナルティは 0 にするため各種制約を追加する
+
+        ペナルティ変数は下限 0 の変数とし、各日の差分以上であるという制約だけを追加する
+        最小化によってペナルティ変数は max(0, 差分) に一致するため、差分の正負を表すブール変数は必要ない
+        - mode が 'max' の場合は全ての日で 1 つのペナルティ変数を共有する
+        - mode が 'sum' の場合は日ごとにペナルティ変数を作成し、その合計をペナルティとする
 
         Parameters:
-            - schedule_dict: 辞書型。キーに日付、値に（スタッフIDをキー、関連するスケジュールリストを値とする辞書）を持つ。
+            - schedule_grid: ScheduleGrid, 日付ごとの出勤可否の変数を参照するために使用する
         """
         total_staff_count = len(self.staffs)
-        # ペナルティの合計値を保持する変数を0からスタッフの最大数までの範囲で作成
-        penalty_var = model.NewIntVar(0, total_staff_count, "shift_balance_tier_penalty")
-
-        for _, schedule_dict in schedule_dict.items():
-            # 高レベル層と低レベル層の一日の勤務数を計算
-            heights_tier_count = sum([schedule.is_working_variable for staff_id, schedule in schedule_dict.items() if staff_id in self.heights_tier_staff_ids])
-            lower_tier_count = sum([schedule.is_working_variable for staff_id, schedule in schedule_dict.items() if staff_id in self.lower_tier_staff_ids])
-
-            # diff_var は lower_tier_count と heights_tier_count の差を保持する変数
-            diff_var = model.NewIntVar(-total_staff_count, total_staff_count, "shift_balance_tier_diff")
-            model.Add(diff_var == lower_tier_count - heights_tier_count)
-
-            # is_diff_positive は diff_var が 0 以上であるかどうかを示すブール変数
-            is_diff_positive = model.NewBoolVar("shift_balance_tier_is_diff_positive")
-            
-            # diff_var が 0 以上の場合、is_diff_positive をTrueとして設定
-            model.Add(diff_var >= 0).OnlyEnforceIf(is_diff_positive)
-            
-            # diff_var が負の場合、is_diff_positive をFalseとして設定
-            model.Add(diff_var < 0).OnlyEnforceIf(is_diff_positive.Not())
-
-            # is_diff_positive が True の場合、penalty_var は diff_var 以上にする制約を追加
-            model.Add(penalty_var >= diff_var).OnlyEnforceIf(is_diff_positive)
-            
-            # is_diff_positive が False の場合、penalty_var は最低でも 0 にする制約を追加
-            model.Add(penalty_var >= 0).OnlyEnforceIf(is_diff_positive.Not())
-
-            # 以上で penalty_var が非負であることを保証する
+
+        if self.mode == 'max':
+            # 全ての日の差分の最大値以上となる、0からスタッフの最大数までの範囲の変数
+            penalty_var = model.NewIntVar(0, total_staff_count, "shift_balance_tier_penalty")
+            for shift in self.shifts:
+                tier_count_diff = self._create_tier_count_diff(schedule_grid.staff_ids, schedule_grid.date_variables(shift.date))
+                model.Add(penalty_var >= tier_count_diff)
+            penalty = penalty_var
+        else:
+            penalty_vars = []
+            for shift in self.shifts:
+                tier_count_diff = self._create_tier_count_diff(schedule_grid.staff_ids, schedule_grid.date_variables(shift.date))
+                # その日の差分以上となる、0からスタッフの最大数までの範囲の変数
+                penalty_var = model.NewIntVar(0, total_staff_count, f"shift_balance_tier_penalty_{shift.date}")
+                model.Add(penalty_var >= tier_count_diff)
+                penalty_vars.append(penalty_var)
+            penalty = cp_model.LinearExpr.Sum(penalty_vars)
 
         # ペナルティの値を penalty_dict の重み付け値で掛けたものを戻り値として返す
-        return penalty_var * self.penalty_dict['shift_balance_tier']
+        return penalty * self.penalty_dict['shift_balance_tier']
 
-    def compute_objective_value(self, model, schedule_list):
+    def compute_objective_value(self, model, schedule_grid):
         """
         目的関数の値を計算するメソッド
 
         Parameters:
-            - schedule_list: list, ScheduleAttributes のリスト
+            - schedule_grid: ScheduleGrid
+        """
+        return self._compute_shift_balance_tier_objective_value(model, schedule_grid)
+
+class PreviousShiftObjectives(ObjectivesBase):
+    """
+    前回の解からの変更に関する目的関数を追加するクラス
+    前回の解と出勤可否が異なるシフトにペナルティを与え、再最適化で変更されるセルを少なくする
+    作られたインスタンスは ShiftScheduleModel クラスの compute_objective_value() メソッドに渡される
+
+    Parameters:
+        - previous: list, AssignedShift のリスト
+    """
+    def __init__(self, previous):
+        self.previous = previous
+        self.penalty_dict = {
+            'previous_shift_change': 2
+        }
+
+    def compute_objective_value(self, _, schedule_grid):
         """
-        schedule_dict = self._create_schedule_dict(schedule_list)
-        return self._compute_shift_balance_tier_objective_value(model, schedule_dict)
+        目的関数の値を計算するメソッド
+        前回出勤していたシフトは休みになった場合に、前回休みだったシフトは出勤になった場合にペナルティを与える
+
+        Parameters:
+            - schedule_grid: ScheduleGrid
+        """
+        # 前回出勤していたシフトの変更は (1 - x)、休みだったシフトの変更は x で表す
+        is_working_variables = []
+        coefficients = []
+        worked_count = 0
+        for assigned in self.previous:
+            if not schedule_grid.has(assigned.date, assigned.staff_id):
+                continue
+            is_working_variables.append(schedule_grid.variable(assigned.date, assigned.staff_id))
+            coefficients.append(-1 if assigned.is_working else 1)
+            worked_count += int(assigned.is_working)
+        changed_count = cp_model.LinearExpr.WeightedSum(is_working_variables, coefficients) + worked_count
+        return self.penalty_dict['previous_shift_change'] * changed_count
 
 class RandomizedObjective(ObjectivesBase):
     """
     ランダムな目的関数を追加するクラス
     作られたインスタンスは ShiftScheduleModel クラスの compute_objective_value() メソッドに渡される
 
+    目的関数の値が同じ解の中から、seed によって異なる解を選ぶために使用する
+    すべてのセルに項を加えると目的関数の項がスタッフ数 × 日数だけ増え、CP-SAT の下界が弱くなるため、
+    density で項を加えるセルの割合を指定できる
+
     Parameters:
         - seed: int, ランダムシード 解を再現ないし、固定するために使用する
+        - density: float, 項を加えるセルの割合（0 より大きく 1 以下） 1 の場合はすべてのセルに項を加える
     """
-    def __init__(self, seed=None):
+    def __init__(self, seed=None, density=1.0):
+        if not 0 < density <= 1:
+            raise ValueError("density must be greater than 0 and less than or equal to 1")
         self.random = random.Random(seed)
+        self.density = density
 
-    def compute_objective_value(self, _, schedule_list):
+    def compute_objective_value(self, _, schedule_grid):
         """
         目的関数の値を計算するメソッド
         出勤時に -1 か 1 をランダムに選び、その値をペナルティとする
+        density が 1 未満の場合は、ランダムに選んだ一部のセルだけに項を加える
 
         Parameters:
-            - schedule_list: list, ScheduleAttributes のリスト
-        """
-        penalty = 0
-        for schedule in schedule_list:
-            penalty += self.random.choice([-1, 1]) * schedule.is_working_variable
-        return penalty
+            - schedule_grid: ScheduleGrid
+        """
+        is_working_variables = list(schedule_grid)
+        coefficients = [self.random.choice([-1, 1]) for _ in is_working_variables]
+        if self.density < 1:
+            indices = sorted(self.random.sample(range(len(is_working_variables)), round(len(is_working_variables) * self.density)))
+            is_working_variables = [is_working_variables[i] for i in indices]
+            coefficients = [coefficients[i] for i in indices]
+        return cp_model.LinearExpr.WeightedSum(is_working_variables, coefficients)
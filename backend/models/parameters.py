@@ -10,11 +10,15 @@ class Staff:
     - tier (int): スタッフメンバー役職のレベル
     - desired_off_days (list): スタッフメンバーが休みを希望する日のリスト
     - work_days (int): スタッフメンバーが働くことができる日数
+    - max_consecutive_work_days (int): スタッフメンバーの最大連勤数 None の場合は店舗の値
+    - min_consecutive_rest_days (int): 連勤の間の休みの最小日数 None の場合は店舗の値
     """
     id: int
     tier: int
     desired_off_days: list
     work_days: int
+    max_consecutive_work_days: int = None
+    min_consecutive_rest_days: int = None
 
 @dataclass
 class Shift:
@@ -45,3 +49,81 @@ class LockedShift:
     date: int
     staff_id: int
     is_working: bool
+
+@dataclass
+class SolverParameters:
+    """
+    CP-SAT ソルバーの探索に関するパラメータを保持するクラス
+    None の項目は CP-SAT のデフォルト値を使用する
+
+    属性:
+    - max_time_in_seconds (float): 探索の最大時間（秒）
+    - num_search_workers (int): 探索に使用するワーカースレッド数
+    - relative_gap_limit (float): 目的関数値と下界の相対ギャップがこの値以下になったら探索を打ち切る
+    - absolute_gap_limit (float): 目的関数値と下界の絶対ギャップがこの値以下になったら探索を打ち切る
+    - random_seed (int): 探索のランダムシード
+    """
+    max_time_in_seconds: float = None
+    num_search_workers: int = None
+    relative_gap_limit: float = None
+    absolute_gap_limit: float = None
+    random_seed: int = None
+
+@dataclass
+class AssignedShift:
+    """
+    前回の解など、割り当て済みのシフトに関するデータを保持するクラス
+
+    属性:
+    - date (int): シフトの日付
+    - staff_id (int): スタッフメンバーのID
+    - is_working (bool): スタッフメンバーが働いているかどうかを示すフラグ
+    """
+    date: int
+    staff_id: int
+    is_working: bool
+
+@dataclass
+class HorizonBoundary:
+    """
+    複数か月をローリングホライズンで計画する場合に、計画期間とその前後の期間との境界の状態を保持するクラス
+
+    属性:
+    - consecutive_work_days_before (dict): スタッフIDをキーとし、計画期間の直前まで続いている連勤数を値とする辞書
+    - consecutive_rest_days_before (dict): スタッフIDをキーとし、連勤の後に計画期間の直前まで続いている休みの日数を値とする辞書
+    - lookahead_dates (list): 次の期間から先読みする日付のリスト 計画期間の出勤数には数えない
+    - lookahead_work_days (dict): スタッフIDをキーとし、先読みする日付での出勤数の上限を値とする辞書
+    """
+    consecutive_work_days_before: dict
+    consecutive_rest_days_before: dict
+    lookahead_dates: list
+    lookahead_work_days: dict
+
+@dataclass
+class ShiftCell:
+    """
+    シフト表の 1 セル（日付とスタッフの組）を指定するクラス
+
+    属性:
+    - date (int): シフトの日付
+    - staff_id (int): スタッフメンバーのID
+    """
+    date: int
+    staff_id: int
+
+@dataclass
+class ScheduleEdits:
+    """
+    セッションのモデルに差分として適用するシフト表の編集を保持するクラス
+    属性の順に適用するため、同じセルを locked と unlocked の両方に含めた場合はロックが外れる
+
+    属性:
+    - locked (list of LockedShift): ロックする（ロックの値を変更する）シフト
+    - unlocked (list of ShiftCell): ロックを外すシフト
+    - added_desired_off_days (list of ShiftCell): 希望休に加える日付とスタッフ
+    - removed_desired_off_days (list of ShiftCell): 希望休から外す日付とスタッフ
+    """
+    locked: list
+    unlocked: list
+    added_desired_off_days: list
+    removed_desired_off_days: list
@@ -1,24 +1,394 @@
-from dataclasses import dataclass
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+import numpy as np
 from ortools.sat.python import cp_model
 import logging
 logger = logging.getLogger(__name__)
 
 @dataclass
-class ScheduleAttributes:
+class ScheduleValues:
     """
-    特定日に誰が出勤するかを示す属性を保持するクラス
-    シフトスケジュールモデルの
+    解の出勤可否を (日付の位置, スタッフの位置) の 2 次元配列で保持するクラス
+    レスポンスは to_shift_list()（セルごとの辞書のリスト）、to_columnar()（スタッフごとのビットマップ）、
+    to_packed()（スタッフごとのビットセット）のいずれかで作成する
 
     属性:
-    - date (int): シフトの日付
-    - staff_id (int): スタッフのID
-    - locked (bool): シフトがロックされているかどうかを示すフラグ
-    - is_working_variable (cp_model.IntVar): スタッフがシフトで働いているかどうかを示すCP-SATモデルのブール変数
+    - dates (list): シフトの日付のリスト
+    - staff_ids (list): スタッフのIDのリスト
+    - is_working (np.ndarray): is_working[i, j] は dates[i] の日に staff_ids[j] のスタッフが出勤するかどうか
+    - locked (np.ndarray): is_working と同じ形の、シフトがロックされているかどうかを示す配列
     """
-    date: int
-    staff_id: int
-    locked: bool
-    is_working_variable: cp_model.IntVar = None
+    dates: list
+    staff_ids: list
+    is_working: np.ndarray
+    locked: np.ndarray
+
+    def to_shift_list(self):
+        """
+        各シフトとスタッフの出勤可否を表す辞書のリストを返す（日付順、同じ日付の中ではスタッフ順）
+        """
+        is_working = self.is_working.tolist()
+        locked = self.locked.tolist()
+        return [
+            {
+                'date': date,
+                'staffId': staff_id,
+                'isWorking': is_working[i][j],
+                'locked': locked[i][j]
+            }
+            for i, date in enumerate(self.dates)
+            for j, staff_id in enumerate(self.staff_ids)
+        ]
+
+    @staticmethod
+    def _to_bitmaps(values):
+        """
+        スタッフごとに、日付順の出勤可否を '0' と '1' の文字列にしたリストを返す
+        """
+        rows = values.T.astype(np.uint8) + ord('0')
+        return [row.tobytes().decode('ascii') for row in rows]
+
+    def to_columnar(self):
+        """
+        日付とスタッフのIDのリストと、スタッフごとのビットマップからなる辞書を返す
+        isWorking[j][i] が '1' の場合、staffIds[j] のスタッフは dates[i] の日に出勤する
+        """
+        return {
+            'dates': self.dates,
+            'staffIds': self.staff_ids,
+            'isWorking': self._to_bitmaps(self.is_working),
+            'locked': self._to_bitmaps(self.locked)
+        }
+
+    @staticmethod
+    def _to_bitsets(values):
+        """
+        スタッフごとに、日付順の出勤可否を 1 日 1 ビットに詰めたバイト列のリストを返す
+        各バイトの最上位ビットが先の日付で、最後のバイトの余ったビットは 0 とする
+        """
+        return [row.tobytes() for row in np.packbits(values.T.astype(bool), axis=1)]
+
+    def to_packed(self):
+        """
+        to_columnar() のビットマップを、1 日 1 ビットのバイト列にした辞書を返す
+        isWorking[j] の i // 8 バイト目の上から i % 8 ビット目が 1 の場合、staffIds[j] のスタッフは dates[i] の日に出勤する
+        JSON では base64 の文字列、MessagePack ではバイナリとして送る
+        """
+        return {
+            'dates': self.dates,
+            'staffIds': self.staff_ids,
+            'isWorking': self._to_bitsets(self.is_working),
+            'locked': self._to_bitsets(self.locked)
+        }
+
+    def to_dict(self):
+        """
+        JSON に変換できる辞書を返す from_dict() で元の ScheduleValues に戻せる
+        """
+        return {
+            'dates': self.dates,
+            'staff_ids': self.staff_ids,
+            'is_working': self.is_working.tolist(),
+            'locked': self.locked.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        to_dict() で作成した辞書から ScheduleValues を作成する
+        """
+        shape = (len(data['dates']), len(data['staff_ids']))
+        return cls(
+            dates = data['dates'],
+            staff_ids = data['staff_ids'],
+            is_working = np.array(data['is_working'], dtype=bool).reshape(shape),
+            locked = np.array(data['locked'], dtype=bool).reshape(shape)
+        )
+
+@dataclass
+class SolveResult:
+    """
+    ShiftScheduleModel.solve() の結果を保持するクラス
+
+    属性:
+    - status (str): ソルバーが到達したステータス（OPTIMAL, FEASIBLE, INFEASIBLE, MODEL_INVALID, UNKNOWN）
+    - objective_value (float): 目的関数の値 解がない場合は None
+    - best_objective_bound (float): 目的関数の下界 解がない場合は None
+    - wall_time (float): 探索にかかった時間（秒）
+    - schedule (ScheduleValues): 解の出勤可否 解がない場合は None
+    - conflicts (list): 解がない場合に、同時には満たせないルールを表す辞書のリスト 診断していない場合は None
+    - violations (list): 緩和モードで満たせなかったルールと、その不足数、超過数を表す辞書のリスト 緩和モードでない場合は None
+    - stats (dict): モデルの大きさ（変数、制約、目的関数の項の数）と探索の統計（コンフリクト数、分岐数など） 探索中の暫定解の場合は None
+    """
+    status: str
+    objective_value: float
+    best_objective_bound: float
+    wall_time: float
+    schedule: ScheduleValues = None
+    conflicts: list = None
+    violations: list = None
+    stats: dict = None
+
+    @property
+    def shift_list(self):
+        """
+        各シフトとスタッフの出勤可否を表す辞書のリスト 解がない場合は None
+        """
+        return self.schedule.to_shift_list() if self.schedule is not None else None
+
+    def to_dict(self):
+        """
+        JSON に変換できる辞書を返す from_dict() で元の SolveResult に戻せる
+        """
+        data = {field.name: getattr(self, field.name) for field in fields(self)}
+        data['schedule'] = self.schedule.to_dict() if self.schedule is not None else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        to_dict() で作成した辞書から SolveResult を作成する
+        """
+        schedule = data['schedule']
+        return cls(**{**data, 'schedule': ScheduleValues.from_dict(schedule) if schedule is not None else None})
+
+class SolutionCallback(cp_model.CpSolverSolutionCallback):
+    """
+    探索中に改善解が見つかるたびに、その解を SolveResult として on_solution に渡すコールバック
+
+    Parameters:
+        - shift_schedule_model: ShiftScheduleModel
+        - on_solution: callable, SolveResult を 1 つ受け取る関数
+    """
+    def __init__(self, shift_schedule_model, on_solution):
+        super().__init__()
+        self.shift_schedule_model = shift_schedule_model
+        self.on_solution = on_solution
+
+    def on_solution_callback(self):
+        self.on_solution(SolveResult(
+            status = 'FEASIBLE',
+            objective_value = self.ObjectiveValue(),
+            best_objective_bound = self.BestObjectiveBound(),
+            wall_time = self.WallTime(),
+            schedule = self.shift_schedule_model._create_schedule_values(self.Response()),
+            violations = self.shift_schedule_model._create_violations(self)
+        ))
+
+class Assumptions:
+    """
+    制約のグループ（ルール）ごとに仮定リテラルを作成し、管理するクラス
+    解がない場合に、どのルールの組み合わせが原因かを診断するために使用する
+
+    enabled が False の場合は何もしないため、各制約クラスは診断の有無を意識せずに enforce() を呼び出せる
+    同じルールの制約は 1 つのリテラルを共有する
+
+    Parameters:
+        - model: cp_model.CpModel
+        - enabled: bool, 仮定リテラルを作成するかどうか
+    """
+    def __init__(self, model, enabled=False):
+        self.model = model
+        self.enabled = enabled
+        self._literals = {}
+        self._rules = {}
+
+    def enforce(self, constraint, rule_type, **rule):
+        """
+        制約をルールの仮定リテラルが真の場合のみ有効にする
+
+        Parameters:
+            - constraint: cp_model.Constraint, model.Add() の戻り値
+            - rule_type: str, ルールの種類 ex) 'work_days'
+            - rule: ルールを特定する属性 ex) staff_id=1, work_days=20
+        """
+        if not self.enabled:
+            return constraint
+
+        key = (rule_type, tuple(sorted(rule.items())))
+        literal = self._literals.get(key)
+        if literal is None:
+            literal = self.model.NewBoolVar(f"assumption_{rule_type}_{len(self._literals)}")
+            self._literals[key] = literal
+            self._rules[literal.Index()] = {'type': rule_type, **rule}
+        return constraint.OnlyEnforceIf(literal)
+
+    @property
+    def literals(self):
+        return list(self._literals.values())
+
+    def rules(self, literals):
+        """
+        仮定リテラルに対応するルールの辞書のリストを返す
+        """
+        return [self._rules[literal.Index()] for literal in literals]
+
+class Relaxation:
+    """
+    ルールの式にスラック変数を加え、ルールを満たせない場合でも解を返せるようにするクラス
+    スラック変数は目的関数でルールの種類ごとの重みを掛けて最小化し、満たせるルールは満たすようにする
+
+    enabled が False の場合は式をそのまま返すため、各制約クラスは緩和の有無を意識せずに relax() を呼び出せる
+    同じルールの制約（連勤数の各期間など）のスラック変数は、違反数を合計して報告する
+
+    Parameters:
+        - model: cp_model.CpModel
+        - enabled: bool, スラック変数を作成するかどうか
+        - weights: dict, ルールの種類をキーとし、違反 1 あたりのペナルティを値とする辞書 省略した種類は DEFAULT_WEIGHT
+    """
+    # 希望休や役職バランスのペナルティよりも十分に大きくし、ルールを満たせる場合は必ず満たすようにする
+    DEFAULT_WEIGHT = 1000
+
+    def __init__(self, model, enabled=False, weights=None):
+        self.model = model
+        self.enabled = enabled
+        self.weights = weights or {}
+        self._slacks = {}
+
+    def relax(self, expr, rule_type, max_shortage=0, max_excess=0, **rule):
+        """
+        式に不足分と超過分のスラック変数を加えた式 (expr + shortage - excess) を返す
+
+        Parameters:
+            - expr: cp_model.LinearExpr, ルールの対象となる式
+            - rule_type: str, ルールの種類 ex) 'work_days'
+            - max_shortage: int, 不足を許す上限 下限を持つルールで指定する
+            - max_excess: int, 超過を許す上限 上限を持つルールで指定する
+            - rule: ルールを特定する属性 ex) staff_id=1, work_days=20
+        """
+        if not self.enabled:
+            return expr
+
+        key = (rule_type, tuple(sorted(rule.items())))
+        shortages, excesses = self._slacks.setdefault(key, ([], []))
+        index = len(self._slacks)
+        if max_shortage > 0:
+            shortage = self.model.NewIntVar(0, max_shortage, f"shortage_{rule_type}_{index}_{len(shortages)}")
+            shortages.append(shortage)
+            expr = expr + shortage
+        if max_excess > 0:
+            excess = self.model.NewIntVar(0, max_excess, f"excess_{rule_type}_{index}_{len(excesses)}")
+            excesses.append(excess)
+            expr = expr - excess
+        return expr
+
+    def compute_objective_value(self, _, __):
+        """
+        スラック変数にルールの種類ごとの重みを掛けた合計を返す
+        ShiftScheduleModel の add_objectives() で他の目的関数と合わせて最小化される
+        """
+        variables = []
+        coefficients = []
+        for (rule_type, _), (shortages, excesses) in self._slacks.items():
+            weight = self.weights.get(rule_type, self.DEFAULT_WEIGHT)
+            variables += shortages + excesses
+            coefficients += [weight] * (len(shortages) + len(excesses))
+        return cp_model.LinearExpr.WeightedSum(variables, coefficients)
+
+    def violations(self, solution):
+        """
+        満たせなかったルールの辞書のリストを返す 緩和モードでない場合は None を返す
+
+        Parameters:
+            - solution: Value() メソッドを持つ CpSolver または CpSolverSolutionCallback
+
+        戻り値:
+            - {'type': ルールの種類, **ルールの属性, 'shortage': 不足数, 'excess': 超過数} のリスト
+        """
+        if not self.enabled:
+            return None
+
+        violations = []
+        for (rule_type, rule), (shortages, excesses) in self._slacks.items():
+            shortage = sum(solution.Value(variable) for variable in shortages)
+            excess = sum(solution.Value(variable) for variable in excesses)
+            if shortage or excess:
+                violations.append({'type': rule_type, **dict(rule), 'shortage': shortage, 'excess': excess})
+        return violations
+
+class ScheduleGrid:
+    """
+    出勤可否のブール変数を (日付の位置, スタッフの位置) の 2 次元の表で保持するクラス
+    ShiftScheduleModel で一度だけ作成され、各制約クラス、目的関数クラスに共有される
+
+    セルごとのオブジェクトは作成せず、変数のモデル内のインデックスとロックの有無は NumPy 配列で保持する
+    解の値は values() で CpSolverResponse から一括で取り出す
+
+    属性:
+    - dates (list): シフトの日付のリスト（shifts の順）
+    - staff_ids (list): スタッフのIDのリスト（staffs の順）
+    - variables (list): variables[i][j] は dates[i] の日に staff_ids[j] のスタッフが出勤するかどうかを表すブール変数
+    - variable_indices (np.ndarray): variables と同じ形の、各変数のモデル内のインデックス
+    - locked (np.ndarray): variables と同じ形の、シフトがロックされているかどうかを示す配列
+    """
+    def __init__(self, model, dates, staff_ids):
+        self.dates = dates
+        self.staff_ids = staff_ids
+        self._date_positions = {date: i for i, date in enumerate(dates)}
+        self._staff_positions = {staff_id: j for j, staff_id in enumerate(staff_ids)}
+
+        # 変数は連続して作成されるため、インデックスは最初の変数のインデックスからの連番になる
+        first_index = len(model.Proto().variables)
+        self.variables = [[model.NewBoolVar('') for _ in staff_ids] for _ in dates]
+        self.variable_indices = first_index + np.arange(len(dates) * len(staff_ids), dtype=np.int64).reshape(len(dates), len(staff_ids))
+        self.locked = np.zeros((len(dates), len(staff_ids)), dtype=bool)
+        self._staff_variables = [list(column) for column in zip(*self.variables)] if dates else [[] for _ in staff_ids]
+
+    def __iter__(self):
+        """
+        全ての変数を日付順（同じ日付の中ではスタッフ順）に返す
+        """
+        return (variable for row in self.variables for variable in row)
+
+    def __len__(self):
+        return len(self.dates) * len(self.staff_ids)
+
+    def position(self, date, staff_id):
+        """
+        指定した日付、スタッフの (日付の位置, スタッフの位置) を返す
+        """
+        return self._date_positions[date], self._staff_positions[staff_id]
+
+    def has(self, date, staff_id):
+        """
+        指定した日付、スタッフのセルが存在するかどうかを返す
+        """
+        return date in self._date_positions and staff_id in self._staff_positions
+
+    def variable(self, date, staff_id):
+        """
+        指定した日付、スタッフの出勤可否を表すブール変数を返す
+        """
+        i, j = self.position(date, staff_id)
+        return self.variables[i][j]
+
+    def is_locked(self, date, staff_id):
+        """
+        指定した日付、スタッフのシフトがロックされているかどうかを返す
+        """
+        return bool(self.locked[self.position(date, staff_id)])
+
+    def staff_variables(self, staff_id):
+        """
+        指定したスタッフの出勤可否を表すブール変数のリストを日付順に返す
+        """
+        return self._staff_variables[self._staff_positions[staff_id]]
+
+    def date_variables(self, date):
+        """
+        指定した日付の出勤可否を表すブール変数のリストをスタッフ順に返す
+        """
+        return self.variables[self._date_positions[date]]
+
+    def values(self, response):
+        """
+        CpSolverResponse の解から、variables と同じ形の出勤可否の bool 配列を一括で取り出す
+        """
+        solution = np.asarray(response.solution, dtype=np.int64)
+        return solution[self.variable_indices].astype(bool)
 
 class ShiftScheduleModel:
     """
@@ -26,10 +396,10 @@ class ShiftScheduleModel:
 
     メソッド:
     - __init__(shifts, staffs, locked): init
-    - _create_shift_schedule_model_attributes(shifts, staffs, locked): 
-      与えられたシフトとスタッフに対するScheduleAttributesオブジェクトを作成し、リストとして返します
+    - _create_schedule_grid(shifts, staffs, locked):
+      与えられたシフトとスタッフに対する出勤可否の変数を作成し、ScheduleGrid として返します
     """
-    def __init__(self, shifts, staffs, locked):
+    def __init__(self, shifts, staffs, locked, diagnose=False, relax=False, relax_weights=None):
         """
         与えられたシフト、スタッフ、ロックされたシフトでShiftScheduleModelを初期化します
 
@@ -37,41 +407,189 @@ class ShiftScheduleModel:
         - shifts (list of Shift): 各シフトには日付、必要なスタッフ数などの情報が含まれています
         - staffs (list of Staff): 各スタッフにはID、役職レベル、希望休、週に働ける日数などの情報が含まれています
         - locked (list of LockedShift): 各要素はロックされているシフトの情報を保持し、スタッフID、シフト日、働いているかどうかの情報を含んでいます
+        - diagnose (bool): True の場合は各ルールを仮定リテラルで守り、find_conflicting_rules() で解がない原因を診断できるようにする
+        - relax (bool): True の場合は各ルールにスラック変数を加え、ルールを満たせない場合でも解を返すようにする
+        - relax_weights (dict): Relaxation の weights
         """
         self.model = cp_model.CpModel()
-        self.shift_schedule_model_attributes = self._create_shift_schedule_model_attributes(shifts, staffs, locked)
+        self._solver = None
+        # フェーズ名をキーとし、かかった時間（秒）を値とする辞書 フェーズの実行順に並ぶ
+        self.timings = {}
+        # 解のスタッフの出勤可否を入れ替える場合の、スタッフの位置の並び set_staff_permutation() を参照
+        self.staff_permutation = None
+        # 目的関数の変数のインデックスをキーとし、目的関数の項の位置を値とする辞書 add_objective_coefficient() で作成する
+        self._objective_positions = None
+        self.assumptions = Assumptions(self.model, enabled=diagnose)
+        self.relaxation = Relaxation(self.model, enabled=relax, weights=relax_weights)
+        with self._timed('create_schedule_grid'):
+            self.schedule_grid = self._create_schedule_grid(shifts, staffs, locked)
+
+    @contextmanager
+    def _timed(self, phase):
+        """
+        with ブロックの実行時間を timings[phase] に加算する
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - start
+
+    def model_stats(self):
+        """
+        モデルの大きさ（変数の数、制約の数、目的関数の項の数）を返す
+        """
+        proto = self.model.Proto()
+        return {
+            'num_variables': len(proto.variables),
+            'num_constraints': len(proto.constraints),
+            'num_objective_terms': len(proto.objective.vars)
+        }
 
-    def _create_shift_schedule_model_attributes(self, shifts, staffs, locked):
+    def _create_schedule_grid(self, shifts, staffs, locked):
         """
-        与えられたシフトとスタッフに対するScheduleAttributesオブジェクトを作成し、リストとして返します
-        
+        与えられたシフトとスタッフに対する出勤可否の変数を作成し、ScheduleGrid として返します
+        ロックされたシフトは変数を固定する制約を追加し、ScheduleGrid の locked に記録します
+
         Parameters:
         - shifts (list): init メソッドの Parameters と同じ
         - staffs (list): init メソッドの Parameters と同じ
         - locked (list): init メソッドの Parameters と同じ
 
         戻り値:
-        - ScheduleAttributesのリスト: 各シフトとスタッフメンバーに関連するシフト属性と関連するCP-SATモデル変数を含むリスト
+        - ScheduleGrid: 各シフトとスタッフメンバーの出勤可否を表すCP-SATモデル変数を (date, staff_id) で参照できるようにしたもの
         """
+        schedule_grid = ScheduleGrid(self.model, [shift.date for shift in shifts], [staff.id for staff in staffs])
+
+        # 同じシフトが複数回ロックされている場合は、後のものを優先する
         locked_shifts_dict = {(l.date, l.staff_id): l.is_working for l in locked}
 
-        shift_list = [
-            ScheduleAttributes(
-                date = shift.date,
-                staff_id = staff.id,
-                locked = False,
-                is_working_variable = self.model.NewBoolVar(f"shift_{shift.date}_{staff.id}")
+        for (date, staff_id), is_working in locked_shifts_dict.items():
+            if not schedule_grid.has(date, staff_id):
+                continue
+            self.assumptions.enforce(
+                self.model.Add(schedule_grid.variable(date, staff_id) == int(is_working)),
+                'locked', date=date, staff_id=staff_id, is_working=bool(is_working)
             )
-            for shift in shifts
-            for staff in staffs
-        ]
+            schedule_grid.locked[schedule_grid.position(date, staff_id)] = True
+
+        return schedule_grid
+
+    def apply_previous_shifts(self, previous, mode='hint'):
+        """
+        前回の解を反映するメソッド
+        存在しない日付、スタッフのシフトとロックされたシフトは無視する
+
+        Parameters:
+        - previous (list of AssignedShift): 前回の解
+        - mode (str):
+            - 'hint': AddHint で探索の初期解として与える
+            - 'lock': 前回の値に固定する ロックされたシフト以外を変更しない場合に使用する
+        """
+        for assigned in previous:
+            if not self.schedule_grid.has(assigned.date, assigned.staff_id):
+                continue
+            if self.schedule_grid.is_locked(assigned.date, assigned.staff_id):
+                continue
+            if mode == 'lock':
+                self.assumptions.enforce(
+                    self.model.Add(self.schedule_grid.variable(assigned.date, assigned.staff_id) == int(assigned.is_working)),
+                    'previous_locked', date=assigned.date, staff_id=assigned.staff_id, is_working=bool(assigned.is_working)
+                )
+            else:
+                self.model.AddHint(self.schedule_grid.variable(assigned.date, assigned.staff_id), int(assigned.is_working))
+
+    def complete_hint(self, max_time_in_seconds=1.0):
+        """
+        出勤可否の変数だけに与えた初期解から、目的関数の補助変数やスラック変数を含むすべての変数の初期解を作成する
+        CP-SAT は一部の変数にしか初期解がない場合、初期解をそのまま最初の解として使えないため、
+        初期解に固定したモデルを最初の解が見つかるまで解き、すべての変数の値を改めて初期解とする
+        add_objectives() の後に呼び出す
+
+        Parameters:
+        - max_time_in_seconds (float): 固定したモデルを解く時間の上限
 
-        for shift in shift_list:
-            if (shift.date, shift.staff_id) in locked_shifts_dict:
-                self.model.Add(shift.is_working_variable == int(locked_shifts_dict[(shift.date, shift.staff_id)]))
-                shift.locked = True
+        戻り値:
+        - bool: 初期解を補えた場合は True 初期解が制約を満たさない場合は False とし、与えた初期解のままにする
+        """
+        solver = cp_model.CpSolver()
+        solver.parameters.fix_variables_to_their_hinted_value = True
+        solver.parameters.stop_after_first_solution = True
+        solver.parameters.num_search_workers = 1
+        solver.parameters.max_time_in_seconds = max_time_in_seconds
+        with self._timed('complete_hint'):
+            status = solver.Solve(self.model)
+            if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+                return False
+            self._hint_solution(solver.ResponseProto().solution)
+        return True
 
-        return shift_list
+    def _hint_solution(self, solution):
+        """
+        すべての変数の値（CpSolverResponse の solution）を初期解として与え直す
+        """
+        self.model.ClearHints()
+        for index, value in enumerate(solution):
+            self.model.AddHint(self.model.GetIntVarFromProtoIndex(index), value)
+
+    def hint_last_solution(self):
+        """
+        前回の solve() で見つかった解のすべての変数の値を、次の探索の初期解として与える
+        セッションでモデルを編集した後に、前回の解から探索を始めるために使用する
+
+        戻り値:
+        - bool: 前回の解がある場合は True
+        """
+        if self._solver is None:
+            return False
+        solution = self._solver.ResponseProto().solution
+        if not solution:
+            return False
+        self._hint_solution(solution)
+        return True
+
+    def set_cell_lock(self, date, staff_id, is_working):
+        """
+        制約を追加せず、変数の定義域を 1 点に狭めてシフトをロックする
+        制約を追加したロックと違い set_cell_unlock() で外せるため、モデルを作り直さずにロックを編集できる
+        __init__ の locked でロックしたシフトには使用しない
+
+        Parameters:
+        - date (int): シフトの日付
+        - staff_id (int): スタッフのID
+        - is_working (bool): 出勤するかどうか
+        """
+        i, j = self.schedule_grid.position(date, staff_id)
+        domain = self.model.Proto().variables[self.schedule_grid.variable_indices[i, j]].domain
+        domain[0] = domain[1] = int(is_working)
+        self.schedule_grid.locked[i, j] = True
+
+    def set_cell_unlock(self, date, staff_id):
+        """
+        set_cell_lock() でロックしたシフトの変数の定義域を 0, 1 に戻す
+        """
+        i, j = self.schedule_grid.position(date, staff_id)
+        domain = self.model.Proto().variables[self.schedule_grid.variable_indices[i, j]].domain
+        domain[0], domain[1] = 0, 1
+        self.schedule_grid.locked[i, j] = False
+
+    def add_objective_coefficient(self, variable, delta):
+        """
+        目的関数の variable の係数に delta を加える 目的関数に含まれない変数の場合は項を追加する
+        add_objectives() の後に、目的関数を作り直さずに重みを変更するために使用する
+        """
+        objective = self.model.Proto().objective
+        if self._objective_positions is None:
+            self._objective_positions = {}
+            for position, index in enumerate(objective.vars):
+                self._objective_positions.setdefault(index, position)
+        position = self._objective_positions.get(variable.Index())
+        if position is None:
+            self._objective_positions[variable.Index()] = len(objective.vars)
+            objective.vars.append(variable.Index())
+            objective.coeffs.append(delta)
+        else:
+            objective.coeffs[position] += delta
 
     def add_constraints(self, constraints):
         """
@@ -80,7 +598,8 @@ class ShiftScheduleModel:
         それぞれのインスタンスに定義された add_constraints() メソッドを実行することで制約を追加する
         """
         for constraint in constraints:
-            constraint.add_constraints(self.model, self.shift_schedule_model_attributes)
+            with self._timed(f'add_constraints.{constraint.__class__.__name__}'):
+                constraint.add_constraints(self.model, self.schedule_grid, self.assumptions, self.relaxation)
 
     def add_objectives(self, objectives):
         """
@@ -88,25 +607,274 @@ class ShiftScheduleModel:
         models/objectives.py で作られた各クラスのインスタンスのリストを受け取り、
         それぞれのインスタンスに定義された compute_objective_value() メソッドを実行することで、目的関数の値を計算する
         計算された目的関数を Minimize するように設定する
+        緩和モードの場合は、満たせなかったルールのペナルティも合わせて最小化する
         """
-        total_objective_value = sum([objective.compute_objective_value(self.model, self.shift_schedule_model_attributes) for objective in objectives])
-        self.model.Minimize(total_objective_value)
+        if self.relaxation.enabled:
+            objectives = [*objectives, self.relaxation]
+        objective_values = []
+        for objective in objectives:
+            with self._timed(f'add_objectives.{objective.__class__.__name__}'):
+                objective_values.append(objective.compute_objective_value(self.model, self.schedule_grid))
+        with self._timed('add_objectives.Minimize'):
+            self.model.Minimize(sum(objective_values))
 
-    def solve(self):
+    def _create_solver(self, solver_parameters):
+        """
+        SolverParameters を反映した CpSolver を作成する
+        None の項目は CP-SAT のデフォルト値のままにする
+        """
         solver = cp_model.CpSolver()
-        status = solver.Solve(self.model)
+        if solver_parameters is None:
+            return solver
+
+        if solver_parameters.max_time_in_seconds is not None:
+            solver.parameters.max_time_in_seconds = solver_parameters.max_time_in_seconds
+        if solver_parameters.num_search_workers is not None:
+            solver.parameters.num_search_workers = solver_parameters.num_search_workers
+        if solver_parameters.relative_gap_limit is not None:
+            solver.parameters.relative_gap_limit = solver_parameters.relative_gap_limit
+        if solver_parameters.absolute_gap_limit is not None:
+            solver.parameters.absolute_gap_limit = solver_parameters.absolute_gap_limit
+        if solver_parameters.random_seed is not None:
+            solver.parameters.random_seed = solver_parameters.random_seed
+        return solver
+
+    def set_staff_permutation(self, permutation):
+        """
+        解を返す前に、スタッフの出勤可否を入れ替えるように設定する
+        交換可能なスタッフの間で解をランダムに入れ替えるために使用する（StaffSymmetryBreaking を参照）
+
+        Parameters:
+        - permutation (list): permutation[j] の位置のスタッフの出勤可否を、j の位置のスタッフの出勤可否とする
+        """
+        self.staff_permutation = np.asarray(permutation, dtype=np.int64)
+
+    def _create_schedule_values(self, response):
+        """
+        解の出勤可否を ScheduleValues として作成する
+        変数ごとに Value() を呼び出さず、CpSolverResponse の解から一括で取り出す
+
+        Parameters:
+        - response: CpSolverResponse, CpSolver.ResponseProto() または CpSolverSolutionCallback.Response() の戻り値
+        """
+        is_working = self.schedule_grid.values(response)
+        if self.staff_permutation is not None:
+            is_working = is_working[:, self.staff_permutation]
+        return ScheduleValues(
+            dates = self.schedule_grid.dates,
+            staff_ids = self.schedule_grid.staff_ids,
+            is_working = is_working,
+            locked = self.schedule_grid.locked.copy()
+        )
+
+    def _create_violations(self, solution):
+        """
+        緩和モードで満たせなかったルールのリストを作成する
+        スタッフの出勤可否を入れ替えた場合は、ルールのスタッフIDも入れ替え先のスタッフIDにする
+        """
+        violations = self.relaxation.violations(solution)
+        if violations is None or self.staff_permutation is None:
+            return violations
+
+        staff_ids = self.schedule_grid.staff_ids
+        moved_to = {staff_ids[source]: staff_ids[j] for j, source in enumerate(self.staff_permutation)}
+        return [
+            {**violation, 'staff_id': moved_to[violation['staff_id']]} if 'staff_id' in violation else violation
+            for violation in violations
+        ]
+
+    def stop_search(self):
+        """
+        探索中であれば探索を打ち切る
+        別スレッドから呼び出すことを想定しており、打ち切られた solve() はその時点の最良解を返す
+        """
+        if self._solver is not None:
+            self._solver.StopSearch()
+
+    def solve(self, solver_parameters=None, on_solution=None):
+        """
+        モデルを解き、SolveResult を返す
+
+        Parameters:
+        - solver_parameters (SolverParameters): 探索の時間制限やワーカー数など 省略した場合は CP-SAT のデフォルト値を使用する
+        - on_solution (callable): 改善解が見つかるたびに SolveResult を受け取る関数 省略した場合は最終結果のみ返す
+        """
+        solver = self._create_solver(solver_parameters)
+        self._solver = solver
+        callback = SolutionCallback(self, on_solution) if on_solution is not None else None
+        with self._timed('solve'):
+            status = solver.Solve(self.model, callback)
+        stats = {
+            **self.model_stats(),
+            'num_conflicts': solver.NumConflicts(),
+            'num_branches': solver.NumBranches(),
+            'user_time': solver.UserTime()
+        }
 
         if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
             logger.info('解あり')
             logger.info(solver.ObjectiveValue())
-            return [
-                {
-                    'date': shift.date,
-                    'staffId': shift.staff_id,
-                    'isWorking': bool(solver.Value(shift.is_working_variable)),
-                    'locked': shift.locked
-                }
-                for shift in self.shift_schedule_model_attributes
-            ]
+            return SolveResult(
+                status = solver.StatusName(status),
+                objective_value = solver.ObjectiveValue(),
+                best_objective_bound = solver.BestObjectiveBound(),
+                wall_time = solver.WallTime(),
+                schedule = self._create_schedule_values(solver.ResponseProto()),
+                violations = self._create_violations(solver),
+                stats = stats
+            )
         else:
             logger.error('解なし')
+            return SolveResult(
+                status = solver.StatusName(status),
+                objective_value = None,
+                best_objective_bound = None,
+                wall_time = solver.WallTime(),
+                stats = stats
+            )
+
+    def _exclude_solution(self, is_working, min_difference):
+        """
+        is_working の解と min_difference セル以上出勤可否が異なる解だけを許す制約（no-good cut）を追加する
+        ロックされたセルは変わらないため数えない
+
+        Parameters:
+        - is_working (np.ndarray): ScheduleGrid.values() の戻り値（スタッフを入れ替える前の解）
+        - min_difference (int): 異なるセル数の下限
+        """
+        variables = []
+        coefficients = []
+        working_count = 0
+        for i, row in enumerate(self.schedule_grid.variables):
+            for j, variable in enumerate(row):
+                if self.schedule_grid.locked[i, j]:
+                    continue
+                # 解で出勤するセルは 1 - x、休むセルは x が、出勤可否が異なる場合に 1 となる
+                variables.append(variable)
+                if is_working[i, j]:
+                    coefficients.append(-1)
+                    working_count += 1
+                else:
+                    coefficients.append(1)
+        self.model.Add(cp_model.LinearExpr.WeightedSum(variables, coefficients) >= min_difference - working_count)
+
+    def solve_alternatives(self, count, solver_parameters=None, min_difference=2):
+        """
+        互いに min_difference セル以上異なる解を、目的関数の値が良い順に最大 count 個求める
+        解を求めるたびに、その解を除く制約を追加して解き直すため、モデルは変更される
+        出勤数の制約があるため、異なる解は少なくとも 2 セル異なる
+
+        Parameters:
+        - count (int): 求める解の数
+        - solver_parameters (SolverParameters): 1 回の探索ごとのパラメータ
+        - min_difference (int): 解の間で異なるセル数の下限
+
+        戻り値:
+        - SolveResult のリスト それ以上異なる解がない場合は count より少なくなる
+          1 つ目から解がない場合は、その SolveResult だけを返す
+        """
+        results = []
+        for _ in range(count):
+            result = self.solve(solver_parameters)
+            if result.schedule is None:
+                if not results:
+                    results.append(result)
+                break
+            results.append(result)
+            self._exclude_solution(self.schedule_grid.values(self._solver.ResponseProto()), min_difference)
+        return results
+
+    def _solve_with_assumptions(self, literals, max_time_in_seconds):
+        """
+        literals を仮定として実行可能性だけを判定し、(status, 解なしの十分条件となるリテラルのリスト) を返す
+        """
+        self.model.ClearAssumptions()
+        self.model.AddAssumptions(literals)
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = max_time_in_seconds
+        status = solver.Solve(self.model)
+        if status != cp_model.INFEASIBLE:
+            return status, None
+
+        core_indices = set(solver.SufficientAssumptionsForInfeasibility())
+        return status, [literal for literal in literals if literal.Index() in core_indices]
+
+    def find_conflicting_rules(self, max_time_in_seconds=10.0):
+        """
+        解がない場合に、同時には満たせないルールの組み合わせを返す
+        diagnose=True で作成したモデルでのみ使用できる
+
+        SufficientAssumptionsForInfeasibility() で得られた組み合わせから、
+        1 つずつルールを外しても解なしのままであれば外す、という手順で不要なルールを取り除き、極小の組み合わせにする
+        max_time_in_seconds を超えた場合は、その時点での組み合わせを返す
+
+        戻り値:
+        - ルールの辞書のリスト 解がある場合や、時間内に判定できなかった場合は None
+        """
+        if not self.assumptions.enabled:
+            raise ValueError("find_conflicting_rules() requires a model created with diagnose=True")
+
+        # 目的関数は実行可能性に関係しないため、診断では最小化しない
+        self.model.ClearObjective()
+        deadline = time.perf_counter() + max_time_in_seconds
+
+        status, core = self._solve_with_assumptions(self.assumptions.literals, max_time_in_seconds)
+        if status != cp_model.INFEASIBLE:
+            return None
+
+        # necessary は外すと解が見つかる（必要と確認できた）ルール、candidates は未確認のルール
+        necessary = []
+        candidates = core
+        while candidates:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                necessary += candidates
+                break
+            status, smaller_core = self._solve_with_assumptions(necessary + candidates[1:], remaining)
+            if status == cp_model.INFEASIBLE:
+                # 外しても解なしのままなので、このルールは不要
+                necessary_indices = {literal.Index() for literal in necessary}
+                candidates = [literal for literal in smaller_core if literal.Index() not in necessary_indices]
+            else:
+                necessary.append(candidates[0])
+                candidates = candidates[1:]
+
+        return self.assumptions.rules(necessary)
+
+    def iter_solutions(self, solver_parameters=None):
+        """
+        探索を別スレッドで実行し、改善解が見つかるたびに ('solution', SolveResult) を yield するジェネレータ
+        最後に solve() の最終結果を ('result', SolveResult) として yield して終了する
+
+        途中でジェネレータが閉じられた場合（クライアントが接続を切った場合など）は探索を打ち切る
+
+        Parameters:
+        - solver_parameters (SolverParameters): solve() と同じ
+        """
+        results = queue.Queue()
+        finished = object()
+
+        def run():
+            try:
+                result = self.solve(solver_parameters, lambda solution: results.put(('solution', solution)))
+                results.put(('result', result))
+            except Exception as e:
+                results.put(e)
+            finally:
+                results.put(finished)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            while True:
+                result = results.get()
+                if result is finished:
+                    break
+                if isinstance(result, Exception):
+                    raise result
+                yield result
+        finally:
+            # solve() の開始直前に閉じられた場合に備え、スレッドが終わるまで stop_search() を呼び出し続ける
+            while thread.is_alive():
+                self.stop_search()
+                thread.join(0.1)
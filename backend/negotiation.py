@@ -0,0 +1,91 @@
+import gzip
+import json
+import zlib
+import base64
+import brotli
+import msgpack
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# レスポンスの形式 Accept ヘッダーで選び、指定がない場合は JSON とする
+MEDIA_TYPES = (JSON_MIMETYPE, MSGPACK_MIMETYPE)
+
+# リクエストボディとして受け付ける形式 application/x-msgpack は MessagePack の旧称
+REQUEST_MEDIA_TYPES = {
+    JSON_MIMETYPE: JSON_MIMETYPE,
+    MSGPACK_MIMETYPE: MSGPACK_MIMETYPE,
+    'application/x-msgpack': MSGPACK_MIMETYPE,
+}
+
+# レスポンスの圧縮方式 Accept-Encoding ヘッダーの q 値が同じ場合は前にあるものを優先する
+# リクエストボディはブラウザの CompressionStream で圧縮できる gzip のみ受け付ける
+CONTENT_ENCODINGS = ('br', 'gzip')
+
+# これより小さいレスポンスは圧縮しない（圧縮しても小さくならず、CPU を使うだけのため）
+MIN_COMPRESSION_BYTES = 1024
+
+# 圧縮されたリクエストボディを展開した後の最大サイズ（バイト） 小さなボディが巨大に展開される攻撃を防ぐ
+MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024
+
+# 圧縮レベル 最適化のレスポンスは 1 回しか送らないため、圧縮率より速度を優先する
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+def encode_json_value(value):
+    """
+    json.dumps() の default に渡す関数 bytes（format=packed のビットセット）を base64 の文字列にする
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def encode_body(body, mimetype):
+    """
+    レスポンスの辞書を mimetype の形式のバイト列にする
+    MessagePack の場合、bytes はそのままバイナリとして格納する
+    """
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(body, use_bin_type=True)
+    return json.dumps(body, default=encode_json_value, separators=(',', ':')).encode('utf-8')
+
+def decode_body(data, mimetype):
+    """
+    リクエストボディを mimetype の形式として読み込む 読み込めない場合は ValueError を送出する
+    """
+    if mimetype == MSGPACK_MIMETYPE:
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except (msgpack.UnpackException, ValueError, TypeError) as e:
+            raise ValueError("Invalid MessagePack") from e
+    try:
+        return json.loads(data)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid JSON: {e}") from e
+
+def decompress(data, content_encoding):
+    """
+    Content-Encoding に従ってリクエストボディを展開する
+    展開後の大きさが MAX_DECOMPRESSED_BYTES を超える場合や、対応していない方式の場合は ValueError を送出する
+    """
+    if content_encoding in (None, '', 'identity'):
+        return data
+    if content_encoding != 'gzip':
+        raise ValueError(f"Unsupported Content-Encoding: {content_encoding}")
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        decompressed = decompressor.decompress(data, MAX_DECOMPRESSED_BYTES + 1)
+    except zlib.error as e:
+        raise ValueError(f"Invalid gzip body: {e}") from e
+    if len(decompressed) > MAX_DECOMPRESSED_BYTES:
+        raise ValueError(f"Decompressed body exceeds {MAX_DECOMPRESSED_BYTES} bytes")
+    return decompressed
+
+def compress(data, content_encoding):
+    """
+    レスポンスボディを CONTENT_ENCODINGS のいずれかの方式で圧縮する
+    """
+    if content_encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
@@ -0,0 +1,352 @@
+from models.parameters import Staff, Shift, LockedShift, AssignedShift, ShiftCell, ScheduleEdits
+from enums import Tier
+
+TIERS = frozenset(tier.value for tier in Tier)
+
+class ValidationError(ValueError):
+    """
+    リクエストの検証に失敗した場合に送出する例外
+    メッセージには失敗した値の位置を含める ex) staffs[3].workDays must be an integer
+    """
+
+class _FieldError(Exception):
+    """
+    フィールドの検証関数が送出する例外
+    位置は呼び出し元で付け加えるため、成功時には位置の文字列を作成しない
+
+    Parameters:
+        - message: str, エラーメッセージ
+        - index: int, 配列の要素で失敗した場合の要素の位置
+    """
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.message = message
+        self.index = index
+
+def _integer(minimum=None, maximum=None):
+    """
+    整数（bool を除く）で、minimum 以上 maximum 以下であることを検証する関数を返す
+    """
+    def check(value):
+        if type(value) is not int:
+            raise _FieldError("must be an integer")
+        if minimum is not None and value < minimum:
+            raise _FieldError(f"must be greater than or equal to {minimum}")
+        if maximum is not None and value > maximum:
+            raise _FieldError(f"must be less than or equal to {maximum}")
+        return value
+    return check
+
+def _number(minimum=None, exclusive_minimum=None):
+    """
+    数値（int ないし float、bool を除く）で、minimum 以上、exclusive_minimum より大きいことを検証し、float を返す関数を返す
+    """
+    def check(value):
+        if type(value) not in (int, float) or value != value:
+            raise _FieldError("must be a number")
+        if minimum is not None and value < minimum:
+            raise _FieldError(f"must be greater than or equal to {minimum}")
+        if exclusive_minimum is not None and value <= exclusive_minimum:
+            raise _FieldError(f"must be greater than {exclusive_minimum}")
+        return float(value)
+    return check
+
+def _boolean(value):
+    if type(value) is not bool:
+        raise _FieldError("must be a boolean")
+    return value
+
+def _tier(value):
+    if type(value) is not int or value not in TIERS:
+        raise _FieldError(f"must be one of {', '.join(str(tier) for tier in sorted(TIERS))}")
+    return value
+
+def _sorted_unique(check_item):
+    """
+    各要素を check_item で検証し、重複を除いて昇順に並べたリストを返す関数を返す
+    """
+    def check(value):
+        if not isinstance(value, list):
+            raise _FieldError("must be an array")
+        for index, item in enumerate(value):
+            try:
+                check_item(item)
+            except _FieldError as e:
+                raise _FieldError(e.message, index)
+        return sorted(set(value))
+    return check
+
+def _compile_record(factory, fields):
+    """
+    オブジェクト 1 件を検証し、factory で作成したインスタンスを返す関数を作成する
+
+    Parameters:
+        - factory: callable, 検証後の値を位置引数として受け取る関数（dataclass など）
+        - fields: tuple, (リクエストのキー, 検証関数) のタプル factory の引数の順に並べる
+                  省略できるキーは (リクエストのキー, 検証関数, 省略した場合の値) とする
+
+    作成した関数は (item, list_key, index) を受け取る
+    エラーメッセージの位置 ex) staffs[3] は、失敗した場合にのみ list_key と index から作成する
+    """
+    required = [(key, check) for key, check, *_ in fields]
+    defaults = {key: default for key, _, *rest in fields for default in rest}
+
+    def parse(item, list_key, index):
+        if not isinstance(item, dict):
+            raise ValidationError(f"{list_key}[{index}] must be an object")
+        try:
+            values = [
+                check(item[key]) if key not in defaults or item.get(key) is not None else defaults[key]
+                for key, check in required
+            ]
+        except (KeyError, _FieldError):
+            pass
+        else:
+            return factory(*values)
+
+        # 失敗したフィールドを特定し、位置を含むメッセージを作成する
+        for key, check in required:
+            if key in defaults and item.get(key) is None:
+                continue
+            if key not in item:
+                raise ValidationError(f"{list_key}[{index}].{key} is required")
+            try:
+                check(item[key])
+            except _FieldError as e:
+                location = f"{list_key}[{index}].{key}" if e.index is None else f"{list_key}[{index}].{key}[{e.index}]"
+                raise ValidationError(f"{location} {e.message}")
+    return parse
+
+_parse_staff = _compile_record(Staff, (
+    ('id', _integer()),
+    ('tier', _tier),
+    ('desiredOffDays', _sorted_unique(_integer(minimum=1))),
+    ('workDays', _integer(minimum=0)),
+    ('maxConsecutiveWorkDays', _integer(minimum=1), None),
+    ('minConsecutiveRestDays', _integer(minimum=1), None),
+))
+
+_parse_shift = _compile_record(Shift, (
+    ('date', _integer(minimum=1)),
+    ('requiredStaffCount', _integer(minimum=0)),
+    ('requiredAttendanceTiers', _sorted_unique(_tier)),
+    ('requiredAttendanceTierCount', _integer(minimum=0)),
+))
+
+_parse_locked_shift = _compile_record(LockedShift, (
+    ('date', _integer(minimum=1)),
+    ('staffId', _integer()),
+    ('isWorking', _boolean),
+))
+
+_parse_assigned_shift = _compile_record(AssignedShift, (
+    ('date', _integer(minimum=1)),
+    ('staffId', _integer()),
+    ('isWorking', _boolean),
+))
+
+_parse_shift_cell = _compile_record(ShiftCell, (
+    ('date', _integer(minimum=1)),
+    ('staffId', _integer()),
+))
+
+# リクエストの solverParameters のキーと、SolverParameters の属性名、検証関数
+# null を指定したパラメータは CP-SAT のデフォルト値を使用する
+_SOLVER_PARAMETERS = (
+    ('maxTimeInSeconds', 'max_time_in_seconds', _number(exclusive_minimum=0)),
+    ('numSearchWorkers', 'num_search_workers', _integer(minimum=1)),
+    ('relativeGapLimit', 'relative_gap_limit', _number(minimum=0)),
+    ('absoluteGapLimit', 'absolute_gap_limit', _number(minimum=0)),
+    ('randomSeed', 'random_seed', _integer(minimum=0, maximum=2 ** 31 - 1)),
+)
+
+# リクエストの relaxWeights のキーと、ルールの種類
+RELAX_RULE_TYPES = {
+    'workDays': 'work_days',
+    'maxConsecutiveWorkDays': 'max_consecutive_work_days',
+    'minConsecutiveRestDays': 'min_consecutive_rest_days',
+    'lookaheadWorkDays': 'lookahead_work_days',
+    'requiredStaffCount': 'required_staff_count',
+    'requiredAttendanceTierCount': 'required_attendance_tier_count',
+}
+
+def _parse_list(data, key, parse_item, required=True):
+    """
+    data[key] の配列の各要素を parse_item で検証し、作成したインスタンスのリストを返す
+    """
+    items = data.get(key)
+    if items is None:
+        if required:
+            raise ValidationError(f"{key} is required")
+        return []
+    if not isinstance(items, list):
+        raise ValidationError(f"{key} must be an array")
+    return [parse_item(item, key, index) for index, item in enumerate(items)]
+
+def _check_unique(items, key, attribute):
+    """
+    items の attribute が重複していないことを検証する
+    """
+    seen = set()
+    for index, item in enumerate(items):
+        value = getattr(item, attribute)
+        if value in seen:
+            raise ValidationError(f"{key}[{index}] duplicates {value}")
+        seen.add(value)
+    return seen
+
+def parse_schedule_inputs(data):
+    """
+    1 店舗分の最適化の入力から Shift, Staff, LockedShift, AssignedShift のリストを作成する
+    CP-SAT のモデルを作成する前に、型と値の範囲、日付とスタッフIDの参照を検証する
+    入力が不正な場合は、最初に見つかった誤りの位置を含む ValidationError を送出する
+
+    - 希望休、ロックの日付はシフトの日付、ロックのスタッフIDはスタッフのIDのいずれかであること
+    - 希望休と必須役職は重複を除いて昇順に並べる
+    - 前回の解は古いシフト表から作られることがあるため、存在しない日付、スタッフは検証せずモデルで無視する
+
+    Parameters:
+        - data: dict, リクエストの 1 店舗分の入力
+
+    戻り値:
+        - shifts, staffs, locked, previous をキーとする辞書
+    """
+    if not isinstance(data, dict):
+        raise ValidationError("Request body must be an object")
+
+    shifts = _parse_list(data, 'shifts', _parse_shift)
+    staffs = _parse_list(data, 'staffs', _parse_staff)
+    locked = _parse_list(data, 'locked', _parse_locked_shift)
+    previous = _parse_list(data, 'previous', _parse_assigned_shift, required=False)
+
+    dates = _check_unique(shifts, 'shifts', 'date')
+    staff_ids = _check_unique(staffs, 'staffs', 'id')
+
+    for index, staff in enumerate(staffs):
+        for day in staff.desired_off_days:
+            if day not in dates:
+                raise ValidationError(f"staffs[{index}].desiredOffDays contains {day}, which is not a shift date")
+
+    for index, lock in enumerate(locked):
+        if lock.date not in dates:
+            raise ValidationError(f"locked[{index}].date {lock.date} is not a shift date")
+        if lock.staff_id not in staff_ids:
+            raise ValidationError(f"locked[{index}].staffId {lock.staff_id} is not a staff id")
+
+    return {
+        'shifts': shifts,
+        'staffs': staffs,
+        'locked': locked,
+        'previous': previous
+    }
+
+def parse_solver_parameters(params):
+    """
+    リクエストの solverParameters を検証し、SolverParameters の属性名をキーとする辞書を返す
+    未知のキーや、型、範囲の誤った値があれば、キーを含む ValidationError を送出する
+
+    Parameters:
+        - params: dict, リクエストの solverParameters 省略された場合は None
+
+    戻り値:
+        - dict, 指定されたパラメータのみを含む（replace() でデフォルト値を上書きする）
+    """
+    if params is None:
+        return {}
+    if not isinstance(params, dict):
+        raise ValidationError("solverParameters must be an object")
+
+    known = {key for key, _, _ in _SOLVER_PARAMETERS}
+    for key in params:
+        if key not in known:
+            raise ValidationError(f"solverParameters.{key} is not a known solver parameter")
+
+    overrides = {}
+    for key, name, check in _SOLVER_PARAMETERS:
+        if key not in params:
+            continue
+        try:
+            overrides[name] = None if params[key] is None else check(params[key])
+        except _FieldError as e:
+            raise ValidationError(f"solverParameters.{key} {e.message}")
+    return overrides
+
+def parse_relax_weights(weights):
+    """
+    リクエストの relaxWeights を検証し、ルールの種類をキーとし、違反 1 あたりのペナルティを値とする辞書を返す
+    未知のキーや、0 以上の整数でない値があれば、キーを含む ValidationError を送出する
+
+    Parameters:
+        - weights: dict, リクエストの relaxWeights 省略された場合は None
+    """
+    if weights is None:
+        return None
+    if not isinstance(weights, dict):
+        raise ValidationError("relaxWeights must be an object")
+
+    check = _integer(minimum=0)
+    relax_weights = {}
+    for key, value in weights.items():
+        if key not in RELAX_RULE_TYPES:
+            raise ValidationError(f"relaxWeights.{key} is not a known rule")
+        try:
+            relax_weights[RELAX_RULE_TYPES[key]] = check(value)
+        except _FieldError as e:
+            raise ValidationError(f"relaxWeights.{key} {e.message}")
+    return relax_weights
+
+def parse_schedule_edits(data, dates, staff_ids):
+    """
+    セッションへの編集の入力から ScheduleEdits を作成する
+    日付とスタッフIDはセッションのシフト表のいずれかであることを検証する
+
+    Parameters:
+        - data: dict, リクエストの編集 locked, unlocked, addedDesiredOffDays, removedDesiredOffDays はいずれも省略できる
+        - dates: set, セッションのシフトの日付
+        - staff_ids: set, セッションのスタッフのID
+    """
+    if not isinstance(data, dict):
+        raise ValidationError("Request body must be an object")
+
+    edits = ScheduleEdits(
+        locked = _parse_list(data, 'locked', _parse_locked_shift, required=False),
+        unlocked = _parse_list(data, 'unlocked', _parse_shift_cell, required=False),
+        added_desired_off_days = _parse_list(data, 'addedDesiredOffDays', _parse_shift_cell, required=False),
+        removed_desired_off_days = _parse_list(data, 'removedDesiredOffDays', _parse_shift_cell, required=False)
+    )
+    for key, cells in (
+        ('locked', edits.locked),
+        ('unlocked', edits.unlocked),
+        ('addedDesiredOffDays', edits.added_desired_off_days),
+        ('removedDesiredOffDays', edits.removed_desired_off_days)
+    ):
+        for index, cell in enumerate(cells):
+            if cell.date not in dates:
+                raise ValidationError(f"{key}[{index}].date {cell.date} is not a shift date")
+            if cell.staff_id not in staff_ids:
+                raise ValidationError(f"{key}[{index}].staffId {cell.staff_id} is not a staff id")
+    return edits
+
+def parse_evaluation_inputs(data):
+    """
+    シフト表の評価の入力から Shift, Staff, LockedShift のリストと、評価するシフト表の AssignedShift のリストを作成する
+    シフト表（schedule）はレスポンスの shifts と同じ形式とし、日付とスタッフIDはシフトの日付、スタッフのIDのいずれかであること
+
+    Parameters:
+        - data: dict, parse_schedule_inputs() の入力に schedule を加えたもの
+
+    戻り値:
+        - shifts, staffs, locked, previous, schedule をキーとする辞書
+    """
+    schedule_inputs = parse_schedule_inputs(data)
+    schedule = _parse_list(data, 'schedule', _parse_assigned_shift)
+
+    dates = {shift.date for shift in schedule_inputs['shifts']}
+    staff_ids = {staff.id for staff in schedule_inputs['staffs']}
+    for index, assigned in enumerate(schedule):
+        if assigned.date not in dates:
+            raise ValidationError(f"schedule[{index}].date {assigned.date} is not a shift date")
+        if assigned.staff_id not in staff_ids:
+            raise ValidationError(f"schedule[{index}].staffId {assigned.staff_id} is not a staff id")
+
+    return {**schedule_inputs, 'schedule': schedule}
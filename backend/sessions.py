@@ -0,0 +1,194 @@
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from models.builder import build_shift_schedule_model
+from models.objectives import StaffObjectives
+from models.parameters import LockedShift
+logger = logging.getLogger(__name__)
+
+class ScheduleSession:
+    """
+    1 店舗分の構築済みの ShiftScheduleModel を保持し、シフト表の編集を差分としてモデルに適用して解き直すクラス
+
+    出勤数、連勤数、必要なスタッフ数などの制約と目的関数は最初に一度だけ作成する
+    ロックは制約ではなく変数の定義域で表し、希望休は目的関数の係数を変更するため、編集のたびにモデルを作り直さない
+    解き直すときは前回の解のすべての変数の値を初期解として与える
+
+    セッションのモデルはロックの編集に合わせて作り直さないため、ロックに依存する次のオプションは使用できない
+    - symmetry_breaking: 交換可能なスタッフの判定にロックを使う
+    - heuristic: 貪欲法のシフト表がロックを反映しない
+    - previous_mode='lock': ロックされていないすべてのセルを制約で固定する
+
+    Parameters:
+        - model_inputs: dict, build_shift_schedule_model() のキーワード引数
+        - solver_parameters: SolverParameters, 編集時に指定がない場合に使用するソルバーパラメータ
+    """
+    def __init__(self, model_inputs, solver_parameters):
+        if model_inputs.get('symmetry_breaking', 'none') != 'none':
+            raise ValueError("sessions do not support symmetry breaking")
+        if model_inputs.get('heuristic', 'none') != 'none':
+            raise ValueError("sessions do not support heuristics")
+        if model_inputs.get('previous') and model_inputs.get('previous_mode', 'hint') == 'lock':
+            raise ValueError("sessions do not support previousMode 'lock'")
+
+        self.model_inputs = model_inputs
+        self.solver_parameters = solver_parameters
+        self.result = None
+        # 同じセッションへの編集と探索を 1 つずつ実行するためのロック
+        self.lock = threading.Lock()
+
+        self.shift_schedule_model = build_shift_schedule_model(**{**model_inputs, 'locked': []})
+        self._desired_off_penalty = StaffObjectives(model_inputs['staffs']).penalty_dict['desired_off_days']
+        self._desired_off_days = {staff.id: set(staff.desired_off_days) for staff in model_inputs['staffs']}
+        # (日付, スタッフID) をキーとし、ロックされた出勤可否を値とする辞書
+        self._locks = {}
+        for lock in model_inputs['locked']:
+            self._lock_cell(lock.date, lock.staff_id, bool(lock.is_working))
+
+    @property
+    def cell_count(self):
+        """
+        モデルのセル数（日付 × スタッフ） モデルの変数と制約の数はセル数にほぼ比例する
+        """
+        return len(self.shift_schedule_model.schedule_grid)
+
+    @property
+    def dates(self):
+        return set(self.shift_schedule_model.schedule_grid.dates)
+
+    @property
+    def staff_ids(self):
+        return set(self.shift_schedule_model.schedule_grid.staff_ids)
+
+    def _lock_cell(self, date, staff_id, is_working):
+        self.shift_schedule_model.set_cell_lock(date, staff_id, is_working)
+        self._locks[date, staff_id] = is_working
+
+    def _unlock_cell(self, date, staff_id):
+        if self._locks.pop((date, staff_id), None) is not None:
+            self.shift_schedule_model.set_cell_unlock(date, staff_id)
+
+    def _set_desired_off(self, date, staff_id, desired):
+        """
+        希望休を加える、または外し、目的関数の希望休のペナルティの係数を変更する
+        """
+        desired_off_days = self._desired_off_days[staff_id]
+        if (date in desired_off_days) == desired:
+            return
+        if desired:
+            desired_off_days.add(date)
+        else:
+            desired_off_days.discard(date)
+        variable = self.shift_schedule_model.schedule_grid.variable(date, staff_id)
+        self.shift_schedule_model.add_objective_coefficient(variable, self._desired_off_penalty if desired else -self._desired_off_penalty)
+
+    def apply_edits(self, edits):
+        """
+        ScheduleEdits をモデルに適用し、model_inputs を編集後の入力に更新する
+
+        Parameters:
+            - edits: ScheduleEdits
+        """
+        for lock in edits.locked:
+            self._lock_cell(lock.date, lock.staff_id, bool(lock.is_working))
+        for cell in edits.unlocked:
+            self._unlock_cell(cell.date, cell.staff_id)
+        for cell in edits.added_desired_off_days:
+            self._set_desired_off(cell.date, cell.staff_id, True)
+        for cell in edits.removed_desired_off_days:
+            self._set_desired_off(cell.date, cell.staff_id, False)
+
+        self.model_inputs = {
+            **self.model_inputs,
+            'staffs': [
+                replace(staff, desired_off_days=sorted(self._desired_off_days[staff.id]))
+                for staff in self.model_inputs['staffs']
+            ],
+            'locked': [
+                LockedShift(date=date, staff_id=staff_id, is_working=is_working)
+                for (date, staff_id), is_working in self._locks.items()
+            ]
+        }
+
+    def solve(self, solver_parameters=None):
+        """
+        前回の解を初期解として解き直し、SolveResult を返す
+
+        Parameters:
+            - solver_parameters: SolverParameters, 省略した場合はセッションの作成時のパラメータ
+        """
+        self.shift_schedule_model.hint_last_solution()
+        self.result = self.shift_schedule_model.solve(solver_parameters or self.solver_parameters)
+        return self.result
+
+class SessionStore:
+    """
+    ScheduleSession をセッションIDで保持する LRU のストア
+    セッション数が max_sessions を、モデルのセル数の合計が max_cells を超えた場合は、
+    最も長く使われていないセッションから破棄する 作成したばかりのセッションは破棄しない
+
+    セッションはプロセスのメモリに保持するため、複数のワーカープロセスで起動する場合は
+    同じセッションへのリクエストを同じプロセスに振り分ける必要がある
+
+    Parameters:
+        - max_sessions: int, 保持するセッションの最大数
+        - max_cells: int, 保持するセッションのモデルのセル数の合計の上限 既定値は bench の xlarge（300 人 × 31 日）で約 28 セッション分
+    """
+    def __init__(self, max_sessions=32, max_cells=262144):
+        self.max_sessions = max_sessions
+        self.max_cells = max_cells
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+    def _evict(self, keep):
+        """
+        上限を超えている間、最も長く使われていないセッションから破棄する
+        """
+        total_cells = sum(session.cell_count for session in self._sessions.values())
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions and total_cells <= self.max_cells:
+                break
+            if session_id == keep:
+                continue
+            total_cells -= self._sessions.pop(session_id).cell_count
+            logger.info(f'session {session_id} evicted')
+
+    def add(self, session):
+        """
+        セッションを追加し、セッションIDを返す
+        """
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[session_id] = session
+            self._evict(keep=session_id)
+        return session_id
+
+    def get(self, session_id):
+        """
+        セッションを返し、最近使われたセッションとする 存在しない（破棄された）場合は None を返す
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id):
+        """
+        セッションを破棄する 存在しない場合は False を返す
+        """
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self):
+        """
+        セッション数とモデルのセル数の合計を返す
+        """
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'cells': sum(session.cell_count for session in self._sessions.values())
+            }
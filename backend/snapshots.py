@@ -0,0 +1,154 @@
+import os
+import json
+import shutil
+import threading
+import logging
+from dataclasses import asdict
+from datetime import datetime, timezone
+from ortools.sat.python import cp_model
+from models.parameters import Staff, Shift, LockedShift, AssignedShift, HorizonBoundary, SolverParameters
+logger = logging.getLogger(__name__)
+
+# CpModel.Proto() はテキスト形式のみ読み込めるため、ExportToFile() でもテキスト形式で書き出す（拡張子 .txt でテキスト形式になる）
+MODEL_FILE = 'model.pb.txt'
+META_FILE = 'snapshot.json'
+
+# model_inputs のうち dataclass のリストとして保持するキーと、その dataclass
+_INPUT_LISTS = {
+    'shifts': Shift,
+    'staffs': Staff,
+    'locked': LockedShift,
+    'previous': AssignedShift,
+}
+
+def _encode_model_inputs(model_inputs):
+    """
+    build_shift_schedule_model() のキーワード引数を JSON に変換できる辞書にする
+    """
+    encoded = {}
+    for key, value in model_inputs.items():
+        if key in _INPUT_LISTS:
+            encoded[key] = [asdict(item) for item in value] if value is not None else None
+        elif isinstance(value, HorizonBoundary):
+            # JSON のキーは文字列になるため、スタッフIDをキーとする辞書は [スタッフID, 値] のリストにする
+            encoded[key] = {
+                'consecutive_work_days_before': list(value.consecutive_work_days_before.items()),
+                'consecutive_rest_days_before': list(value.consecutive_rest_days_before.items()),
+                'lookahead_dates': value.lookahead_dates,
+                'lookahead_work_days': list(value.lookahead_work_days.items())
+            }
+        else:
+            encoded[key] = value
+    return encoded
+
+def decode_model_inputs(encoded):
+    """
+    _encode_model_inputs() で変換した辞書から build_shift_schedule_model() のキーワード引数を作成する
+    """
+    model_inputs = {}
+    for key, value in encoded.items():
+        if key in _INPUT_LISTS:
+            model_inputs[key] = [_INPUT_LISTS[key](**item) for item in value] if value is not None else None
+        elif key == 'boundary' and value is not None:
+            model_inputs[key] = HorizonBoundary(
+                consecutive_work_days_before = dict(value['consecutive_work_days_before']),
+                consecutive_rest_days_before = dict(value.get('consecutive_rest_days_before', [])),
+                lookahead_dates = value['lookahead_dates'],
+                lookahead_work_days = dict(value['lookahead_work_days'])
+            )
+        else:
+            model_inputs[key] = value
+    return model_inputs
+
+def load_snapshot(path):
+    """
+    スナップショットのディレクトリから、保存した CpModel とメタデータを読み込む
+
+    戻り値:
+        - (CpModel, dict) のタプル dict は snapshot.json の内容で、
+          model_inputs は build_shift_schedule_model() のキーワード引数、solver_parameters は SolverParameters に戻す
+    """
+    model = cp_model.CpModel()
+    with open(os.path.join(path, MODEL_FILE)) as f:
+        model.Proto().parse_text_format(f.read())
+
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    meta['model_inputs'] = decode_model_inputs(meta['model_inputs'])
+    meta['solver_parameters'] = SolverParameters(**meta['solver_parameters'])
+    return model, meta
+
+class SnapshotStore:
+    """
+    探索に時間がかかったリクエストのモデル（CpModelProto）と入力、ソルバーパラメータ、探索の統計を
+    ディレクトリに保存するリングバッファ 保存した数が max_snapshots を超えた場合は古いものから削除する
+    保存したスナップショットは bench/replay.py でパラメータを変えて解き直せる
+
+    スナップショットごとに、作成日時から始まる名前のサブディレクトリを作成し、次のファイルを保存する
+    - model.pb.txt: CpModel.ExportToFile() で書き出したテキスト形式の CpModelProto（初期解を含む）
+    - snapshot.json: model_inputs, solver_parameters, result（ステータス、目的関数の値、探索時間、統計）, timings
+
+    Parameters:
+        - directory: str, スナップショットを保存するディレクトリ
+        - max_snapshots: int, 保持するスナップショットの最大数
+        - min_wall_time: float, 探索時間がこの値（秒）以上の場合のみ保存する
+    """
+    def __init__(self, directory, max_snapshots=50, min_wall_time=0.0):
+        self.directory = directory
+        self.max_snapshots = max_snapshots
+        self.min_wall_time = min_wall_time
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _prune(self):
+        """
+        max_snapshots を超えた分を古いものから削除する
+        """
+        names = sorted(name for name in os.listdir(self.directory) if os.path.isdir(os.path.join(self.directory, name)))
+        for name in names[:max(0, len(names) - self.max_snapshots)]:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def capture(self, shift_schedule_model, model_inputs, solver_parameters, result, timings=None, name=None):
+        """
+        探索時間が min_wall_time 以上の場合にスナップショットを保存し、保存したディレクトリを返す
+        保存しなかった場合や、書き込みに失敗した場合は None を返す 失敗してもリクエストは失敗させない
+
+        Parameters:
+            - shift_schedule_model: ShiftScheduleModel, 解いたモデル
+            - model_inputs: dict, build_shift_schedule_model() のキーワード引数
+            - solver_parameters: SolverParameters, 探索に使用したパラメータ
+            - result: SolveResult
+            - timings: dict, フェーズごとの所要時間
+            - name: str, ディレクトリ名の作成日時の後に付ける名前（キャッシュのキーなど）
+        """
+        if result.wall_time < self.min_wall_time:
+            return None
+
+        created_at = datetime.now(timezone.utc)
+        dirname = created_at.strftime('%Y%m%dT%H%M%S%fZ') + (f'-{name}' if name else '')
+        path = os.path.join(self.directory, dirname)
+        meta = {
+            'created_at': created_at.isoformat(),
+            'model_inputs': _encode_model_inputs(model_inputs),
+            'solver_parameters': asdict(solver_parameters),
+            'result': {
+                'status': result.status,
+                'objective_value': result.objective_value,
+                'best_objective_bound': result.best_objective_bound,
+                'wall_time': result.wall_time,
+                'stats': result.stats
+            },
+            'timings': timings
+        }
+        try:
+            with self._lock:
+                os.makedirs(path, exist_ok=True)
+                shift_schedule_model.model.ExportToFile(os.path.join(path, MODEL_FILE))
+                with open(os.path.join(path, META_FILE), 'w') as f:
+                    json.dump(meta, f)
+                self._prune()
+        except OSError as e:
+            logger.warning(f'failed to write snapshot {path}: {e!r}')
+            return None
+        logger.info(f'snapshot written to {path}')
+        return path
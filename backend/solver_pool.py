@@ -0,0 +1,113 @@
+import threading
+from dataclasses import replace
+from models.parameters import SolverParameters
+
+class SolverPoolTimeout(Exception):
+    """
+    探索の枠が空くまでの待ち時間が queue_timeout を超えた場合に送出する例外
+    """
+
+class SolverSlot:
+    """
+    SolverPool から取得した探索 1 つ分の枠
+    with 文で使用するか、release() を呼び出して返却する
+
+    属性:
+    - solver_parameters (SolverParameters): num_search_workers を枠に割り当てたスレッド数で補ったパラメータ
+    """
+    def __init__(self, pool, solver_parameters):
+        self._pool = pool
+        self._released = False
+        self._lock = threading.Lock()
+        self.solver_parameters = solver_parameters
+
+    def release(self):
+        """
+        枠を返却する 2 回目以降の呼び出しは何もしない
+        """
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._pool._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.release()
+
+# acquire() の timeout を省略した場合に queue_timeout を使うための値
+_DEFAULT_TIMEOUT = object()
+
+class SolverPool:
+    """
+    1 プロセス内で同時に実行する CP-SAT の探索の数を size に制限するクラス
+    同期エンドポイントの探索だけでなく、非同期ジョブ（jobs.py）とバッチ最適化（batch.py）の探索も同じ枠を使い、
+    プロセス全体の探索スレッド数が cpu_count を超えないようにする
+
+    CP-SAT は探索ごとに num_search_workers のスレッドを使うため、HTTP リクエストの数だけ探索を同時に実行すると
+    CPU コア数を超えるスレッドが動き、すべての探索が遅くなる
+    枠が空くまでリクエストを待たせ、探索スレッド数が指定されていない場合は cpu_count を size で分けた数を割り当てる
+
+    Parameters:
+        - size: int, 同時に実行する探索の数
+        - cpu_count: int, このプロセスで探索に使える CPU コア数
+        - queue_timeout: float, 枠が空くまで待つ時間の上限（秒） None の場合は無制限に待つ
+    """
+    def __init__(self, size, cpu_count, queue_timeout=None):
+        if size < 1:
+            raise ValueError("size must be a positive integer")
+        self.size = size
+        self.search_workers = max(1, cpu_count // size)
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiting = 0
+
+    def acquire(self, solver_parameters=None, timeout=_DEFAULT_TIMEOUT):
+        """
+        探索の枠を取得し、SolverSlot を返す
+        timeout までに枠が空かない場合は SolverPoolTimeout を送出する
+
+        Parameters:
+            - solver_parameters: SolverParameters, リクエストのソルバーパラメータ
+            - timeout: float, 枠が空くまで待つ時間の上限（秒） 省略した場合は queue_timeout、None の場合は無制限に待つ
+        """
+        if timeout is _DEFAULT_TIMEOUT:
+            timeout = self.queue_timeout
+        with self._lock:
+            self._waiting += 1
+        try:
+            acquired = self._semaphore.acquire(timeout=timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            raise SolverPoolTimeout(f"No solver slot became free within {timeout} seconds")
+
+        with self._lock:
+            self._in_use += 1
+        if solver_parameters is None:
+            solver_parameters = SolverParameters()
+        if solver_parameters.num_search_workers is None:
+            solver_parameters = replace(solver_parameters, num_search_workers=self.search_workers)
+        return SolverSlot(self, solver_parameters)
+
+    def _release(self):
+        with self._lock:
+            self._in_use -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        """
+        枠の数、使用中の枠の数、枠を待っているリクエストの数、1 つの探索に割り当てるスレッド数を返す
+        """
+        with self._lock:
+            return {
+                'size': self.size,
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'search_workers': self.search_workers
+            }
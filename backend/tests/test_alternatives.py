@@ -0,0 +1,68 @@
+from itertools import combinations
+import numpy as np
+import pytest
+from app import app
+from bench.generators import generate_store
+from bench.load import create_payload
+from cache import compute_cache_key, seed_from_cache_key
+from models.builder import build_shift_schedule_model
+from models.parameters import LockedShift, SolverParameters
+
+SOLVER_PARAMETERS = SolverParameters(max_time_in_seconds = 10.0, num_search_workers = 1, random_seed = 0)
+
+def create_model_inputs():
+    shifts, staffs, locked = generate_store(8, days=10, seed=0, work_days=6)
+    model_inputs = {'shifts': shifts, 'staffs': staffs, 'locked': locked}
+    # app.py と同じく、seed は入力とソルバーパラメータから作成する
+    model_inputs['seed'] = seed_from_cache_key(compute_cache_key(model_inputs, SOLVER_PARAMETERS))
+    return model_inputs
+
+def is_feasible(model_inputs, schedule):
+    """
+    すべてのセルを schedule の出勤可否にロックしたモデルに解があるかどうか
+    """
+    locked = [
+        LockedShift(date = date, staff_id = staff_id, is_working = bool(schedule.is_working[i, j]))
+        for i, date in enumerate(schedule.dates)
+        for j, staff_id in enumerate(schedule.staff_ids)
+    ]
+    result = build_shift_schedule_model(model_inputs['shifts'], model_inputs['staffs'], locked).solve(SOLVER_PARAMETERS)
+    return result.status == 'OPTIMAL'
+
+@pytest.mark.parametrize('min_difference', [2, 5])
+def test_alternatives_are_distinct_and_feasible(min_difference):
+    model_inputs = create_model_inputs()
+    results = build_shift_schedule_model(**model_inputs).solve_alternatives(4, SOLVER_PARAMETERS, min_difference)
+
+    assert len(results) == 4
+    assert all(result.status == 'OPTIMAL' for result in results)
+    for result in results:
+        assert is_feasible(model_inputs, result.schedule)
+    for first, second in combinations(results, 2):
+        assert first.schedule.staff_ids == second.schedule.staff_ids
+        assert np.count_nonzero(first.schedule.is_working != second.schedule.is_working) >= min_difference
+    # 解を除くたびに解き直すため、目的関数の値が良い順に並ぶ
+    objective_values = [result.objective_value for result in results]
+    assert objective_values == sorted(objective_values)
+
+def test_alternatives_are_reproducible_with_the_seed_from_the_cache_key():
+    first_inputs, second_inputs = create_model_inputs(), create_model_inputs()
+    assert first_inputs['seed'] == second_inputs['seed']
+
+    first = build_shift_schedule_model(**first_inputs).solve_alternatives(3, SOLVER_PARAMETERS)
+    second = build_shift_schedule_model(**second_inputs).solve_alternatives(3, SOLVER_PARAMETERS)
+    assert [result.objective_value for result in first] == [result.objective_value for result in second]
+    for first_result, second_result in zip(first, second):
+        assert np.array_equal(first_result.schedule.is_working, second_result.schedule.is_working)
+
+def test_alternatives_endpoint_is_reproducible():
+    payload = {**create_payload('small', 0, 10.0), 'count': 3}
+    payload['solverParameters']['numSearchWorkers'] = 1
+    client = app.test_client()
+    first = client.post('/api/v1/optimize/alternatives', json=payload)
+    second = client.post('/api/v1/optimize/alternatives', json=payload)
+    assert first.status_code == second.status_code == 200
+    first_results, second_results = first.get_json()['results'], second.get_json()['results']
+    assert len(first_results) == 3
+    assert [result['shifts'] for result in first_results] == [result['shifts'] for result in second_results]
+    assert len({str(result['shifts']) for result in first_results}) == 3
@@ -0,0 +1,34 @@
+import time
+import multiprocessing
+import batch
+from batch import solve_batch
+from solver_pool import SolverPool
+from models.parameters import SolverParameters
+
+def _sleep_store(model_inputs, solver_parameters, deadline):
+    time.sleep(model_inputs['seconds'])
+    return model_inputs['seconds']
+
+def test_short_deadline_returns_on_time(monkeypatch):
+    # 締め切りを無視して探索を続けるワーカーを、_solve_store の代わりに眠り続ける関数で再現する
+    monkeypatch.setattr(batch, '_solve_store', _sleep_store)
+    monkeypatch.setattr(batch, 'DEADLINE_GRACE_SECONDS', 0.5)
+    solver_parameters = SolverParameters(max_time_in_seconds = 60.0, num_search_workers = 1)
+    problems = [
+        ('fast', {'seconds': 0}, solver_parameters),
+        ('slow', {'seconds': 60}, solver_parameters)
+    ]
+    solver_pool = SolverPool(size = 2, cpu_count = 2)
+
+    started = time.monotonic()
+    try:
+        results = solve_batch(problems, solver_pool, deadline_seconds=1.0)
+        elapsed = time.monotonic() - started
+    finally:
+        for process in multiprocessing.active_children():
+            process.kill()
+
+    assert elapsed < 1.0 + 0.5 + 1.0
+    assert [item.id for item in results] == ['fast', 'slow']
+    assert results[0].result == 0 and results[0].error is None
+    assert results[1].result is None and results[1].error == "Batch deadline exceeded"
@@ -0,0 +1,73 @@
+import numpy as np
+from cache import ResultCache, compute_cache_key, seed_from_cache_key
+from models.parameters import Staff, Shift, LockedShift, SolverParameters
+from models.shift_schedule_model import ScheduleValues, SolveResult
+
+def create_model_inputs(reverse=False):
+    staffs = [
+        Staff(id = 1, tier = 1, desired_off_days = [3, 1], work_days = 2),
+        Staff(id = 2, tier = 3, desired_off_days = [], work_days = 2)
+    ]
+    shifts = [
+        Shift(date = 1, required_staff_count = 1, required_attendance_tiers = [2, 1], required_attendance_tier_count = 1),
+        Shift(date = 2, required_staff_count = 1, required_attendance_tiers = [1], required_attendance_tier_count = 0),
+        Shift(date = 3, required_staff_count = 1, required_attendance_tiers = [], required_attendance_tier_count = 0)
+    ]
+    locked = [
+        LockedShift(date = 1, staff_id = 2, is_working = True),
+        LockedShift(date = 2, staff_id = 1, is_working = False)
+    ]
+    if reverse:
+        staffs = [Staff(**{**vars(staff), 'desired_off_days': staff.desired_off_days[::-1]}) for staff in staffs[::-1]]
+        shifts = [Shift(**{**vars(shift), 'required_attendance_tiers': shift.required_attendance_tiers[::-1]}) for shift in shifts[::-1]]
+        locked = locked[::-1]
+    return {'shifts': shifts, 'staffs': staffs, 'locked': locked, 'shift_balance_mode': 'max'}
+
+def test_cache_key_ignores_list_order():
+    solver_parameters = SolverParameters(max_time_in_seconds = 5.0)
+    assert compute_cache_key(create_model_inputs(), solver_parameters) == compute_cache_key(create_model_inputs(reverse=True), solver_parameters)
+
+def test_cache_key_depends_on_inputs_and_parameters():
+    model_inputs = create_model_inputs()
+    key = compute_cache_key(model_inputs, SolverParameters(max_time_in_seconds = 5.0))
+    assert key != compute_cache_key(model_inputs, SolverParameters(max_time_in_seconds = 10.0))
+    assert key != compute_cache_key({**model_inputs, 'shift_balance_mode': 'sum'}, SolverParameters(max_time_in_seconds = 5.0))
+
+    staffs = [Staff(**{**vars(staff), 'work_days': 3}) if staff.id == 1 else staff for staff in model_inputs['staffs']]
+    assert key != compute_cache_key({**model_inputs, 'staffs': staffs}, SolverParameters(max_time_in_seconds = 5.0))
+
+def test_seed_from_cache_key():
+    key = compute_cache_key(create_model_inputs(), None)
+    seed = seed_from_cache_key(key)
+    assert seed == seed_from_cache_key(compute_cache_key(create_model_inputs(reverse=True), None))
+    assert seed == int(key[:8], 16)
+    assert 0 <= seed < 2 ** 32
+
+def create_result():
+    schedule = ScheduleValues(
+        dates = [1, 2, 3],
+        staff_ids = [1, 2],
+        is_working = np.array([[True, False], [False, True], [True, True]]),
+        locked = np.array([[False, True], [False, False], [False, False]])
+    )
+    return SolveResult(status = 'OPTIMAL', schedule = schedule, objective_value = 1.0, best_objective_bound = 1.0, wall_time = 0.1)
+
+def test_disk_cache_round_trip(tmp_path):
+    key = compute_cache_key(create_model_inputs(), None)
+    ResultCache(directory=str(tmp_path), encode=SolveResult.to_dict, decode=SolveResult.from_dict).set(key, create_result())
+
+    # 別プロセスのキャッシュとして、メモリが空のインスタンスから読む
+    result = ResultCache(directory=str(tmp_path), encode=SolveResult.to_dict, decode=SolveResult.from_dict).get(key)
+    expected = create_result()
+    assert result.status == expected.status
+    assert result.schedule.dates == expected.schedule.dates
+    assert result.schedule.staff_ids == expected.schedule.staff_ids
+    assert np.array_equal(result.schedule.is_working, expected.schedule.is_working)
+    assert np.array_equal(result.schedule.locked, expected.schedule.locked)
+
+def test_corrupt_disk_cache_is_a_miss(tmp_path):
+    key = compute_cache_key(create_model_inputs(), None)
+    cache = ResultCache(directory=str(tmp_path), encode=SolveResult.to_dict, decode=SolveResult.from_dict)
+    for content in ('{corrupt', '{"status": 1}', '[1, 2]'):
+        (tmp_path / f'{key}.json').write_text(content)
+        assert cache.get(key) is None
@@ -0,0 +1,67 @@
+import itertools
+import pytest
+from bench.generators import generate_store
+from models.builder import build_shift_schedule_model
+from models.parameters import Staff, Shift, LockedShift, SolverParameters, HorizonBoundary
+
+SOLVER_PARAMETERS = SolverParameters(max_time_in_seconds = 30.0, num_search_workers = 1, random_seed = 0)
+DAYS = 8
+
+def is_feasible(pattern, encoding, max_consecutive_work_days, min_consecutive_rest_days, consecutive_work_days_before, consecutive_rest_days_before=0):
+    """
+    1 人のスタッフの出勤可否を pattern にロックし、連勤と連休のルールだけで解があるかを返す
+    """
+    staffs = [Staff(id = 1, tier = 1, desired_off_days = [], work_days = sum(pattern))]
+    shifts = [
+        Shift(date = date, required_staff_count = 0, required_attendance_tiers = [], required_attendance_tier_count = 0)
+        for date in range(1, DAYS + 1)
+    ]
+    locked = [LockedShift(date = date, staff_id = 1, is_working = is_working) for date, is_working in enumerate(pattern, start=1)]
+    boundary = HorizonBoundary(
+        consecutive_work_days_before = {1: consecutive_work_days_before},
+        consecutive_rest_days_before = {1: consecutive_rest_days_before},
+        lookahead_dates = [],
+        lookahead_work_days = {}
+    )
+    shift_schedule_model = build_shift_schedule_model(
+        shifts, staffs, locked, seed=0, boundary=boundary, consecutive_encoding=encoding,
+        max_consecutive_work_days=max_consecutive_work_days, min_consecutive_rest_days=min_consecutive_rest_days
+    )
+    return shift_schedule_model.solve(SOLVER_PARAMETERS).status == 'OPTIMAL'
+
+@pytest.mark.parametrize('max_consecutive_work_days, min_consecutive_rest_days, consecutive_work_days_before, consecutive_rest_days_before', [
+    (3, 1, 0, 0),
+    (3, 2, 0, 0),
+    (3, 2, 2, 0),
+    (5, 1, 4, 0),
+    (3, 3, 0, 1),
+    (3, 3, 0, 2),
+    (3, 2, 0, 2)
+])
+def test_encodings_accept_the_same_patterns(max_consecutive_work_days, min_consecutive_rest_days, consecutive_work_days_before, consecutive_rest_days_before):
+    limits = (max_consecutive_work_days, min_consecutive_rest_days, consecutive_work_days_before, consecutive_rest_days_before)
+    for pattern in itertools.product((False, True), repeat=DAYS):
+        assert is_feasible(pattern, 'window', *limits) == is_feasible(pattern, 'automaton', *limits), pattern
+
+@pytest.mark.parametrize('encoding', ['window', 'automaton'])
+def test_rest_days_before_continue_across_the_boundary(encoding):
+    # 直前の期間の末尾に連勤の後の 1 日の休みがあり、最小連休数が 3 の場合は、期間の最初の 2 日も休む
+    assert is_feasible((True, True, False, False, False, True, True, False), encoding, 3, 3, 0, 0)
+    assert not is_feasible((True, True, False, False, False, True, True, False), encoding, 3, 3, 0, 1)
+    assert not is_feasible((False, True, True, False, False, False, True, True), encoding, 3, 3, 0, 1)
+    assert is_feasible((False, False, True, True, False, False, False, True), encoding, 3, 3, 0, 1)
+    # 最小連休数に達している休みは制約しない
+    assert is_feasible((True, True, False, False, False, True, True, False), encoding, 3, 3, 0, 3)
+
+@pytest.mark.parametrize('max_consecutive_work_days, min_consecutive_rest_days', [(5, 1), (4, 2)])
+def test_encodings_reach_the_same_optimum(max_consecutive_work_days, min_consecutive_rest_days):
+    shifts, staffs, locked = generate_store(8, days=14, seed=0, work_days=9)
+    objective_values = []
+    for encoding in ('window', 'automaton'):
+        result = build_shift_schedule_model(
+            shifts, staffs, locked, seed=0, consecutive_encoding=encoding,
+            max_consecutive_work_days=max_consecutive_work_days, min_consecutive_rest_days=min_consecutive_rest_days
+        ).solve(SOLVER_PARAMETERS)
+        assert result.status == 'OPTIMAL'
+        objective_values.append(result.objective_value)
+    assert objective_values[0] == pytest.approx(objective_values[1])
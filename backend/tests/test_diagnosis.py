@@ -0,0 +1,76 @@
+from ortools.sat.python import cp_model
+from app import app, parse_optimize_payload
+from models.builder import build_shift_schedule_model
+from models.shift_schedule_model import ShiftScheduleModel
+import models.shift_schedule_model as shift_schedule_model
+
+LOCKED_RULE = {'type': 'locked', 'date': 2, 'staff_id': 1, 'is_working': False}
+REQUIRED_RULE = {'type': 'required_staff_count', 'date': 2, 'required_staff_count': 3}
+
+def create_payload():
+    """
+    2 日目に 3 人全員が必要な店舗で、スタッフ 1 の 2 日目を休みにロックした解なしの入力
+    各スタッフの出勤日数は 1 日のため、スタッフ 1 が別の日に出勤すれば出勤日数のルールとは矛盾しない
+    """
+    return {
+        'staffs': [{'id': staff_id, 'tier': 1, 'desiredOffDays': [], 'workDays': 1} for staff_id in range(1, 4)],
+        'shifts': [
+            {'date': date, 'requiredStaffCount': 3 if date == 2 else 0, 'requiredAttendanceTiers': [1], 'requiredAttendanceTierCount': 0}
+            for date in range(1, 4)
+        ],
+        'locked': [{'date': 2, 'staffId': 1, 'isWorking': False}]
+    }
+
+def create_diagnosis_model():
+    model_inputs, _ = parse_optimize_payload(create_payload())
+    return build_shift_schedule_model(**model_inputs, diagnose=True)
+
+def report_all_rules_as_core(monkeypatch):
+    """
+    CP-SAT が解なしの十分条件としてすべてのルールを返した場合を再現する
+    """
+    solve_with_assumptions = ShiftScheduleModel._solve_with_assumptions
+    def solve_with_all_rules_as_core(self, literals, max_time_in_seconds):
+        status, core = solve_with_assumptions(self, literals, max_time_in_seconds)
+        return status, (literals if status == cp_model.INFEASIBLE else core)
+    monkeypatch.setattr(ShiftScheduleModel, '_solve_with_assumptions', solve_with_all_rules_as_core)
+
+def test_infeasible_request_returns_minimal_conflicts():
+    response = app.test_client().post('/api/v1/optimize', json=create_payload())
+    assert response.status_code == 422
+    body = response.get_json()
+    assert body['error'] == "No feasible schedule"
+    assert body['solver']['status'] == 'INFEASIBLE'
+    assert body['conflicts'] == [
+        {'type': 'locked', 'date': 2, 'staffId': 1, 'isWorking': False},
+        {'type': 'requiredStaffCount', 'date': 2, 'requiredStaffCount': 3}
+    ]
+
+def test_conflicts_shrink_to_a_minimal_set(monkeypatch):
+    # 初回の組み合わせがすべてのルールを含む場合でも、不要なルールを取り除く
+    report_all_rules_as_core(monkeypatch)
+
+    conflicts = create_diagnosis_model().find_conflicting_rules(max_time_in_seconds = 10.0)
+    assert sorted(conflicts, key=lambda rule: rule['type']) == [LOCKED_RULE, REQUIRED_RULE]
+
+class _ExpiringClock:
+    """
+    最初の呼び出しの後は max_time_in_seconds を過ぎた時刻を返す perf_counter()
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def perf_counter(self):
+        self.calls += 1
+        return 0.0 if self.calls == 1 else 1000.0
+
+def test_deadline_returns_partial_conflicts(monkeypatch):
+    report_all_rules_as_core(monkeypatch)
+    model = create_diagnosis_model()
+    monkeypatch.setattr(shift_schedule_model, 'time', _ExpiringClock())
+
+    conflicts = model.find_conflicting_rules(max_time_in_seconds = 10.0)
+    # 締め切りを過ぎたため、絞り込む前の組み合わせをそのまま返す
+    assert conflicts == model.assumptions.rules(model.assumptions.literals)
+    assert len(conflicts) > 2
+    assert LOCKED_RULE in conflicts and REQUIRED_RULE in conflicts
@@ -0,0 +1,67 @@
+from dataclasses import replace
+import pytest
+from bench.generators import generate_store
+from models.shift_schedule_model import ShiftScheduleModel, Relaxation
+from models.constraints import StaffConstraints, ShiftConstraints, RequiredAttendanceConstraints
+from models.objectives import StaffObjectives, ShiftBalanceTierObjectives
+from models.parameters import LockedShift, SolverParameters
+from models.evaluator import ScheduleEvaluator
+
+SOLVER_PARAMETERS = SolverParameters(max_time_in_seconds = 60.0, num_search_workers = 1, random_seed = 0)
+
+def solve(shifts, staffs, locked, shift_balance_mode, relax=False, encoding='window'):
+    """
+    RandomizedObjective を含まない、希望休と役職バランスの目的関数だけのモデルを解く
+    """
+    shift_schedule_model = ShiftScheduleModel(shifts, staffs, locked, relax=relax)
+    shift_schedule_model.add_constraints([
+        StaffConstraints(staffs, encoding=encoding),
+        ShiftConstraints(shifts),
+        RequiredAttendanceConstraints(shifts, staffs)
+    ])
+    shift_schedule_model.add_objectives([StaffObjectives(staffs), ShiftBalanceTierObjectives(shifts, staffs, shift_balance_mode)])
+    return shift_schedule_model.solve(SOLVER_PARAMETERS)
+
+def sort_rules(rules):
+    return sorted(tuple(sorted(rule.items())) for rule in rules)
+
+@pytest.mark.parametrize('shift_balance_mode', ['max', 'sum'])
+def test_evaluator_matches_model_objective(shift_balance_mode):
+    shifts, staffs, locked = generate_store(10, days=14, seed=0, work_days=9, desired_off_density=0.2)
+    result = solve(shifts, staffs, locked, shift_balance_mode)
+    assert result.status == 'OPTIMAL'
+    assert result.schedule.dates == [shift.date for shift in shifts]
+    assert result.schedule.staff_ids == [staff.id for staff in staffs]
+
+    evaluation = ScheduleEvaluator(shifts, staffs, locked, shift_balance_mode).evaluate(result.schedule.is_working)
+    assert evaluation['objective']['total'] == result.objective_value
+    # 希望休と役職バランスの両方のペナルティが含まれる構成であること
+    assert evaluation['objective']['desired_off_days'] > 0 and evaluation['objective']['shift_balance_tier'] > 0
+    assert evaluation['violations'] == []
+
+@pytest.mark.parametrize('encoding', ['window', 'automaton'])
+@pytest.mark.parametrize('shift_balance_mode', ['max', 'sum'])
+def test_evaluator_matches_relaxed_model_violations(shift_balance_mode, encoding):
+    shifts, staffs, locked = generate_store(8, days=10, seed=0, work_days=6, desired_off_density=0.2)
+    # 出勤数、最小連休数、最大連勤数のルールをそれぞれ満たせなくする
+    staffs[0] = replace(staffs[0], work_days = len(shifts))
+    staffs[1] = replace(staffs[1], min_consecutive_rest_days = 2)
+    staffs[2] = replace(staffs[2], work_days = 7)
+    locked = locked + [
+        LockedShift(date = date, staff_id = staffs[1].id, is_working = date != 4) for date in range(2, 8)
+    ] + [
+        LockedShift(date = date, staff_id = staffs[2].id, is_working = True) for date in range(1, 8)
+    ]
+    result = solve(shifts, staffs, locked, shift_balance_mode, relax=True, encoding=encoding)
+    assert result.status == 'OPTIMAL'
+
+    evaluation = ScheduleEvaluator(shifts, staffs, locked, shift_balance_mode).evaluate(result.schedule.is_working)
+    assert sort_rules(evaluation['violations']) == sort_rules(result.violations)
+    assert {violation['type'] for violation in evaluation['violations']} >= {
+        'work_days', 'min_consecutive_rest_days', 'max_consecutive_work_days'
+    }
+    # 緩和モードの目的関数は、評価した目的関数と違反数に重みを掛けた値の合計
+    relaxation_penalty = sum(
+        Relaxation.DEFAULT_WEIGHT * (violation['shortage'] + violation['excess']) for violation in evaluation['violations']
+    )
+    assert evaluation['objective']['total'] + relaxation_penalty == result.objective_value
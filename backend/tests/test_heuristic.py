@@ -0,0 +1,72 @@
+import pytest
+from bench.generators import generate_store
+from models.builder import build_shift_schedule_model
+from models.heuristic import GreedyScheduleHeuristic
+from models.parameters import LockedShift, SolverParameters
+
+SOLVER_PARAMETERS = SolverParameters(max_time_in_seconds = 10.0, num_search_workers = 1, random_seed = 0)
+
+STORES = [
+    dict(staff_count = 8, days = 10, seed = 0, work_days = 6),
+    dict(staff_count = 8, days = 14, seed = 0, work_days = 9),
+    dict(staff_count = 20, days = 31, seed = 1),
+]
+
+def create_store(store):
+    """
+    generate_store() の店舗に、出勤と休みのロックを加える
+    """
+    shifts, staffs, locked = generate_store(**store)
+    locked = locked + [
+        LockedShift(date = 1, staff_id = staffs[0].id, is_working = False),
+        LockedShift(date = 2, staff_id = staffs[1].id, is_working = True),
+        LockedShift(date = 3, staff_id = staffs[2].id, is_working = False),
+        LockedShift(date = 3, staff_id = staffs[3].id, is_working = True),
+    ]
+    return shifts, staffs, locked
+
+@pytest.mark.parametrize('store', STORES)
+def test_assign_respects_locks_and_required_counts(store):
+    shifts, staffs, locked = create_store(store)
+    assigned = GreedyScheduleHeuristic(shifts, staffs, locked).assign()
+    is_working = {(shift.date, shift.staff_id): shift.is_working for shift in assigned}
+    assert len(assigned) == len(is_working) == len(shifts) * len(staffs)
+
+    for lock in locked:
+        assert is_working[(lock.date, lock.staff_id)] == lock.is_working
+
+    for shift in shifts:
+        working = [staff for staff in staffs if is_working[(shift.date, staff.id)]]
+        assert len(working) >= shift.required_staff_count
+        tier_count = sum(1 for staff in working if staff.tier in shift.required_attendance_tiers)
+        assert tier_count >= shift.required_attendance_tier_count
+
+@pytest.mark.parametrize('store', STORES)
+def test_fast_returns_a_feasible_schedule(store):
+    shifts, staffs, locked = create_store(store)
+    result = build_shift_schedule_model(shifts, staffs, locked, heuristic='fast').solve(SOLVER_PARAMETERS)
+    assert result.status == 'OPTIMAL'
+    assert result.violations == []
+
+    # 'fast' の解はヒューリスティックのシフト表そのもの
+    assigned = GreedyScheduleHeuristic(shifts, staffs, locked).assign()
+    assert sorted((cell['date'], cell['staffId'], cell['isWorking']) for cell in result.shift_list) == sorted(
+        (shift.date, shift.staff_id, shift.is_working) for shift in assigned
+    )
+
+    # 緩和しないモデルでも、すべてのシフトをその解に固定して解がある
+    fixed = [
+        LockedShift(date = cell['date'], staff_id = cell['staffId'], is_working = cell['isWorking'])
+        for cell in result.shift_list
+    ]
+    strict_result = build_shift_schedule_model(shifts, staffs, fixed).solve(SOLVER_PARAMETERS)
+    assert strict_result.status == 'OPTIMAL'
+
+def test_fast_reports_violations_instead_of_failing():
+    shifts, staffs, locked = create_store(STORES[0])
+    # 日数を超える出勤数は満たせないため、緩和した違反として報告する
+    staffs[4].work_days = len(shifts) + 1
+    result = build_shift_schedule_model(shifts, staffs, locked, heuristic='fast').solve(SOLVER_PARAMETERS)
+    assert result.status == 'OPTIMAL'
+    assert result.schedule is not None
+    assert any(violation['type'] == 'work_days' and violation['staff_id'] == staffs[4].id for violation in result.violations)
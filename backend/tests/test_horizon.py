@@ -0,0 +1,131 @@
+import numpy as np
+import horizon
+from horizon import _count_trailing_days, solve_rolling_horizon
+from bench.generators import generate_store
+from models.constraints import StaffConstraints
+from models.parameters import LockedShift, SolverParameters
+from models.shift_schedule_model import ScheduleValues
+
+SOLVER_PARAMETERS = SolverParameters(max_time_in_seconds = 10.0, num_search_workers = 1, random_seed = 0)
+
+def test_count_trailing_days():
+    columns = {
+        1: [False, True, False, False],
+        2: [True, True, False, True],
+        3: [False, False, False, False],
+        4: [False, False, False, False],
+        5: [False, False, False, False],
+        6: [True, True, True, True]
+    }
+    schedule = ScheduleValues(
+        dates = [1, 2, 3, 4],
+        staff_ids = list(columns),
+        is_working = np.array(list(columns.values())).T,
+        locked = np.zeros((4, len(columns)), dtype=bool)
+    )
+    trailing_work_days, trailing_rest_days = _count_trailing_days(schedule, {3: 3, 6: 2}, {4: 1})
+    assert trailing_work_days == {2: 1, 6: 6}
+    # 5 は最初から一度も出勤していないため、連勤の後の休みとして数えない
+    assert trailing_rest_days == {1: 2, 3: 4, 4: 5}
+
+def create_period(seed, locked=(), relax=False):
+    """
+    14 日分の 1 期間の入力 seed が異なっても同じスタッフIDを持つ
+    """
+    shifts, staffs, generated_locked = generate_store(8, days=14, seed=seed, work_days=9)
+    model_inputs = {'shifts': shifts, 'staffs': staffs, 'locked': generated_locked + list(locked), 'seed': 0, 'relax': relax}
+    return model_inputs, SOLVER_PARAMETERS
+
+def record_models(monkeypatch):
+    """
+    solve_rolling_horizon() が build_shift_schedule_model() に渡した窓の入力を記録する
+    """
+    calls = []
+    build_shift_schedule_model = horizon.build_shift_schedule_model
+    def record(**window_inputs):
+        calls.append(window_inputs)
+        return build_shift_schedule_model(**window_inputs)
+    monkeypatch.setattr(horizon, 'build_shift_schedule_model', record)
+    return calls
+
+def trailing_days(column):
+    """
+    出勤可否の列の末尾から続いている、最後の日と同じ値の日数
+    """
+    count = 0
+    for is_working in column[::-1]:
+        if is_working != column[-1]:
+            break
+        count += 1
+    return count
+
+def test_two_periods_carry_over_the_boundary(monkeypatch):
+    calls = record_models(monkeypatch)
+    staffs = generate_store(8, days=14, seed=0, work_days=9)[1]
+    short_staff_id, consecutive_staff_id = staffs[0].id, staffs[1].id
+    periods = [
+        # 前半を休みにロックしたスタッフは出勤数を満たせず、末尾に出勤をロックしたスタッフは連勤のまま次の期間に入る
+        create_period(0, [LockedShift(date = date, staff_id = short_staff_id, is_working = False) for date in range(1, 8)]
+                      + [LockedShift(date = date, staff_id = consecutive_staff_id, is_working = True) for date in range(12, 15)], relax=True),
+        create_period(1, relax=True)
+    ]
+    first, second = solve_rolling_horizon(periods, lookahead_days=3)
+    assert len(calls) == 2
+
+    # 最初の窓は次の期間の 3 日を先読みし、結果は計画期間だけに切り詰める
+    assert first.lookahead_days == 3
+    assert calls[0]['boundary'].lookahead_dates == [15, 16, 17]
+    assert len(calls[0]['shifts']) == 17
+    assert first.result.schedule.dates == list(range(1, 15))
+    assert second.lookahead_days == 0
+    assert calls[1]['boundary'].lookahead_dates == []
+
+    # 期間の末尾の連勤と休みが、2 つ目のモデルの境界に渡る
+    schedule = first.result.schedule
+    expected_work_days_before = {}
+    expected_rest_days_before = {}
+    for j, staff_id in enumerate(schedule.staff_ids):
+        column = schedule.is_working[:, j].tolist()
+        if column[-1]:
+            expected_work_days_before[staff_id] = trailing_days(column)
+        elif any(column):
+            expected_rest_days_before[staff_id] = trailing_days(column)
+    assert expected_work_days_before[consecutive_staff_id] >= 3
+    assert calls[1]['boundary'].consecutive_work_days_before == expected_work_days_before
+    assert calls[1]['boundary'].consecutive_rest_days_before == expected_rest_days_before
+    assert second.consecutive_work_days_before == expected_work_days_before
+
+    # 満たせなかった出勤数は、2 つ目のモデルの出勤数に加える
+    shortage = next(
+        violation['shortage'] for violation in first.result.violations
+        if violation['type'] == 'work_days' and violation['staff_id'] == short_staff_id
+    )
+    assert shortage > 0
+    assert second.work_days_carry_over == {short_staff_id: shortage}
+    second_work_days = {staff.id: staff.work_days for staff in calls[1]['staffs']}
+    assert second_work_days[short_staff_id] == 9 + shortage
+    assert all(work_days == 9 for staff_id, work_days in second_work_days.items() if staff_id != short_staff_id)
+
+    # 2 つ目の期間の最初の連勤は、直前の期間からの連勤と合わせて最大連勤数を超えない
+    assert not any(violation['type'] == 'max_consecutive_work_days' for violation in second.result.violations)
+    second_schedule = second.result.schedule
+    for j, staff_id in enumerate(second_schedule.staff_ids):
+        column = second_schedule.is_working[:, j].tolist()
+        leading_work_days = column.index(False) if False in column else len(column)
+        assert expected_work_days_before.get(staff_id, 0) + leading_work_days <= StaffConstraints.MAX_CONSECUTIVE_WORK_DAYS
+
+def test_retries_without_lookahead(monkeypatch):
+    calls = record_models(monkeypatch)
+    staff_id = generate_store(8, days=14, seed=0, work_days=9)[1][2].id
+    # 次の期間の最初の 7 日に 6 日の出勤をロックし、先読みの出勤数の上限（9 日 × 7 / 14 の切り上げ = 5 日）を超えさせる
+    periods = [
+        create_period(0),
+        create_period(1, [LockedShift(date = date, staff_id = staff_id, is_working = True) for date in (1, 2, 3, 5, 6, 7)])
+    ]
+    first, second = solve_rolling_horizon(periods, lookahead_days=7)
+
+    assert [len(window_inputs['boundary'].lookahead_dates) for window_inputs in calls] == [7, 0, 0]
+    assert first.lookahead_days == 0
+    assert first.result.status == 'OPTIMAL'
+    assert second.result.status == 'OPTIMAL'
+    assert calls[2]['boundary'].consecutive_work_days_before == second.consecutive_work_days_before
@@ -0,0 +1,140 @@
+import time
+import threading
+import pytest
+import app as app_module
+from bench.generators import generate_store
+from jobs import JobManager, JobStatus, FINISHED_STATUSES, _watch_cancel
+from models.parameters import SolverParameters
+from solver_pool import SolverPool
+
+QUICK_PARAMETERS = SolverParameters(max_time_in_seconds = 10.0, num_search_workers = 1, random_seed = 0)
+# キャンセルしない限り、テストの待ち時間より長く探索を続けるジョブのパラメータ
+SLOW_PARAMETERS = SolverParameters(max_time_in_seconds = 120.0, num_search_workers = 1, random_seed = 0)
+
+def quick_inputs():
+    shifts, staffs, locked = generate_store(8, days=10, seed=0, work_days=6)
+    return {'shifts': shifts, 'staffs': staffs, 'locked': locked, 'seed': 0}
+
+def slow_inputs():
+    shifts, staffs, locked = generate_store(150, days=31, seed=0)
+    return {'shifts': shifts, 'staffs': staffs, 'locked': locked, 'seed': 0}
+
+def wait_for(job_manager, job_id, statuses, timeout=30.0):
+    """
+    ジョブが statuses のいずれかになるまでポーリングし、その状態を返す
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        state = job_manager.get(job_id)
+        if state['status'] in statuses:
+            return state
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not reach {statuses}: {job_manager.get(job_id)}")
+
+@pytest.fixture
+def job_manager():
+    job_manager = JobManager(SolverPool(size = 1, cpu_count = 1), max_workers=1)
+    yield job_manager
+    job_manager.shutdown()
+
+def test_submit_and_poll(job_manager):
+    job_id = job_manager.submit(quick_inputs(), QUICK_PARAMETERS)
+    assert job_manager.get(job_id)['status'] in (JobStatus.PENDING, JobStatus.RUNNING, JobStatus.SUCCEEDED)
+
+    state = wait_for(job_manager, job_id, FINISHED_STATUSES)
+    assert state['status'] == JobStatus.SUCCEEDED
+    assert state['result'].status == 'OPTIMAL'
+    assert state['result'].schedule is not None
+    assert job_manager.get('unknown') is None
+
+def test_cancel_running_job_stops_the_search(job_manager):
+    job_id = job_manager.submit(slow_inputs(), SLOW_PARAMETERS)
+    wait_for(job_manager, job_id, (JobStatus.RUNNING,))
+
+    started = time.monotonic()
+    assert job_manager.cancel(job_id) is True
+    # ワーカーの _watch_cancel() が stop_search() を呼び出し、max_time_in_seconds を待たずに終わる
+    state = wait_for(job_manager, job_id, FINISHED_STATUSES)
+    assert state['status'] == JobStatus.CANCELLED
+    assert time.monotonic() - started < 20.0
+
+def test_cancel_after_finish(job_manager):
+    job_id = job_manager.submit(quick_inputs(), QUICK_PARAMETERS)
+    wait_for(job_manager, job_id, FINISHED_STATUSES)
+    assert job_manager.cancel(job_id) is False
+    assert job_manager.get(job_id)['status'] == JobStatus.SUCCEEDED
+    assert job_manager.cancel('unknown') is None
+
+def test_dispatcher_skips_jobs_cancelled_while_waiting(job_manager):
+    running_id = job_manager.submit(slow_inputs(), SLOW_PARAMETERS)
+    wait_for(job_manager, running_id, (JobStatus.RUNNING,))
+    # 枠が 1 つしかないため、2 つ目のジョブは _dispatch() で枠を待つ
+    waiting_id = job_manager.submit(quick_inputs(), QUICK_PARAMETERS)
+    assert job_manager.get(waiting_id)['status'] == JobStatus.PENDING
+
+    assert job_manager.cancel(waiting_id) is True
+    assert job_manager.get(waiting_id)['status'] == JobStatus.CANCELLED
+    assert job_manager.cancel(running_id) is True
+    wait_for(job_manager, running_id, FINISHED_STATUSES)
+
+    # キャンセルされたジョブを取り出した後も、dispatcher は次のジョブを実行する
+    next_id = job_manager.submit(quick_inputs(), QUICK_PARAMETERS)
+    assert wait_for(job_manager, next_id, FINISHED_STATUSES)['status'] == JobStatus.SUCCEEDED
+    assert job_manager.get(waiting_id)['status'] == JobStatus.CANCELLED
+    assert job_manager._dispatcher.is_alive()
+
+class _StoppableModel:
+    def __init__(self):
+        self.stop_count = 0
+
+    def stop_search(self):
+        self.stop_count += 1
+
+def test_watch_cancel_stops_the_search_until_finished():
+    model = _StoppableModel()
+    cancel_event = threading.Event()
+    finished = threading.Event()
+    watcher = threading.Thread(target=_watch_cancel, args=(model, cancel_event, finished), daemon=True)
+    watcher.start()
+
+    time.sleep(0.3)
+    assert model.stop_count == 0
+    cancel_event.set()
+    time.sleep(0.35)
+    # 探索が終わるまでは stop_search() を呼び出し続ける
+    assert model.stop_count >= 2
+    finished.set()
+    watcher.join(1.0)
+    assert not watcher.is_alive()
+
+def test_job_endpoints(monkeypatch, job_manager):
+    monkeypatch.setattr(app_module, 'job_manager', job_manager)
+    client = app_module.app.test_client()
+    payload = {
+        'staffs': [{'id': staff_id, 'tier': 1, 'desiredOffDays': [], 'workDays': 1} for staff_id in range(1, 4)],
+        'shifts': [
+            {'date': date, 'requiredStaffCount': 1, 'requiredAttendanceTiers': [1], 'requiredAttendanceTierCount': 0}
+            for date in range(1, 4)
+        ],
+        'locked': [],
+        'solverParameters': {'maxTimeInSeconds': 10, 'numSearchWorkers': 1}
+    }
+
+    response = client.post('/api/v1/optimize/jobs', json=payload)
+    assert response.status_code == 202
+    job_id = response.get_json()['id']
+    wait_for(job_manager, job_id, FINISHED_STATUSES)
+
+    response = client.get(f'/api/v1/optimize/jobs/{job_id}')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['status'] == JobStatus.SUCCEEDED
+    assert body['solver']['status'] == 'OPTIMAL'
+
+    # 終了したジョブのキャンセルは、終了時のステータスとともに 409 を返す
+    response = client.delete(f'/api/v1/optimize/jobs/{job_id}')
+    assert response.status_code == 409
+    assert response.get_json() == {"error": "Job already finished", 'id': job_id, 'status': JobStatus.SUCCEEDED}
+
+    assert client.get('/api/v1/optimize/jobs/unknown').status_code == 404
+    assert client.delete('/api/v1/optimize/jobs/unknown').status_code == 404
@@ -0,0 +1,83 @@
+import pytest
+from enums import Tier
+from bench.generators import generate_store
+from models.shift_schedule_model import ShiftScheduleModel
+from models.constraints import StaffConstraints, ShiftConstraints, RequiredAttendanceConstraints
+from models.objectives import StaffObjectives, ShiftBalanceTierObjectives
+from models.parameters import LockedShift, SolverParameters
+
+SOLVER_PARAMETERS = SolverParameters(max_time_in_seconds = 60.0, num_search_workers = 1, random_seed = 0)
+
+# 通常層と新人層が多く、役職バランスのペナルティが 0 にならない構成
+JUNIOR_HEAVY_TIER_MIX = {
+    Tier.MANAGER.value: 0.05,
+    Tier.DAY_MANAGER.value: 0.05,
+    Tier.UPPER.value: 0.1,
+    Tier.MIDDLE.value: 0.3,
+    Tier.JUNIOR.value: 0.5,
+}
+
+class ReifiedShiftBalanceTierObjectives(ShiftBalanceTierObjectives):
+    """
+    差分の正負をブール変数で表し、4 つの条件付き制約でペナルティを作る、'max' の以前の定式化
+    """
+    def _compute_shift_balance_tier_objective_value(self, model, schedule_grid):
+        total_staff_count = len(self.staffs)
+        penalty_var = model.NewIntVar(0, total_staff_count, 'shift_balance_tier_penalty')
+        for shift in self.shifts:
+            tier_count_diff = self._create_tier_count_diff(schedule_grid.staff_ids, schedule_grid.date_variables(shift.date))
+            diff_var = model.NewIntVar(-total_staff_count, total_staff_count, 'shift_balance_tier_diff')
+            model.Add(diff_var == tier_count_diff)
+            is_diff_positive = model.NewBoolVar('shift_balance_tier_is_diff_positive')
+            model.Add(diff_var >= 0).OnlyEnforceIf(is_diff_positive)
+            model.Add(diff_var < 0).OnlyEnforceIf(is_diff_positive.Not())
+            model.Add(penalty_var >= diff_var).OnlyEnforceIf(is_diff_positive)
+            model.Add(penalty_var >= 0).OnlyEnforceIf(is_diff_positive.Not())
+        return penalty_var * self.penalty_dict['shift_balance_tier']
+
+def solve(shifts, staffs, locked, balance_objectives):
+    shift_schedule_model = ShiftScheduleModel(shifts, staffs, locked)
+    shift_schedule_model.add_constraints([
+        StaffConstraints(staffs),
+        ShiftConstraints(shifts),
+        RequiredAttendanceConstraints(shifts, staffs)
+    ])
+    shift_schedule_model.add_objectives([StaffObjectives(staffs), balance_objectives])
+    return shift_schedule_model.solve(SOLVER_PARAMETERS)
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_max_mode_matches_reified_formulation(seed):
+    shifts, staffs, locked = generate_store(10, days=14, seed=seed, tier_mix=JUNIOR_HEAVY_TIER_MIX, work_days=9)
+    reified = solve(shifts, staffs, locked, ReifiedShiftBalanceTierObjectives(shifts, staffs))
+    bounded = solve(shifts, staffs, locked, ShiftBalanceTierObjectives(shifts, staffs, 'max'))
+    assert reified.status == bounded.status == 'OPTIMAL'
+    assert bounded.objective_value == reified.objective_value
+    # 役職バランスのペナルティが目的関数に含まれる構成であること
+    assert bounded.objective_value >= ShiftBalanceTierObjectives(shifts, staffs).penalty_dict['shift_balance_tier']
+
+def test_sum_mode_adds_daily_penalties():
+    shifts, staffs, _ = generate_store(6, days=5, seed=0, tier_mix=JUNIOR_HEAVY_TIER_MIX, work_days=3)
+    # 全てのセルをロックし、日ごとの (低レベル層 - 高レベル層) の出勤数を固定する
+    locked = [
+        LockedShift(date = shift.date, staff_id = staff.id, is_working = (shift.date + staff.id) % 2 == 0 or staff.tier >= Tier.MIDDLE.value)
+        for shift in shifts
+        for staff in staffs
+    ]
+    is_working = {(lock.date, lock.staff_id): lock.is_working for lock in locked}
+    coefficients = ShiftBalanceTierObjectives(shifts, staffs).tier_balance_coefficients
+    daily_penalties = [
+        max(0, sum(coefficients.get(staff.id, 0) for staff in staffs if is_working[shift.date, staff.id]))
+        for shift in shifts
+    ]
+    assert len(set(daily_penalties)) > 1 and min(daily_penalties) > 0
+
+    def objective_value(mode):
+        shift_schedule_model = ShiftScheduleModel(shifts, staffs, locked)
+        objectives = ShiftBalanceTierObjectives(shifts, staffs, mode)
+        shift_schedule_model.add_objectives([objectives])
+        result = shift_schedule_model.solve(SOLVER_PARAMETERS)
+        assert result.status == 'OPTIMAL'
+        return result.objective_value / objectives.penalty_dict['shift_balance_tier']
+
+    assert objective_value('max') == max(daily_penalties)
+    assert objective_value('sum') == sum(daily_penalties)
@@ -0,0 +1,53 @@
+import json
+import base64
+import msgpack
+import numpy as np
+from negotiation import encode_body, JSON_MIMETYPE, MSGPACK_MIMETYPE
+from models.shift_schedule_model import ScheduleValues
+
+def unpack_shifts(packed, decode):
+    """
+    frontend/src/api/shift/optimizeShiftApi.ts の unpackShifts() と同じ手順で、AssignedShift の辞書のリストに戻す
+    bytes[i >> 3] & (0x80 >> (i & 7)) が dates[i] の日のビット
+    """
+    is_working = [decode(value) for value in packed['isWorking']]
+    locked = [decode(value) for value in packed['locked']]
+
+    def bit(data, i):
+        return (data[i >> 3] & (0x80 >> (i & 7))) != 0
+
+    return [
+        {'date': date, 'staffId': staff_id, 'isWorking': bit(is_working[j], i), 'locked': bit(locked[j], i)}
+        for i, date in enumerate(packed['dates'])
+        for j, staff_id in enumerate(packed['staffIds'])
+    ]
+
+def create_schedule():
+    # 1 バイトに収まらない日数（最後のバイトに余りのビットがある）で、日付とスタッフで異なる並びにする
+    rng = np.random.default_rng(0)
+    dates = list(range(1, 12))
+    staff_ids = [10, 20, 30]
+    return ScheduleValues(
+        dates = dates,
+        staff_ids = staff_ids,
+        is_working = rng.random((len(dates), len(staff_ids))) < 0.5,
+        locked = rng.random((len(dates), len(staff_ids))) < 0.3
+    )
+
+def test_packed_bit_order():
+    schedule = create_schedule()
+    packed = schedule.to_packed()
+    # 1 日目は最初のバイトの最上位ビット
+    assert packed['isWorking'][0][0] >> 7 == schedule.is_working[0, 0]
+    assert all(len(row) == 2 for row in packed['isWorking'])
+    assert unpack_shifts(packed, lambda value: value) == schedule.to_shift_list()
+
+def test_packed_json_and_msgpack_match_shift_list():
+    schedule = create_schedule()
+    body = {'shifts': schedule.to_packed()}
+
+    from_json = json.loads(encode_body(body, JSON_MIMETYPE))['shifts']
+    assert unpack_shifts(from_json, base64.b64decode) == schedule.to_shift_list()
+
+    from_msgpack = msgpack.unpackb(encode_body(body, MSGPACK_MIMETYPE), raw=False)['shifts']
+    assert unpack_shifts(from_msgpack, lambda value: value) == schedule.to_shift_list()
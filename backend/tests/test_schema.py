@@ -0,0 +1,109 @@
+import pytest
+from schema import ValidationError, parse_relax_weights, parse_schedule_inputs, parse_solver_parameters
+
+def test_parse_relax_weights():
+    assert parse_relax_weights(None) is None
+    assert parse_relax_weights({'workDays': 5, 'requiredStaffCount': 0}) == {'work_days': 5, 'required_staff_count': 0}
+
+@pytest.mark.parametrize('weights, message', [
+    ([], 'relaxWeights must be an object'),
+    ({'unknown': 1}, 'relaxWeights.unknown is not a known rule'),
+    ({'workDays': '5'}, 'relaxWeights.workDays must be an integer'),
+    ({'workDays': True}, 'relaxWeights.workDays must be an integer'),
+    ({'workDays': 2.7}, 'relaxWeights.workDays must be an integer'),
+    ({'workDays': 'abc'}, 'relaxWeights.workDays must be an integer'),
+    ({'workDays': -1}, 'relaxWeights.workDays must be greater than or equal to 0'),
+])
+def test_parse_relax_weights_rejects(weights, message):
+    with pytest.raises(ValidationError) as e:
+        parse_relax_weights(weights)
+    assert str(e.value) == message
+
+def create_inputs():
+    """
+    4 人のスタッフと 3 日分のシフトを持つ正しい入力
+    """
+    return {
+        'staffs': [{'id': staff_id, 'tier': 1, 'desiredOffDays': [], 'workDays': 1} for staff_id in range(1, 5)],
+        'shifts': [
+            {'date': date, 'requiredStaffCount': 1, 'requiredAttendanceTiers': [1], 'requiredAttendanceTierCount': 0}
+            for date in range(1, 4)
+        ],
+        'locked': [{'date': 1, 'staffId': 1, 'isWorking': True}]
+    }
+
+def test_parse_schedule_inputs():
+    data = create_inputs()
+    data['staffs'][0]['desiredOffDays'] = [3, 1, 3]
+    inputs = parse_schedule_inputs(data)
+    assert [staff.id for staff in inputs['staffs']] == [1, 2, 3, 4]
+    assert inputs['staffs'][0].desired_off_days == [1, 3]
+    assert [shift.date for shift in inputs['shifts']] == [1, 2, 3]
+    assert inputs['previous'] == []
+
+def _set(path, value):
+    """
+    create_inputs() の path の位置を value に置き換える関数を返す
+    """
+    def update(data):
+        *parents, key = path
+        for parent in parents:
+            data = data[parent]
+        data[key] = value
+    return update
+
+def _delete(path):
+    def update(data):
+        *parents, key = path
+        for parent in parents:
+            data = data[parent]
+        del data[key]
+    return update
+
+@pytest.mark.parametrize('update, message', [
+    (_set(('staffs', 3, 'workDays'), '5'), 'staffs[3].workDays must be an integer'),
+    (_set(('staffs', 3, 'workDays'), 2.5), 'staffs[3].workDays must be an integer'),
+    (_set(('staffs', 3, 'workDays'), -1), 'staffs[3].workDays must be greater than or equal to 0'),
+    (_set(('staffs', 0, 'desiredOffDays'), [1, 'x']), 'staffs[0].desiredOffDays[1] must be an integer'),
+    (_set(('staffs', 0, 'desiredOffDays'), [2, 0]), 'staffs[0].desiredOffDays[1] must be greater than or equal to 1'),
+    (_set(('staffs', 0, 'desiredOffDays'), 1), 'staffs[0].desiredOffDays must be an array'),
+    (_set(('staffs', 0, 'desiredOffDays'), [4]), 'staffs[0].desiredOffDays contains 4, which is not a shift date'),
+    (_set(('staffs', 1, 'tier'), 9), 'staffs[1].tier must be one of 1, 2, 3, 4, 5'),
+    (_delete(('staffs', 2, 'workDays')), 'staffs[2].workDays is required'),
+    (_set(('staffs', 2), 'staff'), 'staffs[2] must be an object'),
+    (_set(('staffs',), {}), 'staffs must be an array'),
+    (_delete(('shifts',)), 'shifts is required'),
+    (_set(('shifts', 1, 'requiredAttendanceTiers'), [1, 0]), 'shifts[1].requiredAttendanceTiers[1] must be one of 1, 2, 3, 4, 5'),
+    # 重複したID、日付
+    (_set(('staffs', 2, 'id'), 1), 'staffs[2] duplicates 1'),
+    (_set(('shifts', 2, 'date'), 2), 'shifts[2] duplicates 2'),
+    # ロックの参照先
+    (_set(('locked', 0, 'date'), 9), 'locked[0].date 9 is not a shift date'),
+    (_set(('locked', 0, 'staffId'), 9), 'locked[0].staffId 9 is not a staff id'),
+    # bool は int のサブクラスだが、整数として受け付けない
+    (_set(('staffs', 3, 'workDays'), True), 'staffs[3].workDays must be an integer'),
+    (_set(('staffs', 0, 'id'), False), 'staffs[0].id must be an integer'),
+    (_set(('staffs', 0, 'desiredOffDays'), [True]), 'staffs[0].desiredOffDays[0] must be an integer'),
+    (_set(('shifts', 0, 'requiredStaffCount'), True), 'shifts[0].requiredStaffCount must be an integer'),
+    (_set(('locked', 0, 'staffId'), True), 'locked[0].staffId must be an integer'),
+    (_set(('locked', 0, 'isWorking'), 1), 'locked[0].isWorking must be a boolean'),
+])
+def test_parse_schedule_inputs_rejects(update, message):
+    data = create_inputs()
+    update(data)
+    with pytest.raises(ValidationError) as e:
+        parse_schedule_inputs(data)
+    assert str(e.value) == message
+
+@pytest.mark.parametrize('params, message', [
+    ([], 'solverParameters must be an object'),
+    ({'maxTime': 1}, 'solverParameters.maxTime is not a known solver parameter'),
+    ({'maxTimeInSeconds': 0}, 'solverParameters.maxTimeInSeconds must be greater than 0'),
+    ({'maxTimeInSeconds': True}, 'solverParameters.maxTimeInSeconds must be a number'),
+    ({'numSearchWorkers': True}, 'solverParameters.numSearchWorkers must be an integer'),
+    ({'randomSeed': 2 ** 31}, 'solverParameters.randomSeed must be less than or equal to 2147483647'),
+])
+def test_parse_solver_parameters_rejects(params, message):
+    with pytest.raises(ValidationError) as e:
+        parse_solver_parameters(params)
+    assert str(e.value) == message
@@ -0,0 +1,75 @@
+import pytest
+from bench.generators import generate_store
+from models.builder import build_shift_schedule_model
+from models.parameters import LockedShift, ShiftCell, ScheduleEdits, SolverParameters
+from sessions import ScheduleSession
+
+SOLVER_PARAMETERS = SolverParameters(max_time_in_seconds = 30.0, num_search_workers = 1, random_seed = 0)
+
+def create_session():
+    shifts, staffs, locked = generate_store(8, days=10, seed=0, work_days=6)
+    return ScheduleSession({'shifts': shifts, 'staffs': staffs, 'locked': locked, 'seed': 0}, SOLVER_PARAMETERS)
+
+def create_edits(locked=(), unlocked=(), added_desired_off_days=(), removed_desired_off_days=()):
+    return ScheduleEdits(
+        locked = list(locked),
+        unlocked = list(unlocked),
+        added_desired_off_days = list(added_desired_off_days),
+        removed_desired_off_days = list(removed_desired_off_days)
+    )
+
+def find_cell(shift_list, date, staff_id):
+    return next(cell for cell in shift_list if cell['date'] == date and cell['staffId'] == staff_id)
+
+def solve_from_scratch(model_inputs):
+    """
+    セッションの編集後の入力から、モデルを作り直して解く
+    """
+    return build_shift_schedule_model(**model_inputs).solve(SOLVER_PARAMETERS)
+
+def test_lock_and_unlock():
+    session = create_session()
+    first = session.solve()
+    assert first.status == 'OPTIMAL'
+
+    # 前回の解と逆の出勤可否でロックする
+    staff_id = session.model_inputs['staffs'][0].id
+    cell = find_cell(first.shift_list, 1, staff_id)
+    session.apply_edits(create_edits(locked=[LockedShift(date = 1, staff_id = staff_id, is_working = not cell['isWorking'])]))
+    assert LockedShift(date = 1, staff_id = staff_id, is_working = not cell['isWorking']) in session.model_inputs['locked']
+
+    locked = session.solve()
+    assert locked.status == 'OPTIMAL'
+    assert find_cell(locked.shift_list, 1, staff_id) == {**cell, 'isWorking': not cell['isWorking'], 'locked': True}
+    assert locked.objective_value == pytest.approx(solve_from_scratch(session.model_inputs).objective_value)
+
+    session.apply_edits(create_edits(unlocked=[ShiftCell(date = 1, staff_id = staff_id)]))
+    assert session.model_inputs['locked'] == []
+    unlocked = session.solve()
+    assert find_cell(unlocked.shift_list, 1, staff_id)['locked'] is False
+    assert unlocked.objective_value == pytest.approx(first.objective_value)
+
+def test_desired_off_edits():
+    session = create_session()
+    first = session.solve()
+    staff = session.model_inputs['staffs'][0]
+    working_date = next(cell['date'] for cell in first.shift_list if cell['staffId'] == staff.id and cell['isWorking'])
+    removed_date = sorted(staff.desired_off_days)[0] if staff.desired_off_days else None
+
+    edits = create_edits(
+        added_desired_off_days = [ShiftCell(date = working_date, staff_id = staff.id)],
+        removed_desired_off_days = [ShiftCell(date = removed_date, staff_id = staff.id)] if removed_date is not None else []
+    )
+    session.apply_edits(edits)
+    edited_staff = next(s for s in session.model_inputs['staffs'] if s.id == staff.id)
+    assert working_date in edited_staff.desired_off_days
+    assert removed_date not in edited_staff.desired_off_days
+
+    # 目的関数の係数の変更が、作り直したモデルと同じ最適値になる
+    edited = session.solve()
+    assert edited.status == 'OPTIMAL'
+    assert edited.objective_value == pytest.approx(solve_from_scratch(session.model_inputs).objective_value)
+
+    # 同じ編集をもう一度適用しても係数は変わらない
+    session.apply_edits(edits)
+    assert session.solve().objective_value == pytest.approx(edited.objective_value)
@@ -0,0 +1,55 @@
+from ortools.sat.python import cp_model
+from bench.generators import generate_store
+from models.builder import build_shift_schedule_model
+from models.parameters import SolverParameters
+from models.symmetry import StaffSymmetryBreaking
+
+SOLVER_PARAMETERS = SolverParameters(max_time_in_seconds = 60.0, num_search_workers = 1, random_seed = 0)
+
+def create_store():
+    # 希望休がないため、同じ役職のスタッフは交換可能になる
+    return generate_store(10, days=10, seed=0, desired_off_density=0.0, work_days=6)
+
+def solve_rows(shift_schedule_model, fixed_rows=None):
+    """
+    permutation() で入れ替える前の、スタッフごとの出勤可否の並びを返す 解がない場合は None を返す
+    fixed_rows を指定した場合は、そのスタッフの出勤可否を固定して解く
+    """
+    schedule_grid = shift_schedule_model.schedule_grid
+    for staff_id, row in (fixed_rows or {}).items():
+        for variable, value in zip(schedule_grid.staff_variables(staff_id), row):
+            shift_schedule_model.model.Add(variable == value)
+    solver = cp_model.CpSolver()
+    solver.parameters.num_search_workers = 1
+    solver.parameters.random_seed = 0
+    if solver.Solve(shift_schedule_model.model) != cp_model.OPTIMAL:
+        return None
+    return {staff_id: [solver.Value(variable) for variable in schedule_grid.staff_variables(staff_id)] for staff_id in schedule_grid.staff_ids}
+
+def test_lex_orders_interchangeable_staff():
+    shifts, staffs, locked = create_store()
+    equivalence_classes = StaffSymmetryBreaking(staffs, locked, mode='lex').equivalence_classes
+
+    rows = solve_rows(build_shift_schedule_model(shifts, staffs, locked, seed=0, symmetry_breaking='lex'))
+    for staff_ids in equivalence_classes:
+        class_rows = [rows[staff_id] for staff_id in staff_ids]
+        assert class_rows == sorted(class_rows, reverse=True)
+
+    # 'permute' の解で出勤可否が異なるスタッフのいる同値類を、昇順と降順に並べ替えて固定する
+    rows = solve_rows(build_shift_schedule_model(shifts, staffs, locked, seed=0, symmetry_breaking='permute'))
+    staff_ids = next(staff_ids for staff_ids in equivalence_classes if len({tuple(rows[staff_id]) for staff_id in staff_ids}) > 1)
+    class_rows = sorted(rows[staff_id] for staff_id in staff_ids)
+    ascending = dict(zip(staff_ids, class_rows))
+    descending = dict(zip(staff_ids, class_rows[::-1]))
+
+    assert solve_rows(build_shift_schedule_model(shifts, staffs, locked, seed=0, symmetry_breaking='permute'), ascending) is not None
+    assert solve_rows(build_shift_schedule_model(shifts, staffs, locked, seed=0, symmetry_breaking='lex'), ascending) is None
+    assert solve_rows(build_shift_schedule_model(shifts, staffs, locked, seed=0, symmetry_breaking='lex'), descending) is not None
+
+def test_lex_keeps_the_optimum():
+    shifts, staffs, locked = create_store()
+    objective_values = [
+        build_shift_schedule_model(shifts, staffs, locked, seed=0, symmetry_breaking=mode).solve(SOLVER_PARAMETERS).objective_value
+        for mode in ('permute', 'lex')
+    ]
+    assert objective_values[0] == objective_values[1]
@@ -1,11 +1,83 @@
-import { ShiftsInput } from '@/types';
+import { AssignedShift, ConflictingRule, OptimizeShiftPackedResponse, OptimizeShiftResponse, PackedShifts, ShiftsInput } from '@/types';
 
-export const optimizeShift = async (input: ShiftsInput) => {
-  return await fetch(`${import.meta.env.VITE_API_URL}/api/v1/optimize`, {
+// これより小さいリクエストボディは圧縮しない（サーバーのレスポンスの圧縮の閾値と同じ）
+const MIN_COMPRESSION_BYTES = 1024;
+
+/**
+ * リクエストボディを gzip で圧縮する
+ * CompressionStream に対応していないブラウザや、小さいボディの場合は圧縮せずに返す
+ */
+const compressBody = async (body: string): Promise<{ body: BodyInit, headers: Record<string, string> }> => {
+  if (typeof CompressionStream === 'undefined' || body.length < MIN_COMPRESSION_BYTES) {
+    return { body, headers: {} };
+  }
+  const stream = new Blob([body]).stream().pipeThrough(new CompressionStream('gzip'));
+  return {
+    body: await new Response(stream).arrayBuffer(),
+    headers: { 'Content-Encoding': 'gzip' },
+  };
+};
+
+/**
+ * /api/v1/optimize が 2xx 以外のステータスを返した場合のエラー
+ * 解がない場合（422）は、conflicts に同時には満たせないルールの組み合わせが入る
+ */
+export class OptimizeShiftError extends Error {
+  status: number;
+  conflicts: ConflictingRule[];
+
+  constructor(message: string, status: number, conflicts: ConflictingRule[] = []) {
+    super(message);
+    this.name = 'OptimizeShiftError';
+    this.status = status;
+    this.conflicts = conflicts;
+  }
+}
+
+/**
+ * base64 の文字列をバイト列に変換する
+ */
+const decodeBase64 = (text: string) => Uint8Array.from(atob(text), (c) => c.charCodeAt(0));
+
+/**
+ * ?format=packed の shifts を AssignedShift のリスト（日付順、同じ日付の中ではスタッフ順）に変換する
+ */
+export const unpackShifts = (packed: PackedShifts): AssignedShift[] => {
+  const isWorking = packed.isWorking.map(decodeBase64);
+  const locked = packed.locked.map(decodeBase64);
+  const bit = (bytes: Uint8Array, i: number) => (bytes[i >> 3] & (0x80 >> (i & 7))) !== 0;
+
+  return packed.dates.flatMap((date, i) =>
+    packed.staffIds.map((staffId, j) => ({
+      date,
+      staffId,
+      isWorking: bit(isWorking[j], i),
+      locked: bit(locked[j], i),
+    }))
+  );
+};
+
+/**
+ * シフトを最適化する
+ * レスポンスはスタッフごとのビットセット（?format=packed）で受け取り、AssignedShift のリストに戻して返す
+ * レスポンスの展開（gzip, br）はブラウザが行う
+ * 解がない場合やリクエストが不正な場合は OptimizeShiftError を送出する
+ */
+export const optimizeShift = async (input: ShiftsInput): Promise<OptimizeShiftResponse> => {
+  const { body, headers } = await compressBody(JSON.stringify(input));
+  const res = await fetch(`${import.meta.env.VITE_API_URL}/api/v1/optimize?format=packed`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
+      ...headers,
     },
-    body: JSON.stringify(input),
+    body,
   });
+  if (!res.ok) {
+    // プロキシなどが返すエラーは JSON とは限らない
+    const error = await res.json().catch(() => null);
+    throw new OptimizeShiftError(error?.error ?? `HTTP ${res.status}`, res.status, error?.conflicts ?? []);
+  }
+  const data: OptimizeShiftPackedResponse = await res.json();
+  return { ...data, shifts: data.shifts ? unpackShifts(data.shifts) : null };
 };
@@ -1,12 +1,13 @@
 import { useState, ReactElement } from "react";
 import { ShiftTable } from '@/components/ShiftTable/ShiftTable'
-import { optimizeShift } from '@/api/shift/optimizeShiftApi'
+import { optimizeShift, OptimizeShiftError } from '@/api/shift/optimizeShiftApi'
 import { MonthPicker } from '@/components/MonthPicker/MonthPicker'
 import { DaysStatusSelector } from '@/components/DaysStatusSelector/DaysStatusSelector'
 import { RequiredAttendanceTiers } from '@/components/RequiredAttendance/RequiredAttendanceTiers'
 import { RequiredAttendanceTierCounter } from '@/components/RequiredAttendance/RequiredAttendanceTierCounter'
 
 import { Tiers } from '@/constants'
+import { ConflictingRule, RuleType, Staff } from '@/types'
 import { TieredStaffCounter } from '@/components/TieredStaffCounter/TieredStaffCounter'
 
 import { ShiftManagementProvider, useShiftManagement } from '@/contexts/ShiftManagementContext'
@@ -17,7 +18,29 @@ import { WorkDaysCounter } from '@/components/WorkDaysCounter/WorkDaysCounter'
 
 import holiday_jp from '@holiday-jp/holiday_jp'
 import dayjs from 'dayjs';
-import { Space, Divider, Button, Typography } from "antd";
+import { Space, Divider, Button, Typography, message } from "antd";
+
+const RULE_LABELS: Record<RuleType, string> = {
+  workDays: '出勤日数',
+  maxConsecutiveWorkDays: '最大連勤数',
+  minConsecutiveRestDays: '最小連休数',
+  lookaheadWorkDays: '翌月の出勤日数',
+  requiredStaffCount: '必要人数',
+  requiredAttendanceTierCount: '必須役職の必要人数',
+}
+
+/**
+ * 同時には満たせないルールを、スタッフ名または日付を付けた文言にする
+ */
+const describeConflict = (rule: ConflictingRule, staffs: Staff[]) => {
+  const label = RULE_LABELS[rule.type] ?? rule.type
+  if (rule.staffId !== undefined) {
+    const staff = staffs.find((s) => s.id === rule.staffId)
+    return `${staff?.name ?? rule.staffId} の${label}`
+  }
+  if (rule.date !== undefined) return `${rule.date}日の${label}`
+  return label
+}
 
 function ShiftSchedule() : ReactElement {
   const [loading, setLoading] = useState(false)
@@ -25,12 +48,36 @@ function ShiftSchedule() : ReactElement {
   const { staffs, staffBaseSettings, shiftSchedules, shifts, assignedShifts } = state
   const { Text } = Typography;
 
+  const [messageApi, contextHolder] = message.useMessage()
+
   const handlePost = async () => {
     setLoading(true)
-    const res = await optimizeShift(actions.createShiftsInput())
-    setLoading(false)
-    const data = await res.json()
-    actions.updateAssignedShifts(data)
+    try {
+      const data = await optimizeShift(actions.createShiftsInput())
+      if (data.shifts) {
+        actions.updateAssignedShifts(data.shifts)
+      } else {
+        // 制限時間内に解が見つからなかった場合
+        messageApi.warning(`制限時間内にシフトが見つかりませんでした（${data.solver.status}）`)
+      }
+    } catch (e) {
+      if (e instanceof OptimizeShiftError && e.status === 422) {
+        // 解がない場合は、同時には満たせないルールを表示する
+        messageApi.error({
+          content: (
+            <>
+              <div>条件をすべて満たすシフトが見つかりませんでした</div>
+              {e.conflicts.map((rule, i) => <div key={i}>{describeConflict(rule, staffs)}</div>)}
+            </>
+          ),
+          duration: 10,
+        })
+      } else {
+        messageApi.error(`シフトを作成できませんでした: ${e instanceof Error ? e.message : e}`)
+      }
+    } finally {
+      setLoading(false)
+    }
   }
 
   const tierCounts = Tiers.map((tier) => {
@@ -65,6 +112,7 @@ function ShiftSchedule() : ReactElement {
 
   return (
     <>
+      {contextHolder}
       <div
         style={{
           padding: 24,
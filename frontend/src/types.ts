@@ -13,6 +13,9 @@ export type StaffInput = {
   tier: number;
   desiredOffDays: number[];
   workDays: number;
+  // 省略した場合は店舗の maxConsecutiveWorkDays, minConsecutiveRestDays
+  maxConsecutiveWorkDays?: number;
+  minConsecutiveRestDays?: number;
 };
 
 export type Staff = StaffInput & {
@@ -79,7 +82,177 @@ export type LockedAssignedShiftInput = Omit<AssignedShift, 'locked'>;
 export type ShiftsInput = {
   staffs: StaffInput[],
   shifts: ShiftInput[],
-  locked: LockedAssignedShiftInput[]
+  locked: LockedAssignedShiftInput[],
+  solverParameters?: SolverParametersInput,
+  // 前回の解 指定すると前回の解から探索を始める
+  previous?: AssignedShift[],
+  previousMode?: 'hint' | 'lock',
+  // 緩和モード ルールを満たせない場合でも、違反を最小にした解を返す
+  relax?: boolean,
+  relaxWeights?: Partial<Record<RuleType, number>>,
+  // 交換可能なスタッフの区別を目的関数のノイズではなく解の入れ替えで付ける
+  symmetryBreaking?: 'none' | 'permute' | 'lex',
+  // 'hint': 貪欲法のシフト表を初期解にする 'fast': 探索せずに貪欲法のシフト表を返す
+  heuristic?: 'none' | 'hint' | 'fast',
+  // 最大連勤数（既定 5）と、連勤の後の最小連休数（既定 1）
+  maxConsecutiveWorkDays?: number,
+  minConsecutiveRestDays?: number,
+  // 'window': 連勤の制約を線形の制約で作成する 'automaton': オートマトン制約で作成する（制約の数は少ないが探索は遅くなりやすい）
+  consecutiveEncoding?: 'window' | 'automaton',
+  // 同じ目的関数の値の解から選ぶためのランダムシード 省略した場合は入力から作成する
+  seed?: number,
+  randomizationDensity?: number
+}
+
+/**
+ * /api/v1/optimize/alternatives の入力
+ * count 個の解を、互いに minDifference セル以上異なるように求める
+ */
+export type AlternativesInput = ShiftsInput & {
+  count?: number,
+  minDifference?: number
+}
+
+export type ShiftCellInput = Omit<LockedAssignedShiftInput, 'isWorking'>;
+
+/**
+ * /api/v1/sessions/:sessionId の PATCH の入力
+ * セッションのモデルを作り直さずに、編集を差分として適用して前回の解から解き直す
+ */
+export type SessionEditsInput = {
+  locked?: LockedAssignedShiftInput[],
+  unlocked?: ShiftCellInput[],
+  addedDesiredOffDays?: ShiftCellInput[],
+  removedDesiredOffDays?: ShiftCellInput[],
+  solverParameters?: SolverParametersInput
+}
+
+export type RuleType = 'workDays' | 'maxConsecutiveWorkDays' | 'minConsecutiveRestDays' | 'lookaheadWorkDays' | 'requiredStaffCount' | 'requiredAttendanceTierCount';
+
+/**
+ * 満たせなかったルール
+ * type 以外のキーはルールの種類によって異なる（staffId, date など）
+ */
+export type RuleViolation = {
+  type: RuleType;
+  shortage: number;
+  excess: number;
+  [key: string]: unknown;
+}
+
+/**
+ * 同時には満たせないルールの 1 つ（解がない場合の診断結果）
+ * type 以外のキーはルールの種類によって異なる（staffId, date など）
+ */
+export type ConflictingRule = {
+  type: RuleType;
+  [key: string]: unknown;
+}
+
+export type SolverParametersInput = {
+  maxTimeInSeconds?: number;
+  numSearchWorkers?: number;
+  relativeGapLimit?: number;
+  absoluteGapLimit?: number;
+  randomSeed?: number;
+}
+
+export type SolverStatus = 'OPTIMAL' | 'FEASIBLE' | 'INFEASIBLE' | 'MODEL_INVALID' | 'UNKNOWN';
+
+/**
+ * /api/v1/optimize のレスポンス
+ * 解が見つからなかった場合は shifts が null になる
+ */
+export type OptimizeShiftResponse = {
+  shifts: AssignedShift[] | null;
+  solver: {
+    status: SolverStatus;
+    objectiveValue: number | null;
+    bestObjectiveBound: number | null;
+    wallTime: number;
+    // モデルの大きさと探索の統計
+    stats?: {
+      numVariables: number;
+      numConstraints: number;
+      numObjectiveTerms: number;
+      numConflicts: number;
+      numBranches: number;
+      userTime: number;
+    };
+  };
+  // 解がない場合のみ 診断が時間内に終わらなかった場合は null
+  conflicts?: ConflictingRule[] | null;
+  // 緩和モードの場合のみ
+  violations?: RuleViolation[];
+  // ?evaluate=1 の場合のみ
+  evaluation?: ScheduleEvaluation;
+}
+
+/**
+ * ?format=packed の shifts
+ * isWorking[j], locked[j] は staffIds[j] のスタッフの日付順の出勤可否を 1 日 1 ビットに詰めたバイト列を base64 にした文字列
+ * i // 8 バイト目の上から i % 8 ビット目が dates[i] の日を表す
+ */
+export type PackedShifts = {
+  dates: number[];
+  staffIds: number[];
+  isWorking: string[];
+  locked: string[];
+}
+
+export type OptimizeShiftPackedResponse = Omit<OptimizeShiftResponse, 'shifts'> & {
+  shifts: PackedShifts | null;
+}
+
+/**
+ * /api/v1/sessions のレスポンス
+ */
+export type SessionResponse = OptimizeShiftResponse & {
+  sessionId: string;
+}
+
+/**
+ * /api/v1/evaluate の入力
+ * schedule に含まれないセルは出勤しないものとして評価する
+ */
+export type EvaluateInput = Pick<ShiftsInput, 'staffs' | 'shifts' | 'locked' | 'maxConsecutiveWorkDays' | 'minConsecutiveRestDays'> & {
+  schedule: LockedAssignedShiftInput[],
+  shiftBalanceMode?: 'max' | 'sum'
+}
+
+/**
+ * シフト表の品質の指標
+ * /api/v1/evaluate のレスポンスと、/api/v1/optimize?evaluate=1 のレスポンスの evaluation
+ */
+export type ScheduleEvaluation = {
+  // 希望休と役職バランスのペナルティ（ランダムな項と違反のペナルティは含まない）
+  objective: {
+    desiredOffDays: number;
+    shiftBalanceTier: number;
+    total: number;
+  };
+  staffs: {
+    staffId: number;
+    workDays: number;
+    targetWorkDays: number;
+    desiredOffDaysWorked: number[];
+    longestConsecutiveWorkDays: number;
+    maxConsecutiveWorkDays: number;
+    minConsecutiveRestDays: number;
+  }[];
+  days: {
+    date: number;
+    staffCount: number;
+    requiredStaffCount: number;
+    staffCountSlack: number;
+    attendanceTierCount: number;
+    requiredAttendanceTierCount: number;
+    attendanceTierCountSlack: number;
+    // 通常層、新人層の人数 - 店長クラス、当日責任者、優秀層の人数
+    tierBalance: number;
+  }[];
+  // ロックと異なるセルは type が 'locked' になる
+  violations: (RuleViolation | (Omit<RuleViolation, 'type'> & { type: 'locked' }))[];
 }
 
 export type TierKeys = 'Manager' | 'DayManager' | 'Upper' | 'Middle' | 'Junior';